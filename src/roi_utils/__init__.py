@@ -1,9 +1,12 @@
 from __future__ import annotations
 from __future__ import annotations
 
-from roi_utils.logging import ExecutionContext, sync_queue, logging_queue
+from roi_utils.latency import LatencyHistogram, LatencyRecorder, LatencyReporter
+from roi_utils.logging import AsyncLogSink, ExecutionContext, sync_queue
+from roi_utils.metrics import MetricsServer, Registry, SpanMetrics, registry
 from roi_utils.monad import Result
 from roi_utils.persistence import load_async, save_async
+from roi_utils.tracing import BinaryExporter, ChromeTraceExporter, JsonlExporter, Span, Tracer
 
 __all__ = (
     Result,
@@ -11,5 +14,17 @@ __all__ = (
     save_async,
     ExecutionContext,
     sync_queue,
-    logging_queue,
+    AsyncLogSink,
+    Tracer,
+    Span,
+    JsonlExporter,
+    BinaryExporter,
+    ChromeTraceExporter,
+    LatencyHistogram,
+    LatencyRecorder,
+    LatencyReporter,
+    Registry,
+    registry,
+    SpanMetrics,
+    MetricsServer,
 )
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import statistics
+import time
+from dataclasses import dataclass
+from typing import Callable, List
+
+
+@dataclass
+class Timing:
+    name: str
+    runs: List[ float ]
+    size: int = 0
+
+    @property
+    def best( self ) -> float:
+        return min( self.runs )
+
+    @property
+    def median( self ) -> float:
+        return statistics.median( self.runs )
+
+    def __str__( self ) -> str:
+        line = f"{self.name:<32} best {self.best * 1000:9.3f} ms  median {self.median * 1000:9.3f} ms"
+        if self.size:
+            line += f"  {self.size / self.best / 1024 / 1024:9.1f} MB/s"
+        return line
+
+
+def measure( name: str, fn: Callable[ [ ], object ], repeat: int = 5, number: int = 1, size: int = 0 ) -> Timing:
+    """Times ``number`` calls of ``fn``, ``repeat`` times; ``size`` is the bytes handled per run, for throughput."""
+    runs = [ ]
+    for _ in range( repeat ):
+        start = time.perf_counter()
+        for _ in range( number ):
+            fn()
+        runs.append( time.perf_counter() - start )
+    return Timing( name, runs, size )
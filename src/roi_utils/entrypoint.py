@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import functools
+import sys
+from typing import Awaitable, Callable, Dict, List
+
+from roi_utils.latency import LatencyRecorder, LatencyReporter
+from roi_utils.logging import AsyncLogSink, ExecutionContext
+from roi_utils.metrics import MetricsServer, SpanMetrics
+from roi_utils.tracing import Tracer, open_exporter
+
+
+def parse_options( argv: List[ str ] = None ) -> Dict[ str, str ]:
+    """The ``--name=value`` arguments, the flags without a value are left to the workflow.
+
+    --trace=<file.json|file.jsonl|directory> records spans instead of logging them, --sample=<rate> keeps a share,
+    --summary=<seconds> between two latency summaries, --metrics=<port> serves /metrics on localhost.
+    """
+    argv = sys.argv[ 1: ] if argv is None else argv
+    return dict( argument[ 2: ].split( "=", 1 ) for argument in argv if "=" in argument )
+
+
+async def logged( main: Callable[ [ ], Awaitable ], options: Dict[ str, str ] ) -> None:
+    """Runs ``main`` with an ``AsyncLogSink`` on stderr, periodic latency summaries and, asked for, a metrics
+    server."""
+    async with contextlib.AsyncExitStack() as stack:
+        sink = await stack.enter_async_context( AsyncLogSink( sys.stderr.fileno() ) )
+        if "metrics" in options:
+            await stack.enter_async_context( MetricsServer( port=int( options[ "metrics" ] ) ) )
+        stack.enter_context( LatencyReporter( ExecutionContext.latency, functools.partial( sink.write, "info" ),
+                                              float( options.get( "summary", 60 ) ) ) )
+        await main()
+
+
+def run( main: Callable[ [ ], Awaitable ], argv: List[ str ] = None ) -> None:
+    """The ``__main__`` of a workflow: installs the tracer, latency recorder and span metrics the options ask for
+    ( see ``parse_options`` ), runs ``main`` on a new event loop, and closes the tracer whatever happens."""
+    parsed = parse_options( argv )
+    tracer = None
+    if "trace" in parsed:
+        tracer = Tracer( open_exporter( parsed[ "trace" ] ), float( parsed.get( "sample", 1.0 ) ) )
+    ExecutionContext.install( tracer, LatencyRecorder(), SpanMetrics() if "metrics" in parsed else None )
+
+    try:
+        asyncio.run( logged( main, parsed ) )
+    finally:
+        if tracer is not None:
+            tracer.close()
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable, ClassVar, Dict, Iterator, List, Tuple
+
+
+class LatencyHistogram:
+    """HDR-style histogram of non negative ints, e.g. nanoseconds.
+
+    Values below ``2 ** BITS`` get a bucket each, and every power of two above is split in ``2 ** (BITS - 1)``
+    buckets, so a bucket is at most 1/128th of its values wide whatever the magnitude, and an hour in nanoseconds
+    takes under 5000 counters. Percentiles are the upper bound of the bucket they fall in.
+    """
+
+    BITS: ClassVar = 8
+    HALF: ClassVar = 1 << (BITS - 1)
+
+    def __init__( self ):
+        self.counts: List[ int ] = [ ]
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def __len__( self ) -> int:
+        return self.count
+
+    def record( self, value: int ) -> None:
+        shift = value.bit_length() - self.BITS
+        index = value if shift <= 0 else shift * self.HALF + (value >> shift)
+        if index >= len( self.counts ):
+            self.counts.extend( [ 0 ] * (index + 1 - len( self.counts )) )
+        self.counts[ index ] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge( self, other: LatencyHistogram ) -> None:
+        if len( other.counts ) > len( self.counts ):
+            self.counts.extend( [ 0 ] * (len( other.counts ) - len( self.counts )) )
+        for index, count in enumerate( other.counts ):
+            self.counts[ index ] += count
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min( self.min, value )
+                self.max = value if self.max is None else max( self.max, value )
+
+    @property
+    def mean( self ) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile( self, q: float ) -> int:
+        """The value ``q`` percent of the records are at or below, 0 when empty."""
+        if not self.count:
+            return 0
+        rank = max( 1, round( q / 100 * self.count ) )
+        seen = 0
+        for index, count in enumerate( self.counts ):
+            seen += count
+            if seen >= rank:
+                return min( self.upper( index ), self.max )
+        return self.max
+
+    def buckets( self ) -> Iterator[ Tuple[ int, int ] ]:
+        """``(upper bound, count)`` of the non empty buckets, ascending."""
+        for index, count in enumerate( self.counts ):
+            if count:
+                yield self.upper( index ), count
+
+    @classmethod
+    def upper( cls, index: int ) -> int:
+        shift = max( 0, index // cls.HALF - 1 )
+        return ((index - shift * cls.HALF + 1) << shift) - 1
+
+
+class LatencyRecorder:
+    """Histograms and error counts per operation, and per operation and ``UrlKinds`` value, over a window.
+
+    ``summary`` reports the window and starts a new one. Thread safe, so a ``LatencyReporter`` can summarize while
+    the event loop records.
+    """
+
+    ALL: ClassVar = "*"
+    QUANTILES: ClassVar = (50, 95, 99)
+
+    def __init__( self ):
+        self._lock = threading.Lock()
+        self._window: Dict[ Tuple[ str, str ], List ] = { }
+        self._since = time.monotonic()
+
+    def record( self, operation: str, kind: str | None, duration: int, failed: bool = False ) -> None:
+        """A ``duration`` in nanoseconds."""
+        keys = ((operation, self.ALL),) if kind is None else ((operation, self.ALL), (operation, kind))
+        with self._lock:
+            for key in keys:
+                entry = self._window.get( key )
+                if entry is None:
+                    entry = self._window[ key ] = [ LatencyHistogram(), 0 ]
+                entry[ 0 ].record( duration )
+                if failed:
+                    entry[ 1 ] += 1
+
+    def snapshot( self ) -> Tuple[ float, Dict[ Tuple[ str, str ], List ] ]:
+        """Seconds since the previous snapshot and ``(operation, kind) → [histogram, errors]`` meanwhile."""
+        with self._lock:
+            window, self._window = self._window, { }
+            since, self._since = self._since, time.monotonic()
+        return self._since - since, window
+
+    def summary( self ) -> str:
+        elapsed, window = self.snapshot()
+        lines = [ f"{'operation':<24} {'kind':<12} {'count':>8} {'per s':>8} {'errors':>7} " +
+                  " ".join( f"{'p' + str( q ) + ' ms':>9}" for q in self.QUANTILES ) ]
+        for (operation, kind), (histogram, errors) in sorted( window.items() ):
+            rate = histogram.count / elapsed if elapsed else 0.0
+            quantiles = " ".join( f"{histogram.percentile( q ) / 1e6:9.2f}" for q in self.QUANTILES )
+            lines.append( f"{operation[ :24 ]:<24} {kind[ :12 ]:<12} {histogram.count:>8} {rate:>8.1f} "
+                          f"{errors / histogram.count:>7.1%} {quantiles}" )
+        return f"Latency over {elapsed:.0f}s\n" + "\n".join( lines )
+
+
+class LatencyReporter:
+    """Emits the ``summary`` of a recorder every ``interval`` seconds from a thread, and a last one on close."""
+
+    INTERVAL: ClassVar = 60.0
+
+    def __init__( self, recorder: LatencyRecorder, emit: Callable[ [ str ], object ], interval: float = None ):
+        self.recorder = recorder
+        self.emit = emit
+        self.interval = interval or self.INTERVAL
+        self._stop = threading.Event()
+        self._thread = threading.Thread( target=self._run, name="latency", daemon=True )
+
+    def __enter__( self ):
+        self._thread.start()
+        return self
+
+    def __exit__( self, exc_type, exc_val, exc_tb ):
+        self._stop.set()
+        self._thread.join()
+
+    def _run( self ) -> None:
+        while not self._stop.wait( self.interval ):
+            self.emit( self.recorder.summary() )
+        self.emit( self.recorder.summary() )
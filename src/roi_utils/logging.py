@@ -1,13 +1,19 @@
+from __future__ import annotations
+
 import asyncio
 import json
+import os
 import queue
+import threading
 import time
 import traceback
-from typing import Protocol, Mapping
+from typing import ClassVar, List, Protocol, Mapping
+
+from roi_utils.latency import LatencyRecorder
+from roi_utils.metrics import SpanMetrics
+from roi_utils.tracing import DONE, FAIL, WARN, Tracer, current_span, span_ids
 
-logging_queue = asyncio.Queue()
 sync_queue = queue.Queue()
-finished = False
 
 
 class Logger( Protocol ):
@@ -23,43 +29,91 @@ class Logger( Protocol ):
 
 
 class ExecutionContext:
+    """Logs the start and the outcome of an operation, or records it as a span once a ``Tracer`` is installed.
+
+    Contexts nest through ``tracing.current_span``, across asyncio tasks too, and every line or span carries its
+    ``span`` and ``parent`` ids. The log lines are only formatted on enter, and with a tracer, nothing is formatted
+    at all unless the span fails, and failed spans are recorded even when they were not sampled. A ``LatencyRecorder`` and ``SpanMetrics`` get the duration of every context,
+    sampled or not.
+    """
+
     blue = "\x1b[0m\x1b[0;34m"
     reset = "\x1b[0m"
     green = "\x1b[0m\x1b[0;32m"
     yellow = "\x1b[0m\x1b[0;33m"
     red = "\x1b[0m\x1b[0;31m"
 
+    tracer: ClassVar[ Tracer | None ] = None
+    latency: ClassVar[ LatencyRecorder | None ] = None
+    metrics: ClassVar[ SpanMetrics | None ] = None
+    sink: ClassVar[ AsyncLogSink | None ] = None
+
     def __init__( self, operation: str, *, extra: Mapping = None,
                   exc_suppress=False,
                   exc_level="error" ):
 
         self.operation = operation
+        self.extra = extra
         self.supress_error = exc_suppress
         self.exception_level = exc_level
-        self.start = time.perf_counter()
+        self.sampled = False
+
+    @classmethod
+    def install( cls, tracer: Tracer | None = None, latency: LatencyRecorder | None = None,
+                 metrics: SpanMetrics | None = None ) -> None:
+        """Records every context as a span of ``tracer`` instead of logging it, and its duration in ``latency`` and
+        ``metrics``. None goes back to logging, and to no aggregation."""
+        cls.tracer = tracer
+        cls.latency = latency
+        cls.metrics = metrics
+
+    def __enter__( self ):
+        self.span = next( span_ids )
+        self.parent = current_span.get()
+        self._token = current_span.set( self.span )
+        self.start = time.perf_counter_ns()
 
-        extra = extra or {}
-        extra = {k: extra[ k ] for k in sorted( extra.keys() )}
+        tracer = self.tracer
+        if tracer is not None:
+            self.sampled = tracer.sampled( self.operation, self.extra.get( "digest" ) if self.extra else None )
+            return
+
+        extra = self.extra or {}
         self.context = {
             "step": "INIT",
-            "start": self.width_value( self.start ),
-            "finish": self.width_value( self.start ),
+            "start": self.width_value( self.start / 1e9 ),
+            "finish": self.width_value( self.start / 1e9 ),
             "duration": self.width_string( "" ),
             "operation": self.operation,
-            **extra,
+            "span": self.span,
+            "parent": self.parent,
+            **{k: extra[ k ] for k in sorted( extra.keys() )},
         }
 
-    def __enter__( self ):
-        self.start = time.perf_counter()
-        self.context[ "start" ] = self.width_value( self.start )
-
-        msg = self.as_message( self.blue, self.context )
-        sync_queue.put( ("info", msg) )
+        self.emit( "info", self.as_message( self.blue, self.context ) )
 
     def __exit__( self, exc_type, exc_val, exc_tb ):
-        finish = time.perf_counter()
-        self.context[ "finish" ] = self.width_value( finish )
-        self.context[ "duration" ] = self.width_value( finish - self.start )
+        finish = time.perf_counter_ns()
+        try:
+            current_span.reset( self._token )
+        except ValueError:
+            # exited in another context than entered, e.g. an async generator closed by a different task
+            current_span.set( self.parent )
+
+        if self.latency is not None or self.metrics is not None:
+            kind = self.extra.get( "kind" ) if self.extra else None
+            for recorder in (self.latency, self.metrics):
+                if recorder is not None:
+                    recorder.record( self.operation, kind, finish - self.start, exc_val is not None )
+
+        if self.tracer is not None:
+            # failures are kept whatever the sampling, they are what a trace is read for
+            if self.sampled or exc_val is not None and self.tracer.traced( self.operation ):
+                self.trace( exc_type, exc_val, exc_tb, finish )
+            return True if exc_val and self.supress_error else None
+
+        self.context[ "finish" ] = self.width_value( finish / 1e9 )
+        self.context[ "duration" ] = self.width_value( (finish - self.start) / 1e9 )
 
         if not exc_val:
             self.context[ "step" ] = "DONE"
@@ -77,12 +131,31 @@ class ExecutionContext:
             level = self.exception_level
             color = self.red
 
-        msg = self.as_message( color, self.context )
-        sync_queue.put( (level, msg) )
+        self.emit( level, self.as_message( color, self.context ) )
 
         if exc_val and self.supress_error:
             return True
 
+    def emit( self, level: str, message: str ) -> None:
+        """To the open ``AsyncLogSink``, or to ``sync_queue`` for the ``log`` thread."""
+        sink = self.sink
+        if sink is not None:
+            sink.write( level, message )
+        else:
+            sync_queue.put( (level, message) )
+
+    def trace( self, exc_type, exc_val, exc_tb, finish: int ):
+        if not exc_val:
+            status, error = DONE, None
+        elif self.exception_level == "warn":
+            status, error = WARN, self.as_error( exc_type, exc_val )
+        else:
+            status, error = FAIL, self.as_error( exc_type, exc_val ) + "\n" + self.as_traceback( exc_tb )
+
+        digest = self.extra.get( "digest" ) if self.extra else None
+        self.tracer.record( self.operation, self.start, finish, status, digest, self.extra, error,
+                            self.span, self.parent )
+
     @classmethod
     def as_message( cls, color, mapping ):
         return color + json.dumps( mapping ) + cls.reset
@@ -104,25 +177,108 @@ class ExecutionContext:
         return "\n".join( traceback.format_tb( tb )[ :5 ] )
 
 
-async def asyncLog( logger ):
-    ...
+class AsyncLogSink:
+    """Log lines buffered in memory and written to a file descriptor in batches by a task of the event loop.
+
+    ``write`` only appends to a list under a lock, from any thread. The batch goes out in one ``os.writev`` call ( on a worker
+    thread, so a slow terminal does not stall the loop ) once ``max_bytes`` are buffered or ``max_delay`` seconds
+    after the previous batch, whichever comes first. Entering installs the sink for every ``ExecutionContext``, and
+    exiting writes what is left before it returns.
+    """
+
+    MAX_BYTES: ClassVar = 64 * 1024
+    MAX_DELAY: ClassVar = 0.5
+    IOV_MAX: ClassVar = os.sysconf( "SC_IOV_MAX" ) if hasattr( os, "sysconf" ) else 1024
+
+    def __init__( self, fd: int, max_bytes: int = None, max_delay: float = None ):
+        self.fd = fd
+        self.max_bytes = max_bytes or self.MAX_BYTES
+        self.max_delay = max_delay or self.MAX_DELAY
+        self.written = 0
+
+        self._buffer: List[ bytes ] = [ ]
+        self._size = 0
+        self._loop = None
+        self._wake = None
+        self._task = None
+        self._closing = False
+        self._previous = None
+        # guards the buffer, held only to append or swap it
+        self._lock = threading.Lock()
+        # keeps the batches in order, held for the whole write
+        self._writing = threading.Lock()
+
+    async def __aenter__( self ):
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task( self._drain() )
+        self._previous, ExecutionContext.sink = ExecutionContext.sink, self
+        return self
+
+    async def __aexit__( self, exc_type, exc_val, exc_tb ):
+        ExecutionContext.sink = self._previous
+        self._closing = True
+        self._wake.set()
+        await self._task
+
+    def write( self, level: str, message: str ) -> None:
+        line = (message + "\n").encode( errors="replace" )
+        with self._lock:
+            self._buffer.append( line )
+            self._size += len( line )
+            full = self._size >= self.max_bytes
+        if full and self._wake is not None and not self._wake.is_set():
+            self._loop.call_soon_threadsafe( self._wake.set )
+
+    async def flush( self ) -> None:
+        await asyncio.to_thread( self._flush )
+
+    # region internals
+    def _flush( self ) -> None:
+        with self._writing:
+            with self._lock:
+                batch, self._buffer = self._buffer, [ ]
+                self._size = 0
+            self._write( batch )
+
+    async def _drain( self ) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for( self._wake.wait(), self.max_delay )
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if self._buffer:
+                await self.flush()
+        # lines of the threads still running go out too
+        self._flush()
+
+    def _write( self, batch: List[ bytes ] ) -> None:
+        for i in range( 0, len( batch ), self.IOV_MAX ):
+            buffers = batch[ i:i + self.IOV_MAX ]
+            remaining = sum( len( buffer ) for buffer in buffers )
+            while remaining:
+                written = os.writev( self.fd, buffers )
+                self.written += written
+                remaining -= written
+                if remaining:
+                    # a partial write, e.g. a full pipe
+                    buffers = [ b"".join( buffers )[ written: ] ]
+    # endregion
 
 
 def log( logger, this_queue: queue.Queue ):
-    i = 0
+    """Drains ``this_queue`` into a stdlib logger, until it gets None."""
     while True:
+        item = this_queue.get()
+        if item is None:
+            return
 
-        try:
-            level, msg = this_queue.get( timeout=1 )
-
-            match level:
-                case 'info':
-                    logger.info( msg )
-                case 'warn':
-                    logger.warning( msg )
-                case 'error':
-                    logger.error( msg )
-
-        except Exception as e:
-            if finished:
-                return
+        level, msg = item
+        match level:
+            case 'info':
+                logger.info( msg )
+            case 'warn':
+                logger.warning( msg )
+            case 'error':
+                logger.error( msg )
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+from typing import Any, AsyncIterable, Awaitable, Callable, ClassVar, Iterable, List
+
+from roi_utils.metrics import registry
+
+QUEUE_DEPTH = registry.gauge( "roi_pipeline_queue_depth", "Items waiting for the workers of a stage", ("stage",) )
+ITEMS = registry.counter( "roi_pipeline_items_total", "Items a stage is done with, by outcome", ("stage", "outcome") )
+
+
+@dataclass
+class Stage:
+    name: str
+    fn: Callable[ [ Any ], Awaitable[ Any ] ]
+    workers: int = 1
+    capacity: int = 100
+    done: int = 0
+    failed: int = 0
+
+
+class Pipeline:
+    """Runs items through a chain of async stages connected by bounded queues.
+
+    Every stage has its own pool of workers pulling from its input queue, so all stages overlap continuously and a
+    full queue makes the previous stage wait instead of piling up work. A stage returning ``None`` or raising drops
+    the item; stages are expected to report their own failures.
+
+    ``done`` is called with every source item once it has left the pipeline, with None through the last stage ( or
+    a stage returning ``None`` ) and with the exception that dropped it otherwise, e.g. to checkpoint a source only
+    past what is settled and keep the failures for a retry.
+    """
+
+    _DONE: ClassVar = object()
+
+    def __init__( self, *stages: Stage ):
+        self.stages = stages
+        self.done: Callable[ [ Any, BaseException | None ], object ] | None = None
+
+    async def run( self, source: Iterable | AsyncIterable,
+                   done: Callable[ [ Any, BaseException | None ], object ] = None ) -> None:
+        self.done = done
+        queues = [ asyncio.Queue( stage.capacity ) for stage in self.stages ]
+        tasks: List[ asyncio.Task ] = [ ]
+
+        for i, stage in enumerate( self.stages ):
+            output = queues[ i + 1 ] if i + 1 < len( queues ) else None
+            workers = [ asyncio.create_task( self._work( stage, queues[ i ], output ) ) for _ in range( stage.workers ) ]
+            tasks.append( asyncio.create_task( self._close( workers, output, self.stages[ i + 1 ] if output else None ) ) )
+            tasks.extend( workers )
+
+        # read on scrape while this run lasts, the stages keep counting as they did
+        def depths():
+            return {(stage.name,): queue.qsize() for stage, queue in zip( self.stages, queues )}
+
+        QUEUE_DEPTH.collect( depths )
+        ITEMS.collect( self._counts )
+
+        feeder = asyncio.create_task( self._feed( source, queues[ 0 ], self.stages[ 0 ].workers ) )
+        try:
+            await asyncio.gather( feeder, *tasks )
+        finally:
+            for task in [ feeder, *tasks ]:
+                task.cancel()
+            QUEUE_DEPTH.discard( depths )
+            ITEMS.discard( self._counts )
+
+    def _counts( self ):
+        counts = { }
+        for stage in self.stages:
+            counts[ (stage.name, "done") ] = stage.done
+            counts[ (stage.name, "failed") ] = stage.failed
+        return counts
+
+    async def _feed( self, source: Iterable | AsyncIterable, queue: asyncio.Queue, workers: int ) -> None:
+        # items travel with the source item they come from
+        if isinstance( source, AsyncIterable ):
+            async for item in source:
+                await queue.put( (item, item) )
+        else:
+            for item in source:
+                await queue.put( (item, item) )
+
+        for _ in range( workers ):
+            await queue.put( self._DONE )
+
+    async def _work( self, stage: Stage, inbox: asyncio.Queue, outbox: asyncio.Queue | None ) -> None:
+        while True:
+            entry = await inbox.get()
+            if entry is self._DONE:
+                return
+
+            origin, item = entry
+            try:
+                result = await stage.fn( item )
+            except Exception as error:
+                stage.failed += 1
+                self._settle( origin, error )
+                continue
+
+            stage.done += 1
+            if result is not None and outbox is not None:
+                await outbox.put( (origin, result) )
+            else:
+                self._settle( origin, None )
+
+    def _settle( self, origin: Any, error: BaseException | None ) -> None:
+        if self.done is not None:
+            self.done( origin, error )
+
+    async def _close( self, workers: List[ asyncio.Task ], outbox: asyncio.Queue | None, following: Stage | None ) -> None:
+        await asyncio.gather( *workers )
+        if outbox is not None:
+            for _ in range( following.workers ):
+                await outbox.put( self._DONE )
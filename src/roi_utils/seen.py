@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import bisect
+import mmap
+import os
+import pathlib
+from typing import ClassVar, Iterable, Set
+
+
+class _Digests:
+    """Sequence view over a memory-mapped array of fixed width digests."""
+    __slots__ = ("buffer", "width")
+
+    def __init__( self, buffer, width: int ):
+        self.buffer = buffer
+        self.width = width
+
+    def __len__( self ) -> int:
+        return len( self.buffer ) // self.width if self.buffer is not None else 0
+
+    def __getitem__( self, i: int ) -> bytes:
+        start = i * self.width
+        return self.buffer[ start:start + self.width ]
+
+
+class SeenIndex:
+    """On-disk set of md5 digests.
+
+    The bulk lives in ``seen.sorted`` as a sorted array of raw 16-byte digests that is
+    memory-mapped and binary searched, so opening it costs nothing regardless of size.
+    New digests are appended to ``seen.log`` and kept in memory until ``compact`` merges
+    them into the sorted array.
+    """
+
+    WIDTH: ClassVar = 16
+    COMPACT_THRESHOLD: ClassVar = 100_000
+    SORTED_NAME: ClassVar = "seen.sorted"
+    LOG_NAME: ClassVar = "seen.log"
+
+    def __init__( self, path: pathlib.Path ):
+        self.path = pathlib.Path( path )
+        self.path.mkdir( parents=True, exist_ok=True )
+
+        self._map = None
+        self._sorted = _Digests( None, self.WIDTH )
+        self._open_sorted()
+
+        self._recent: Set[ bytes ] = set()
+        self._load_log()
+        self._log = open( self.path / self.LOG_NAME, "ab" )
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, exc_type, exc_val, exc_tb ):
+        self.close()
+
+    def __len__( self ) -> int:
+        return len( self._sorted ) + len( self._recent )
+
+    def __contains__( self, digest: str | bytes ) -> bool:
+        key = self._key( digest )
+        if key in self._recent:
+            return True
+
+        i = bisect.bisect_left( self._sorted, key )
+        return i < len( self._sorted ) and self._sorted[ i ] == key
+
+    def add( self, digest: str | bytes ) -> None:
+        key = self._key( digest )
+        if key in self:
+            return
+
+        self._log.write( key )
+        self._log.flush()
+        self._recent.add( key )
+
+    def update( self, digests: Iterable[ str | bytes ] ) -> None:
+        for digest in digests:
+            self.add( digest )
+
+    def compact( self ) -> None:
+        if not self._recent:
+            return
+
+        merged = sorted( self._recent.union( self._sorted[ i ] for i in range( len( self._sorted ) ) ) )
+        temporary = self.path / (self.SORTED_NAME + ".tmp")
+        with open( temporary, "wb" ) as file:
+            file.write( b"".join( merged ) )
+
+        self._close_sorted()
+        os.replace( temporary, self.path / self.SORTED_NAME )
+        self._open_sorted()
+
+        self._log.truncate( 0 )
+        self._recent.clear()
+
+    def close( self ) -> None:
+        if len( self._recent ) >= self.COMPACT_THRESHOLD:
+            self.compact()
+        self._log.close()
+        self._close_sorted()
+
+    # region internals
+    @classmethod
+    def _key( cls, digest: str | bytes ) -> bytes:
+        return bytes.fromhex( digest ) if isinstance( digest, str ) else digest
+
+    def _open_sorted( self ) -> None:
+        file = self.path / self.SORTED_NAME
+        if not file.exists() or file.stat().st_size == 0:
+            return
+
+        with open( file, "rb" ) as handle:
+            self._map = mmap.mmap( handle.fileno(), 0, access=mmap.ACCESS_READ )
+        self._sorted = _Digests( self._map, self.WIDTH )
+
+    def _close_sorted( self ) -> None:
+        if self._map is not None:
+            self._map.close()
+        self._map = None
+        self._sorted = _Digests( None, self.WIDTH )
+
+    def _load_log( self ) -> None:
+        file = self.path / self.LOG_NAME
+        if not file.exists():
+            return
+
+        payload = file.read_bytes()
+        usable = len( payload ) - len( payload ) % self.WIDTH
+        self._recent = {payload[ i:i + self.WIDTH ] for i in range( 0, usable, self.WIDTH )}
+        if usable != len( payload ):
+            os.truncate( file, usable )
+    # endregion
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import os
+import pathlib
+import struct
+from typing import ClassVar, Dict, Iterator, NamedTuple, Tuple, BinaryIO
+
+
+class Location( NamedTuple ):
+    segment: int
+    offset: int
+    length: int
+
+
+class OffsetIndex:
+    """Digest to ``Location`` map persisted as an append only file of fixed size entries."""
+
+    ENTRY: ClassVar = struct.Struct( ">16sIQI" )
+
+    def __init__( self, file: pathlib.Path ):
+        self.entries: Dict[ bytes, Location ] = {}
+        self._load( pathlib.Path( file ) )
+        self._file = open( file, "ab" )
+
+    def __len__( self ) -> int:
+        return len( self.entries )
+
+    def __iter__( self ) -> Iterator[ bytes ]:
+        return iter( self.entries )
+
+    def __contains__( self, key: bytes ) -> bool:
+        return key in self.entries
+
+    def get( self, key: bytes ) -> Location | None:
+        return self.entries.get( key )
+
+    def values( self ):
+        return self.entries.values()
+
+    def add( self, key: bytes, location: Location ) -> None:
+        self._file.write( self.ENTRY.pack( key, *location ) )
+        self._file.flush()
+        self.entries[ key ] = location
+
+    def close( self ) -> None:
+        self._file.close()
+
+    def _load( self, file: pathlib.Path ) -> None:
+        if not file.exists():
+            return
+
+        payload = file.read_bytes()
+        usable = len( payload ) - len( payload ) % self.ENTRY.size
+        if usable != len( payload ):
+            # torn write of the last entry, whoever owns the records is expected to recover it
+            os.truncate( file, usable )
+
+        for key, segment, offset, length in self.ENTRY.iter_unpack( payload[ :usable ] ):
+            self.entries[ key ] = Location( segment, offset, length )
+
+
+class SegmentStore:
+    """Append-only store of digest keyed records.
+
+    Records are written as ``digest | length | payload`` into rolling segment files,
+    and every write appends a fixed size entry to ``index.dat``, so opening the store
+    only reads the index instead of touching every record. A record written after the
+    last index entry ( e.g. a crash between both writes ) is recovered by scanning the
+    tail of the segments. The latest record of a digest wins.
+    """
+
+    RECORD_HEADER: ClassVar = struct.Struct( ">16sI" )
+    SEGMENT_SIZE: ClassVar = 256 * 1024 * 1024
+    SEGMENT_PATTERN: ClassVar = "segment-{:06d}.dat"
+    INDEX_NAME: ClassVar = "index.dat"
+
+    def __init__( self, path: pathlib.Path, segment_size: int = None ):
+        self.path = pathlib.Path( path )
+        self.path.mkdir( parents=True, exist_ok=True )
+        self.segment_size = segment_size or self.SEGMENT_SIZE
+
+        self.index = OffsetIndex( self.path / self.INDEX_NAME )
+        self._readers: Dict[ int, BinaryIO ] = {}
+
+        self._segment = max( self._segments(), default=0 )
+        self._writer = open( self._segment_path( self._segment ), "ab" )
+        self._recover()
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, exc_type, exc_val, exc_tb ):
+        self.close()
+
+    def __len__( self ) -> int:
+        return len( self.index )
+
+    def __contains__( self, digest: str ) -> bool:
+        return self.contains( digest )
+
+    def contains( self, digest: str ) -> bool:
+        return bytes.fromhex( digest ) in self.index
+
+    def put( self, digest: str, payload: bytes ) -> Location:
+        key = bytes.fromhex( digest )
+        size = self.RECORD_HEADER.size + len( payload )
+
+        if self._writer.tell() and self._writer.tell() + size > self.segment_size:
+            self._roll()
+
+        offset = self._writer.tell() + self.RECORD_HEADER.size
+        self._writer.write( self.RECORD_HEADER.pack( key, len( payload ) ) )
+        self._writer.write( payload )
+        self._writer.flush()
+
+        location = Location( self._segment, offset, len( payload ) )
+        self.index.add( key, location )
+        return location
+
+    def get( self, digest: str ) -> bytes | None:
+        location = self.index.get( bytes.fromhex( digest ) )
+        if location is None:
+            return None
+
+        reader = self._reader( location.segment )
+        reader.seek( location.offset )
+        return reader.read( location.length )
+
+    def scan( self ) -> Iterator[ Tuple[ str, bytes ] ]:
+        """Sequentially reads every live record, skipping the ones superseded by a later put."""
+        for segment in sorted( self._segments() ):
+            for key, location, payload in self._records( segment ):
+                if self.index.get( key ) == location:
+                    yield key.hex(), payload
+
+    def close( self ) -> None:
+        self._writer.close()
+        self.index.close()
+        for reader in self._readers.values():
+            reader.close()
+        self._readers.clear()
+
+    # region internals
+    def _segment_path( self, segment: int ) -> pathlib.Path:
+        return self.path / self.SEGMENT_PATTERN.format( segment )
+
+    def _segments( self ) -> Iterator[ int ]:
+        for file in self.path.glob( "segment-*.dat" ):
+            yield int( file.stem.split( "-" )[ 1 ] )
+
+    def _reader( self, segment: int ) -> BinaryIO:
+        reader = self._readers.get( segment )
+        if reader is None:
+            reader = self._readers[ segment ] = open( self._segment_path( segment ), "rb" )
+        return reader
+
+    def _roll( self ) -> None:
+        self._writer.close()
+        reader = self._readers.pop( self._segment, None )
+        if reader is not None:
+            reader.close()
+        self._segment += 1
+        self._writer = open( self._segment_path( self._segment ), "ab" )
+
+    def _recover( self ) -> None:
+        indexed = max( self.index.values(), default=Location( 0, 0, 0 ) )
+        start = indexed.offset + indexed.length if len( self.index ) else 0
+
+        for segment in sorted( s for s in self._segments() if s >= indexed.segment ):
+            position = start if segment == indexed.segment else 0
+            for key, location, _ in self._records( segment, position ):
+                self.index.add( key, location )
+                position = location.offset + location.length
+
+            if segment == self._segment and position < self._writer.tell():
+                # partial record at the tail of the active segment
+                self._writer.truncate( position )
+                self._writer.seek( position )
+
+    def _records( self, segment: int, position: int = 0 ) -> Iterator[ Tuple[ bytes, Location, bytes ] ]:
+        header = self.RECORD_HEADER
+        with open( self._segment_path( segment ), "rb" ) as file:
+            file.seek( position )
+            while True:
+                head = file.read( header.size )
+                if len( head ) < header.size:
+                    return
+                key, length = header.unpack( head )
+                payload = file.read( length )
+                if len( payload ) < length:
+                    return
+                yield key, Location( segment, position + header.size, length ), payload
+                position += header.size + length
+    # endregion
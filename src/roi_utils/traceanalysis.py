@@ -0,0 +1,657 @@
+from __future__ import annotations
+
+import argparse
+import collections
+import hashlib
+import heapq
+import html
+import json
+import math
+import pathlib
+import sys
+import zlib
+from dataclasses import dataclass, field
+from typing import ClassVar, Counter, Dict, Iterable, Iterator, List, Mapping, NamedTuple, Tuple
+
+from roi_utils.latency import LatencyHistogram
+from roi_utils.tracing import BinaryExporter
+
+
+class TraceSpan( NamedTuple ):
+    operation: str
+    start: float
+    finish: float
+    step: str
+    digest: str | None = None
+    kind: str | None = None
+    host: str | None = None
+    error: str | None = None
+    span: int = 0
+    parent: int = 0
+
+    @property
+    def duration( self ) -> float:
+        return self.finish - self.start
+
+    @property
+    def failed( self ) -> bool:
+        return self.step in ("FAIL", "WARN")
+
+
+def seconds( value ) -> float:
+    """The log lines have seconds of ``perf_counter`` as padded strings, the tracer nanoseconds since the epoch."""
+    value = float( value )
+    return value / 1e9 if value > 1e11 else value
+
+
+class TraceReader:
+    """Spans of ``ExecutionContext`` log lines ( INIT then DONE / WARN / FAIL ) or of ``JsonlExporter`` files.
+
+    Lines are read one at a time, and an INIT only waits for its outcome, keyed by span id or else by digest,
+    operation and start, so memory follows the spans in flight rather than the length of the trace. Lines that are not JSON
+    ( colors around them are fine ) are counted in ``invalid``, and what never finished comes out last, as OPEN
+    spans ending with the trace.
+    """
+
+    def __init__( self ):
+        self.lines = 0
+        self.invalid = 0
+        self.last = 0.0
+        self.open: Dict[ object, TraceSpan ] = { }
+        self.open_digests: Counter[ str ] = collections.Counter()
+
+    def read( self, lines: Iterable[ str ] ) -> Iterator[ TraceSpan ]:
+        for line in lines:
+            self.lines += 1
+            record = self.parse( line )
+            if record is None:
+                self.invalid += 1
+                continue
+
+            span = self.span( record )
+            self.last = max( self.last, span.finish )
+            key = span.span or (span.digest, span.operation, span.start)
+            if span.step == "INIT":
+                self.open[ key ] = span
+                if span.digest is not None:
+                    self.open_digests[ span.digest ] += 1
+                continue
+
+            opened = self.open.pop( key, None )
+            if opened is not None and opened.digest is not None:
+                self._close( opened.digest )
+            yield span
+
+        for span in self.open.values():
+            yield span._replace( step="OPEN", finish=max( self.last, span.start ) )
+        self.open.clear()
+        self.open_digests.clear()
+
+    def read_binary( self, path: pathlib.Path ) -> Iterator[ TraceSpan ]:
+        """The spans of a ``BinaryExporter`` directory, oldest file first."""
+        for file in sorted( pathlib.Path( path ).glob( "trace-*.bin" ) ):
+            for span in BinaryExporter.read( file ):
+                self.lines += 1
+                attributes = span.attributes or { }
+                yield TraceSpan( span.operation, span.start / 1e9, span.finish / 1e9, span.step, span.digest,
+                                 attributes.get( "kind" ), attributes.get( "host" ),
+                                 span.error.splitlines()[ 0 ] if span.error else None, span.span, span.parent )
+
+    @staticmethod
+    def parse( line: str ) -> Mapping | None:
+        first, last = line.find( "{" ), line.rfind( "}" )
+        if first < 0 or last < first:
+            return None
+        try:
+            record = json.loads( line[ first:last + 1 ] )
+        except ValueError:
+            return None
+        if not isinstance( record, dict ) or "operation" not in record or "start" not in record:
+            return None
+        return record
+
+    @staticmethod
+    def span( record: Mapping ) -> TraceSpan:
+        start = seconds( record[ "start" ] )
+        finish = seconds( record.get( "finish" ) or record[ "start" ] )
+        error = record.get( "error" )
+        return TraceSpan( record[ "operation" ], start, max( start, finish ), record.get( "step", "DONE" ),
+                          record.get( "digest" ), record.get( "kind" ), record.get( "host" ),
+                          error.splitlines()[ 0 ] if error else None,
+                          record.get( "span", 0 ), record.get( "parent", 0 ) )
+
+    def _close( self, digest: str ) -> None:
+        self.open_digests[ digest ] -= 1
+        if self.open_digests[ digest ] <= 0:
+            del self.open_digests[ digest ]
+
+
+@dataclass
+class Stats:
+    COLUMNS: ClassVar = ("count", "errors", "open", "p50 s", "p95 s", "p99 s", "max s", "total s")
+
+    histogram: LatencyHistogram = field( default_factory=LatencyHistogram )
+    errors: int = 0
+    open: int = 0
+
+    def add( self, span: TraceSpan ) -> None:
+        self.histogram.record( round( span.duration * 1e9 ) )
+        self.errors += span.failed
+        self.open += span.step == "OPEN"
+
+    def row( self ) -> Tuple:
+        """The ``COLUMNS``."""
+        histogram = self.histogram
+        return (histogram.count, self.errors, self.open, *(f"{histogram.percentile( q ) / 1e9:.2f}" for q in (50, 95, 99)),
+                f"{(histogram.max or 0) / 1e9:.2f}", f"{histogram.total / 1e9:.1f}")
+
+
+@dataclass
+class HostStats:
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    slow: int = 0
+    failed: int = 0
+
+
+class TraceAnalysis:
+    """Aggregates of a stream of ``TraceSpan``, in memory that does not grow with the length of the trace.
+
+    * latency per operation, and per operation and ``UrlKinds`` value, as ``LatencyHistogram``
+    * the critical path of every URL: its spans are kept until a ``terminal`` operation ends with nothing of the
+      URL still open ( or ``idle`` seconds without news, or past ``max_urls`` pending ), then nested by time
+      containment, and the time of the URL split between the leaf spans in turn, the gaps between them ( waiting in
+      a queue of the pipeline ) and what the enclosing spans do past their last child
+    * per host fetch stragglers, fetches over ``slow`` seconds, the host coming from the ``host`` of the records or
+      the ``hosts`` map of digests
+    * the average number of spans running per operation in bins of ``width`` seconds
+    * the folded stacks ( kind, enclosing operations, operation ) of the self time of the URL spans, for a flamegraph
+    """
+
+    FETCH: ClassVar = "Fetching Raw"
+    TERMINAL: ClassVar = ("Processing url", "Persist Processed")
+    WAITING: ClassVar = "( waiting )"
+    OVERHEAD: ClassVar = "( enclosing )"
+    MAX_ERRORS: ClassVar = 1000
+    # bins of one span, past which it is a broken record rather than a long span
+    MAX_BINS: ClassVar = 1 << 20
+
+    def __init__( self, width: float = 1.0, slow: float = 10.0, top: int = 20, idle: float = 600.0,
+                  max_urls: int = 50_000, hosts: Mapping[ str, str ] = None, terminal: Iterable[ str ] = None ):
+        self.width = width
+        self.slow = slow
+        self.top = top
+        self.idle = idle
+        self.max_urls = max_urls
+        self.hosts = hosts or { }
+        self.terminal = frozenset( terminal or self.TERMINAL )
+
+        self.spans = 0
+        self.first = math.inf
+        self.last = -math.inf
+        self.operations: Dict[ str, Stats ] = collections.defaultdict( Stats )
+        self.kinds: Dict[ Tuple[ str, str ], Stats ] = collections.defaultdict( Stats )
+        self.errors: Counter[ Tuple[ str, str ] ] = collections.Counter()
+
+        self.urls = 0
+        self.end_to_end = LatencyHistogram()
+        self.critical: Counter[ str ] = collections.Counter()
+        self.slowest: List[ Tuple[ float, int, str, Dict ] ] = [ ]
+        self.folded: Counter[ str ] = collections.Counter()
+        self._pending: Dict[ str, List[ TraceSpan ] ] = collections.OrderedDict()
+        self._seen: Dict[ str, float ] = { }
+
+        self.host_stats: Dict[ str, HostStats ] = collections.defaultdict( HostStats )
+        self.stragglers: List[ Tuple[ float, str, str ] ] = [ ]
+
+        self.running: Dict[ str, Dict[ int, float ] ] = collections.defaultdict( lambda: collections.defaultdict( float ) )
+
+    def add( self, span: TraceSpan, still_open: bool = False ) -> None:
+        self.spans += 1
+        self.first = min( self.first, span.start )
+        self.last = max( self.last, span.finish )
+
+        self.operations[ span.operation ].add( span )
+        if span.kind is not None:
+            self.kinds[ (span.operation, span.kind) ].add( span )
+        if span.error and (len( self.errors ) < self.MAX_ERRORS or (span.operation, span.error) in self.errors):
+            self.errors[ (span.operation, span.error) ] += 1
+
+        self._run( span )
+        if span.operation == self.FETCH:
+            self._fetch( span )
+        if span.digest is not None:
+            self._url( span, still_open )
+
+    def analyze( self, reader: TraceReader, spans: Iterable[ TraceSpan ] ) -> TraceAnalysis:
+        for span in spans:
+            self.add( span, span.digest in reader.open_digests )
+        self.close()
+        return self
+
+    def close( self ) -> None:
+        """Takes in the URLs still pending, at the end of the trace."""
+        while self._pending:
+            self._finalize( next( iter( self._pending ) ) )
+
+    # region reports
+    def concurrency( self, columns: int = 600 ) -> Tuple[ float, float, Dict[ str, List[ float ] ] ]:
+        """``(start, column width, operation → average spans running per column)``, at most ``columns`` wide."""
+        if not self.running:
+            return 0.0, self.width, { }
+        first = min( min( bins ) for bins in self.running.values() )
+        last = max( max( bins ) for bins in self.running.values() )
+        merge = max( 1, math.ceil( (last - first + 1) / columns ) )
+        series = { }
+        for operation, bins in sorted( self.running.items() ):
+            values = [ 0.0 ] * ((last - first) // merge + 1)
+            for index, busy in bins.items():
+                values[ (index - first) // merge ] += busy / (self.width * merge)
+            series[ operation ] = values
+        return first * self.width, self.width * merge, series
+
+    @property
+    def elapsed( self ) -> float:
+        return self.last - self.first if self.spans else 0.0
+
+    def summary( self ) -> str:
+        return f"{self.spans} spans over {self.elapsed:.1f}s, {self.urls} urls"
+
+    def end_to_end_summary( self ) -> str:
+        return f"end to end p50 {self.end_to_end.percentile( 50 ) / 1e9:.2f}s, " \
+               f"p95 {self.end_to_end.percentile( 95 ) / 1e9:.2f}s, max {(self.end_to_end.max or 0) / 1e9:.2f}s"
+
+    def text( self, title: str = "" ) -> str:
+        lines = [ title + self.summary() ]
+
+        lines += [ "", self._row( "operation", *Stats.COLUMNS ) ]
+        for operation, stats in sorted( self.operations.items(), key=lambda item: -item[ 1 ].histogram.total ):
+            lines.append( self._row( operation, *stats.row() ) )
+
+        lines += [ "", self._row( "operation / kind", *Stats.COLUMNS ) ]
+        for (operation, kind), stats in sorted( self.kinds.items() ):
+            lines.append( self._row( f"{operation} / {kind}", *stats.row() ) )
+
+        total = sum( self.critical.values() )
+        if total:
+            lines += [ "", f"critical path of {self.urls} urls, {self.end_to_end_summary()}",
+                       self._row( "stage", "share", "total s", "per url s" ) ]
+            for stage, value in self.critical.most_common():
+                lines.append( self._row( stage, f"{value / total:.1%}", f"{value:.1f}", f"{value / self.urls:.3f}" ) )
+
+            lines += [ "", self._row( "slowest urls", "seconds", "kind", "breakdown" ) ]
+            for duration, _, digest, detail in sorted( self.slowest, reverse=True ):
+                breakdown = ", ".join( f"{stage} {value:.2f}" for stage, value in detail[ "stages" ].items() )
+                lines.append( self._row( digest, f"{duration:.2f}", detail[ "kind" ] or "", breakdown ) )
+
+        if self.host_stats:
+            lines += [ "", self._row( f"hosts over {self.slow:g}s", "fetches", "slow", "failed", "max s", "mean s" ) ]
+            for host, stats in self.straggling_hosts():
+                lines.append( self._row( host, stats.count, stats.slow, stats.failed, f"{stats.max:.2f}",
+                                         f"{stats.total / stats.count:.2f}" ) )
+
+        start, width, series = self.concurrency()
+        if series:
+            lines += [ "", self._row( "concurrency", "peak", "mean" ) ]
+            for operation, values in series.items():
+                lines.append( self._row( operation, f"{max( values ):.1f}", f"{sum( values ) / len( values ):.1f}" ) )
+
+        if self.errors:
+            lines += [ "", self._row( "errors", "count", "error" ) ]
+            for (operation, error), count in self.errors.most_common( self.top ):
+                lines.append( self._row( operation, count, error ) )
+        return "\n".join( lines ) + "\n"
+
+    def folded_stacks( self ) -> Iterator[ str ]:
+        """``frame;frame;frame milliseconds`` lines, for flamegraph.pl, speedscope or inferno."""
+        for stack, nanoseconds in sorted( self.folded.items() ):
+            milliseconds = round( nanoseconds / 1e6 )
+            if milliseconds:
+                yield f"{stack} {milliseconds}"
+
+    def html( self, title: str = "Trace analysis" ) -> str:
+        return HtmlReport( self ).render( title )
+
+    def straggling_hosts( self ) -> List[ Tuple[ str, HostStats ] ]:
+        """The ``top`` hosts by slow fetches, then by slowest fetch."""
+        hosts = sorted( self.host_stats.items(), key=lambda item: (-item[ 1 ].slow, -item[ 1 ].max) )
+        return hosts[ :self.top ]
+    # endregion
+
+    # region internals
+    def _run( self, span: TraceSpan ) -> None:
+        first, last = int( span.start // self.width ), int( span.finish // self.width )
+        if last - first > self.MAX_BINS:
+            return
+        bins = self.running[ span.operation ]
+        if first == last:
+            bins[ first ] += span.duration
+            return
+        for index in range( first, last + 1 ):
+            bins[ index ] += min( span.finish, (index + 1) * self.width ) - max( span.start, index * self.width )
+
+    def _fetch( self, span: TraceSpan ) -> None:
+        host = span.host or self.hosts.get( span.digest ) or "( unknown )"
+        stats = self.host_stats[ host ]
+        stats.count += 1
+        stats.total += span.duration
+        stats.max = max( stats.max, span.duration )
+        stats.failed += span.failed
+        if span.duration >= self.slow:
+            stats.slow += 1
+        self._keep( self.stragglers, (span.duration, host, span.digest or "") )
+
+    def _url( self, span: TraceSpan, still_open: bool ) -> None:
+        spans = self._pending.get( span.digest )
+        if spans is None:
+            spans = self._pending[ span.digest ] = [ ]
+        else:
+            self._pending.move_to_end( span.digest )
+        spans.append( span )
+        self._seen[ span.digest ] = span.finish
+
+        if span.operation in self.terminal and not still_open:
+            self._finalize( span.digest )
+
+        # the oldest URLs first, they are in order of last activity
+        while self._pending:
+            oldest = next( iter( self._pending ) )
+            if len( self._pending ) <= self.max_urls and self._seen[ oldest ] + self.idle >= span.finish:
+                break
+            self._finalize( oldest )
+
+    def _finalize( self, digest: str ) -> None:
+        spans = self._pending.pop( digest )
+        del self._seen[ digest ]
+        parents, children = self._nest( spans )
+        kind = next( (span.kind for span in spans if span.kind), None ) or "( unknown )"
+        self._fold( spans, parents, children, kind )
+
+        # a run per top level span with children ( the same URL may be processed twice at once ), the top level
+        # leaves together ( the stages of a pipeline )
+        runs = collections.defaultdict( list )
+        for i in range( len( spans ) ):
+            top = i
+            while top in parents:
+                top = parents[ top ]
+            runs[ top if top in children else None ].append( i )
+        for run in runs.values():
+            self._critical( digest, kind, [ spans[ i ] for i in run ], [ spans[ i ] for i in run if i not in children ] )
+
+    def _critical( self, digest: str, kind: str, run: List[ TraceSpan ], leaves: List[ TraceSpan ] ) -> None:
+        start, finish = min( span.start for span in run ), max( span.finish for span in run )
+        stages, cursor = collections.Counter(), start
+        for leaf in sorted( leaves, key=lambda span: span.start ):
+            if leaf.start > cursor:
+                stages[ self.WAITING ] += leaf.start - cursor
+            stages[ leaf.operation ] += max( 0.0, leaf.finish - max( leaf.start, cursor ) )
+            cursor = max( cursor, leaf.finish )
+        if finish > cursor:
+            stages[ self.OVERHEAD ] += finish - cursor
+
+        self.urls += 1
+        self.critical.update( stages )
+        self.end_to_end.record( round( (finish - start) * 1e9 ) )
+        self._keep( self.slowest, (finish - start, self.urls, digest, {"kind": kind, "stages": dict( stages )}) )
+
+    @staticmethod
+    def _nest( spans: List[ TraceSpan ] ) -> Tuple[ Dict[ int, int ], Dict[ int, List[ int ] ] ]:
+        """Child → parent and parent → children indexes, by span ids, or else by time containment, never under a
+        span of the same operation."""
+        parents, children = { }, collections.defaultdict( list )
+        ids = { span.span: i for i, span in enumerate( spans ) if span.span }
+        # parents sort before their children: earlier start, later finish, and on ties the one recorded last
+        order = sorted( range( len( spans ) ), key=lambda i: (spans[ i ].start, -spans[ i ].finish, -i) )
+        placed, chains = [ ], { }
+        for i in order:
+            span, parent = spans[ i ], None
+            if span.span:
+                parent = ids.get( span.parent )
+            else:
+                # the tightest fit, then the fewest siblings alike, then the innermost, when runs overlap
+                fits = [ (spans[ j ].finish - span.finish + span.start - spans[ j ].start,
+                          sum( spans[ child ].operation == span.operation for child in children.get( j, () ) ), -position, j)
+                         for position, j in enumerate( placed ) if spans[ j ].start <= span.start and
+                         span.finish <= spans[ j ].finish and span.operation not in chains[ j ] ]
+                if fits:
+                    parent = min( fits )[ -1 ]
+            if parent is not None:
+                parents[ i ] = parent
+                children[ parent ].append( i )
+            chains[ i ] = chains.get( parent, frozenset() ) | { span.operation }
+            placed.append( i )
+        return parents, children
+
+    def _fold( self, spans: List[ TraceSpan ], parents: Mapping[ int, int ], children: Mapping[ int, List[ int ] ],
+               kind: str ) -> None:
+        for i, span in enumerate( spans ):
+            frames, parent = [ ], i
+            while parent is not None:
+                frame = spans[ parent ].operation
+                frames.append( frame + " ( failed )" if spans[ parent ].failed else frame )
+                parent = parents.get( parent )
+            own = span.duration - sum( spans[ child ].duration for child in children.get( i, () ) )
+            if own > 0:
+                self.folded[ ";".join( [ kind, *reversed( frames ) ] ) ] += round( own * 1e9 )
+
+    def _keep( self, heap: List, item: Tuple ) -> None:
+        if len( heap ) < self.top:
+            heapq.heappush( heap, item )
+        elif item[ 0 ] > heap[ 0 ][ 0 ]:
+            heapq.heapreplace( heap, item )
+
+    @staticmethod
+    def _row( name: str, *values ) -> str:
+        return " ".join( [ f"{str( name )[ :40 ]:<40}", *(f"{value:>9}" for value in values) ] )
+    # endregion
+
+
+class HtmlReport:
+    """One self contained page: the tables of the text report, the concurrency over time and an icicle flamegraph,
+    as inline SVG."""
+
+    WIDTH: ClassVar = 1200
+    FRAME: ClassVar = 18
+    PALETTE: ClassVar = ("#4e79a7", "#f28e2b", "#e15759", "#76b7b2", "#59a14f", "#edc948", "#b07aa1", "#ff9da7",
+                         "#9c755f", "#bab0ac")
+    STYLE: ClassVar = """
+body { font: 13px/1.4 system-ui, sans-serif; margin: 24px; color: #222 }
+table { border-collapse: collapse; margin: 8px 0 24px }
+th, td { padding: 2px 10px; text-align: right; border-bottom: 1px solid #eee }
+th:first-child, td:first-child { text-align: left }
+h2 { margin-top: 32px; font-size: 16px }
+svg text { font: 11px system-ui, sans-serif; pointer-events: none }
+.bar { display: inline-block; height: 10px; background: #4e79a7 }
+"""
+
+    def __init__( self, analysis: TraceAnalysis ):
+        self.analysis = analysis
+
+    def render( self, title: str ) -> str:
+        analysis = self.analysis
+        parts = [ f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>{html.escape( title )}</title>",
+                  f"<style>{self.STYLE}</style></head><body><h1>{html.escape( title )}</h1>",
+                  f"<p>{analysis.summary()}</p>" ]
+
+        parts.append( "<h2>Latency per operation</h2>" )
+        parts.append( self._table( ("operation", *Stats.COLUMNS),
+                                   [ (operation, *stats.row()) for operation, stats in
+                                     sorted( analysis.operations.items(), key=lambda item: -item[ 1 ].histogram.total ) ] ) )
+        parts.append( "<h2>Latency per operation and kind</h2>" )
+        parts.append( self._table( ("operation", "kind", *Stats.COLUMNS),
+                                   [ (operation, kind, *stats.row()) for (operation, kind), stats in
+                                     sorted( analysis.kinds.items() ) ] ) )
+
+        total = sum( analysis.critical.values() )
+        if total:
+            parts.append( f"<h2>Critical path</h2><p>{analysis.urls} urls, {analysis.end_to_end_summary()}</p>" )
+            parts.append( self._table( ("stage", "share", "total s", "per url s", ""),
+                                       [ (stage, f"{value / total:.1%}", f"{value:.1f}", f"{value / analysis.urls:.3f}",
+                                          self._bar( value / total )) for stage, value in analysis.critical.most_common() ],
+                                       raw=True ) )
+            parts.append( "<h2>Slowest urls</h2>" )
+            parts.append( self._table( ("digest", "kind", "seconds", "breakdown"),
+                                       [ (digest, detail[ "kind" ], f"{duration:.2f}",
+                                          ", ".join( f"{stage} {value:.2f}" for stage, value in detail[ "stages" ].items() ))
+                                         for duration, _, digest, detail in sorted( analysis.slowest, reverse=True ) ] ) )
+
+        if analysis.host_stats:
+            parts.append( f"<h2>Host stragglers</h2><p>fetches over {analysis.slow:g}s</p>" )
+            parts.append( self._table( ("host", "fetches", "slow", "failed", "max s", "mean s"),
+                                       [ (host, stats.count, stats.slow, stats.failed, f"{stats.max:.2f}",
+                                          f"{stats.total / stats.count:.2f}")
+                                         for host, stats in analysis.straggling_hosts() ] ) )
+            parts.append( self._table( ("slowest fetches", "host", "seconds"),
+                                       [ (digest, host, f"{duration:.2f}")
+                                         for duration, host, digest in sorted( analysis.stragglers, reverse=True ) ] ) )
+
+        parts.append( "<h2>Concurrency over time</h2>" )
+        parts.append( self._concurrency() )
+        parts.append( "<h2>Flamegraph of the url spans</h2><p>self time summed over the urls, by kind</p>" )
+        parts.append( self._flamegraph() )
+
+        if analysis.errors:
+            parts.append( "<h2>Errors</h2>" )
+            parts.append( self._table( ("operation", "count", "error"),
+                                       [ (operation, count, error) for (operation, error), count in
+                                         analysis.errors.most_common( analysis.top ) ] ) )
+        parts.append( "</body></html>\n" )
+        return "\n".join( parts )
+
+    # region internals
+    @staticmethod
+    def _table( header: Tuple, rows: Iterable[ Tuple ], raw: bool = False ) -> str:
+        head = "".join( f"<th>{html.escape( str( cell ) )}</th>" for cell in header )
+        body = "".join( "<tr>" + "".join( f"<td>{cell if raw and i == len( row ) - 1 else html.escape( str( cell ) )}</td>"
+                                          for i, cell in enumerate( row ) ) + "</tr>" for row in rows )
+        return f"<table><tr>{head}</tr>{body}</table>"
+
+    @staticmethod
+    def _bar( share: float ) -> str:
+        return f"<span class='bar' style='width: {max( 1, round( share * 300 ) )}px'></span>"
+
+    def _color( self, name: str ) -> str:
+        return self.PALETTE[ zlib.crc32( name.encode() ) % len( self.PALETTE ) ]
+
+    def _concurrency( self ) -> str:
+        start, width, series = self.analysis.concurrency()
+        if not series:
+            return "<p>no spans</p>"
+        height, left, bottom = 240, 40, 20
+        length = max( len( values ) for values in series.values() )
+        peak = max( max( values ) for values in series.values() ) or 1.0
+        x = lambda i: left + i * (self.WIDTH - left) / max( 1, length - 1 )
+        y = lambda v: (height - bottom) * (1 - v / peak)
+
+        parts = [ f"<svg width='{self.WIDTH}' height='{height + 20 * len( series )}'>",
+                  f"<line x1='{left}' y1='{height - bottom}' x2='{self.WIDTH}' y2='{height - bottom}' stroke='#999'/>",
+                  f"<text x='0' y='12'>{peak:.1f}</text><text x='0' y='{height - bottom}'>0</text>",
+                  f"<text x='{left}' y='{height - 4}'>+0s</text>",
+                  f"<text x='{self.WIDTH - 60}' y='{height - 4}'>+{length * width:.0f}s</text>" ]
+        for n, (operation, values) in enumerate( series.items() ):
+            color = self._color( operation )
+            points = " ".join( f"{x( i ):.1f},{y( v ):.1f}" for i, v in enumerate( values ) )
+            parts.append( f"<polyline fill='none' stroke='{color}' stroke-width='1.5' points='{points}'>"
+                          f"<title>{html.escape( operation )}</title></polyline>" )
+            legend = height + 20 * n + 14
+            parts.append( f"<rect x='{left}' y='{legend - 9}' width='10' height='10' fill='{color}'/>"
+                          f"<text x='{left + 16}' y='{legend}'>{html.escape( operation )}, peak {max( values ):.1f}</text>" )
+        parts.append( "</svg>" )
+        return "".join( parts )
+
+    def _flamegraph( self ) -> str:
+        root = [ 0, { } ]
+        for stack, nanoseconds in self.analysis.folded.items():
+            node = root
+            node[ 0 ] += nanoseconds
+            for frame in stack.split( ";" ):
+                node = node[ 1 ].setdefault( frame, [ 0, { } ] )
+                node[ 0 ] += nanoseconds
+        if not root[ 0 ]:
+            return "<p>no url spans</p>"
+
+        frames = [ ]
+        self._frames( root, "all urls", 0.0, self.WIDTH, 0, root[ 0 ], frames )
+        depth = max( level for level, *_ in frames ) + 1
+        parts = [ f"<svg width='{self.WIDTH}' height='{depth * self.FRAME}'>" ]
+        for level, x, width, name, nanoseconds in frames:
+            y = level * self.FRAME
+            color = "#e15759" if name.endswith( "( failed )" ) else self._color( name )
+            label = html.escape( name )
+            parts.append( f"<g><title>{label}: {nanoseconds / 1e9:.1f}s, {nanoseconds / root[ 0 ]:.1%}</title>"
+                          f"<rect x='{x:.1f}' y='{y}' width='{max( width - 1, 0.5 ):.1f}' height='{self.FRAME - 1}' "
+                          f"fill='{color}' fill-opacity='0.8'/>" )
+            if width > 7 * len( name ) * 0.8:
+                parts.append( f"<text x='{x + 3:.1f}' y='{y + 13}'>{label}</text>" )
+            parts.append( "</g>" )
+        parts.append( "</svg>" )
+        return "".join( parts )
+
+    def _frames( self, node: List, name: str, x: float, width: float, level: int, total: int, frames: List ) -> None:
+        if width < 0.5:
+            return
+        frames.append( (level, x, width, name, node[ 0 ]) )
+        for child, grandchild in sorted( node[ 1 ].items() ):
+            child_width = width * grandchild[ 0 ] / node[ 0 ]
+            self._frames( grandchild, child, x, child_width, level + 1, total, frames )
+            x += child_width
+    # endregion
+
+
+def load_hosts( path: pathlib.Path ) -> Dict[ str, str ]:
+    """Digest → hostname of the URLs of an event stream ( ``date \\t quality \\t url`` lines ), digested like
+    ``UrlEvent.digest``."""
+    from urllib.parse import urlparse
+
+    hosts = { }
+    with open( path, encoding="utf-8", errors="replace" ) as lines:
+        for line in lines:
+            fields = line.strip().split( "\t" )
+            if len( fields ) != 3:
+                continue
+            url = fields[ 2 ]
+            try:
+                host = urlparse( url ).hostname
+            except ValueError:
+                continue
+            if host:
+                hosts[ hashlib.md5( url.encode() ).digest().hex() ] = host
+    return hosts
+
+
+def main( argv: List[ str ] = None ) -> None:
+    parser = argparse.ArgumentParser( prog="python -m roi_utils.traceanalysis",
+                                      description="Latency, critical path, stragglers and concurrency of a run, from "
+                                                  "the ExecutionContext log or a tracer export." )
+    parser.add_argument( "trace", type=pathlib.Path,
+                         help="log lines or JsonlExporter file, or BinaryExporter directory, - for stdin" )
+    parser.add_argument( "--html", type=pathlib.Path, help="write the report as a page" )
+    parser.add_argument( "--folded", type=pathlib.Path, help="write the folded stacks, for flamegraph.pl or speedscope" )
+    parser.add_argument( "--events", type=pathlib.Path, help="event stream to take the host of a digest from" )
+    parser.add_argument( "--bin", type=float, default=1.0, help="seconds per concurrency bin" )
+    parser.add_argument( "--slow", type=float, default=10.0, help="seconds for a fetch to count as a straggler" )
+    parser.add_argument( "--top", type=int, default=20, help="rows of the slowest urls, hosts and errors" )
+    options = parser.parse_args( argv )
+
+    analysis = TraceAnalysis( width=options.bin, slow=options.slow, top=options.top,
+                              hosts=load_hosts( options.events ) if options.events else None )
+    reader = TraceReader()
+    if str( options.trace ) == "-":
+        analysis.analyze( reader, reader.read( sys.stdin ) )
+    elif options.trace.is_dir():
+        analysis.analyze( reader, reader.read_binary( options.trace ) )
+    else:
+        with open( options.trace, encoding="utf-8", errors="replace" ) as lines:
+            analysis.analyze( reader, reader.read( lines ) )
+
+    title = f"{options.trace.name}: {reader.lines} lines, {reader.invalid} not a span, "
+    sys.stdout.write( analysis.text( title ) )
+    if options.html:
+        options.html.write_text( analysis.html( f"Trace analysis of {options.trace.name}" ), encoding="utf-8" )
+    if options.folded:
+        options.folded.write_text( "".join( line + "\n" for line in analysis.folded_stacks() ), encoding="utf-8" )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+from __future__ import annotations
+
+import array
+import contextvars
+import itertools
+import json
+import os
+import pathlib
+import random
+import struct
+import threading
+import time
+import zlib
+from typing import ClassVar, Container, Dict, Iterator, List, Mapping, NamedTuple, Protocol
+
+DONE = 0
+WARN = 1
+FAIL = 2
+STEPS = ("DONE", "WARN", "FAIL")
+
+# the id of the innermost open span, copied into every asyncio task, so a task's spans nest under its creator's
+current_span: contextvars.ContextVar[ int ] = contextvars.ContextVar( "current_span", default=0 )
+span_ids = itertools.count( 1 )
+
+
+class Span( NamedTuple ):
+    operation: str
+    start: int
+    finish: int
+    status: int
+    digest: str | None = None
+    attributes: Mapping | None = None
+    error: str | None = None
+    span: int = 0
+    parent: int = 0
+
+    @property
+    def duration( self ) -> int:
+        return self.finish - self.start
+
+    @property
+    def step( self ) -> str:
+        return STEPS[ self.status ]
+
+
+class Exporter( Protocol ):
+
+    def export( self, spans: List[ Span ] ) -> None:
+        ...
+
+    def close( self ) -> None:
+        ...
+
+
+class JsonlExporter:
+    """One compact JSON object per span and line, times in nanoseconds since the epoch."""
+
+    def __init__( self, path: pathlib.Path ):
+        self._file = open( path, "a", encoding="utf-8" )
+
+    def export( self, spans: List[ Span ] ) -> None:
+        lines = [ json.dumps( self.record( span ), separators=(",", ":"), default=str ) + "\n" for span in spans ]
+        self._file.write( "".join( lines ) )
+        self._file.flush()
+
+    def close( self ) -> None:
+        self._file.close()
+
+    @staticmethod
+    def record( span: Span ) -> Dict:
+        record = dict( span.attributes ) if span.attributes else { }
+        record.update( step=span.step, operation=span.operation, span=span.span, parent=span.parent,
+                       start=span.start, finish=span.finish, duration=span.duration )
+        if span.digest is not None:
+            record[ "digest" ] = span.digest
+        if span.error is not None:
+            record[ "error" ] = span.error
+        return record
+
+
+class BinaryExporter:
+    """Rolling files of ``span | parent | start | finish | status | digest | operation length | extra length |
+    operation | extra``.
+
+    The digest is the raw 16 bytes of an md5 hex digest ( zeros otherwise ), and extra is the compact JSON of the
+    attributes and error, empty when there are none. Past ``backups`` files, the oldest one is deleted.
+    """
+
+    RECORD: ClassVar = struct.Struct( ">QQqqB16sHI" )
+    FILE_SIZE: ClassVar = 64 * 1024 * 1024
+    FILE_PATTERN: ClassVar = "trace-{:06d}.bin"
+    BACKUPS: ClassVar = 8
+    NO_DIGEST: ClassVar = bytes( 16 )
+
+    def __init__( self, path: pathlib.Path, file_size: int = None, backups: int = None ):
+        self.path = pathlib.Path( path )
+        self.path.mkdir( parents=True, exist_ok=True )
+        self.file_size = file_size or self.FILE_SIZE
+        self.backups = backups or self.BACKUPS
+
+        self._number = max( self._files(), default=0 )
+        self._file = open( self._file_path( self._number ), "ab" )
+
+    def export( self, spans: List[ Span ] ) -> None:
+        self._file.write( b"".join( self.pack( span ) for span in spans ) )
+        self._file.flush()
+        if self._file.tell() > self.file_size:
+            self._roll()
+
+    def close( self ) -> None:
+        self._file.close()
+
+    @classmethod
+    def pack( cls, span: Span ) -> bytes:
+        try:
+            digest = bytes.fromhex( span.digest ) if span.digest else cls.NO_DIGEST
+        except ValueError:
+            digest = cls.NO_DIGEST
+        if len( digest ) != 16:
+            digest = cls.NO_DIGEST
+
+        extra = dict( span.attributes ) if span.attributes else { }
+        if span.error is not None:
+            extra[ "error" ] = span.error
+        extra = json.dumps( extra, separators=(",", ":"), default=str ).encode() if extra else b""
+        operation = span.operation.encode()
+        return cls.RECORD.pack( span.span, span.parent, span.start, span.finish, span.status, digest,
+                                len( operation ), len( extra ) ) + operation + extra
+
+    @classmethod
+    def read( cls, path: pathlib.Path ) -> Iterator[ Span ]:
+        """The spans of one file, in write order, a torn last record left out."""
+        payload = pathlib.Path( path ).read_bytes()
+        position = 0
+        while position + cls.RECORD.size <= len( payload ):
+            identifier, parent, start, finish, status, digest, operation_length, extra_length = \
+                cls.RECORD.unpack_from( payload, position )
+            position += cls.RECORD.size
+            if position + operation_length + extra_length > len( payload ):
+                return
+
+            operation = payload[ position:position + operation_length ].decode()
+            position += operation_length
+            extra = json.loads( payload[ position:position + extra_length ] ) if extra_length else { }
+            position += extra_length
+
+            error = extra.pop( "error", None )
+            yield Span( operation, start, finish, status, digest.hex() if digest != cls.NO_DIGEST else None,
+                        extra or None, error, identifier, parent )
+
+    # region internals
+    def _file_path( self, number: int ) -> pathlib.Path:
+        return self.path / self.FILE_PATTERN.format( number )
+
+    def _files( self ) -> Iterator[ int ]:
+        for file in self.path.glob( "trace-*.bin" ):
+            yield int( file.stem.split( "-" )[ 1 ] )
+
+    def _roll( self ) -> None:
+        self._file.close()
+        self._number += 1
+        self._file = open( self._file_path( self._number ), "ab" )
+        for number in sorted( self._files() )[ :-self.backups ]:
+            self._file_path( number ).unlink( missing_ok=True )
+    # endregion
+
+
+class ChromeTraceExporter:
+    """The JSON array flavour of the Chrome trace-event format, for ``chrome://tracing`` or Perfetto.
+
+    Every span is a complete ( ``"ph": "X"`` ) event in microseconds. Spans of the same digest share a track, so the
+    steps of a URL stack up, and the others go to track 0. The closing bracket is written by ``close``, which the
+    viewers do not require, so a trace of a killed run still loads.
+    """
+
+    def __init__( self, path: pathlib.Path ):
+        self._file = open( path, "w", encoding="utf-8" )
+        self._file.write( "[" )
+        self._separator = "\n"
+        self._pid = os.getpid()
+
+    def export( self, spans: List[ Span ] ) -> None:
+        events = [ ]
+        for span in spans:
+            event = {
+                "name": span.operation,
+                "cat": span.step,
+                "ph": "X",
+                "ts": span.start / 1000,
+                "dur": span.duration / 1000,
+                "pid": self._pid,
+                "tid": int( span.digest[ :8 ], 16 ) if span.digest else 0,
+            }
+            args = dict( span.attributes ) if span.attributes else { }
+            args.update( span=span.span, parent=span.parent )
+            if span.error is not None:
+                args[ "error" ] = span.error
+            event[ "args" ] = args
+            events.append( self._separator + json.dumps( event, separators=(",", ":"), default=str ) )
+            self._separator = ",\n"
+
+        self._file.write( "".join( events ) )
+        self._file.flush()
+
+    def close( self ) -> None:
+        self._file.write( "\n]\n" )
+        self._file.close()
+
+
+def open_exporter( path: pathlib.Path ) -> Exporter:
+    """Chrome trace events for a ``.json`` path, JSON lines for ``.jsonl``, rolling binary files in a directory
+    otherwise."""
+    path = pathlib.Path( path )
+    if path.suffix == ".json":
+        return ChromeTraceExporter( path )
+    if path.suffix == ".jsonl":
+        return JsonlExporter( path )
+    return BinaryExporter( path )
+
+
+class Tracer:
+    """Spans kept in a preallocated ring buffer and handed to an ``Exporter`` in batches by a background thread.
+
+    Recording a span stores a few ints and references in parallel arrays, and the operation name is interned to
+    an id, so nothing is formatted on the calling side. Spans are sampled per digest ( every span of a URL or
+    none ) though ``ExecutionContext`` keeps every failed one, and a filtered span is never recorded, so the parent
+    of an exported span may be missing. When the
+    exporter falls ``capacity`` spans behind, the oldest ones are overwritten and counted in ``dropped``. Times are
+    ``time.perf_counter_ns`` on record and shifted to nanoseconds since the epoch on export.
+    """
+
+    CAPACITY: ClassVar = 1 << 16
+    BATCH: ClassVar = 4096
+    INTERVAL: ClassVar = 1.0
+
+    def __init__( self, exporter: Exporter, sample_rate: float = 1.0, operations: Container[ str ] = None,
+                  capacity: int = None, batch: int = None, interval: float = None ):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.operations = operations
+        self.capacity = 1 << ((capacity or self.CAPACITY) - 1).bit_length()
+        self.batch = min( batch or self.BATCH, self.capacity )
+        self.interval = interval or self.INTERVAL
+        self.dropped = 0
+        self.failed = 0
+
+        self._mask = self.capacity - 1
+        self._threshold = int( sample_rate * (1 << 32) )
+        self._offset = time.time_ns() - time.perf_counter_ns()
+        self._names: List[ str ] = [ ]
+        self._ids: Dict[ str, int ] = { }
+
+        self._operation = array.array( "i", bytes( 4 * self.capacity ) )
+        self._start = array.array( "q", bytes( 8 * self.capacity ) )
+        self._finish = array.array( "q", bytes( 8 * self.capacity ) )
+        self._status = array.array( "b", bytes( self.capacity ) )
+        self._span = array.array( "q", bytes( 8 * self.capacity ) )
+        self._parent = array.array( "q", bytes( 8 * self.capacity ) )
+        self._sequence = array.array( "q", [ -1 ] ) * self.capacity
+        self._digest: List = [ None ] * self.capacity
+        self._attributes: List = [ None ] * self.capacity
+        self._error: List = [ None ] * self.capacity
+
+        self._counter = itertools.count()
+        self._exported = 0
+        self._lock = threading.Lock()
+        self._names_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread( target=self._run, name="tracer", daemon=True )
+        self._thread.start()
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, exc_type, exc_val, exc_tb ):
+        self.close()
+
+    def traced( self, operation: str ) -> bool:
+        return self.operations is None or operation in self.operations
+
+    def sampled( self, operation: str, digest: str = None ) -> bool:
+        if not self.traced( operation ):
+            return False
+        if self._threshold >= 1 << 32:
+            return True
+        if digest is None:
+            return random.random() < self.sample_rate
+        return zlib.crc32( digest.encode() ) < self._threshold
+
+    def record( self, operation: str, start: int, finish: int, status: int = DONE, digest: str = None,
+                attributes: Mapping = None, error: str = None, span: int = 0, parent: int = 0 ) -> None:
+        """A finished span, ``start`` and ``finish`` from ``time.perf_counter_ns``."""
+        operation_id = self._ids.get( operation )
+        if operation_id is None:
+            operation_id = self._intern( operation )
+
+        sequence = next( self._counter )
+        slot = sequence & self._mask
+        # a seqlock: -1 while the fields are written, so the drain neither reads them half written nor keeps a span
+        # it read meanwhile
+        self._sequence[ slot ] = -1
+        self._operation[ slot ] = operation_id
+        self._start[ slot ] = start
+        self._finish[ slot ] = finish
+        self._status[ slot ] = status
+        self._digest[ slot ] = digest
+        self._attributes[ slot ] = attributes
+        self._error[ slot ] = error
+        self._span[ slot ] = span
+        self._parent[ slot ] = parent
+        self._sequence[ slot ] = sequence
+
+        if sequence - self._exported >= self.batch:
+            self._wake.set()
+
+    def flush( self ) -> None:
+        """Exports every span recorded so far, from the calling thread."""
+        with self._lock:
+            self._drain()
+
+    def close( self ) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+
+    # region internals
+    def _intern( self, operation: str ) -> int:
+        with self._names_lock:
+            if operation not in self._ids:
+                self._names.append( operation )
+                self._ids[ operation ] = len( self._names ) - 1
+            return self._ids[ operation ]
+
+    def _run( self ) -> None:
+        while not self._closed:
+            self._wake.wait( self.interval )
+            self._wake.clear()
+            with self._lock:
+                self._drain()
+        with self._lock:
+            self._drain()
+        self.exporter.close()
+
+    def _drain( self ) -> None:
+        spans = [ ]
+        sequence = self._exported
+        while True:
+            slot = sequence & self._mask
+            written = self._sequence[ slot ]
+            if written < sequence:
+                # not recorded yet, or being written
+                break
+            if written == sequence:
+                span = Span( self._names[ self._operation[ slot ] ],
+                             self._start[ slot ] + self._offset,
+                             self._finish[ slot ] + self._offset,
+                             self._status[ slot ],
+                             self._digest[ slot ],
+                             self._attributes[ slot ],
+                             self._error[ slot ],
+                             self._span[ slot ],
+                             self._parent[ slot ] )
+                # the slot was overwritten while being read
+                if self._sequence[ slot ] == sequence:
+                    spans.append( span )
+                    sequence += 1
+                    if len( spans ) >= self.batch:
+                        self._export( spans )
+                        spans = [ ]
+                    continue
+                written = self._sequence[ slot ]
+                if written < sequence:
+                    # being overwritten, the next drain counts what it replaced
+                    break
+
+            # lapped: every sequence up to written - capacity is gone
+            lost = written - self.capacity + 1 - sequence
+            self.dropped += lost
+            sequence += lost
+
+        self._exported = sequence
+        if spans:
+            self._export( spans )
+
+    def _export( self, spans: List[ Span ] ) -> None:
+        try:
+            self.exporter.export( spans )
+        except Exception:
+            self.failed += len( spans )
+    # endregion
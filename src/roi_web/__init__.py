@@ -1,6 +1,13 @@
 from .domain import WebArchive, TabSeparated, UrlEvent, UNorm, PageContent, Digestable, NetworkArchive, ResponseEnrichment, UrlKinds, String
 from .parsing import HTML, Youtube, EventParsing, PDF
 from .processing import load_events, Processer
+from .extraction import ExtractionService
+from .scheduling import HostScheduler
+from .storage import PageStore
+from .warc import WarcArchiver
+from .codec import ArchiveCodec
+from .dedup import NearDuplicateIndex
+from .discovery import Discovery
 
 __all__ = (
     load_events,
@@ -14,6 +21,13 @@ __all__ = (
     Processer,
     EventParsing,
     PDF,
-    String
+    String,
+    PageStore,
+    HostScheduler,
+    ExtractionService,
+    WarcArchiver,
+    ArchiveCodec,
+    NearDuplicateIndex,
+    Discovery,
 
 )
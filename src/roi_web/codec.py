@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import json
+import struct
+import zlib
+from dataclasses import asdict
+from typing import ClassVar, Mapping
+
+# zstandard is optional, gzip ( zlib ) is always there
+try:
+    import zstandard
+
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+from .domain import NetworkArchive, UrlEvent, WebArchive
+
+
+class ArchiveView:
+    """A decoded frame that only parses what is asked for.
+
+    ``url`` and the network fields come from the small metadata block, the body stays a slice of the frame until
+    ``body`` is read, and is only decompressed then.
+    """
+
+    def __init__( self, frame: memoryview, compression: int, meta: slice, body: slice ):
+        self._frame = frame
+        self._compression = compression
+        self._meta_slice = meta
+        self._body_slice = body
+        self._meta = None
+
+    @property
+    def meta( self ) -> Mapping:
+        if self._meta is None:
+            self._meta = json.loads( bytes( self._frame[ self._meta_slice ] ) )
+        return self._meta
+
+    @property
+    def url( self ) -> UrlEvent:
+        return UrlEvent( **self.meta[ "url" ] )
+
+    @property
+    def content_type( self ):
+        return self.meta[ "content" ][ "response_content_type" ]
+
+    @property
+    def status( self ) -> int:
+        return self.meta[ "content" ][ "response_status" ]
+
+    @property
+    def headers( self ) -> Mapping:
+        return self.meta[ "content" ][ "response_headers" ]
+
+    @property
+    def body( self ) -> bytes:
+        return ArchiveCodec.decompress( self._compression, self._frame[ self._body_slice ] )
+
+    def archive( self ) -> WebArchive:
+        content = NetworkArchive( response_content=self.body, **self.meta[ "content" ] )
+        return WebArchive( url=self.url, content=content )
+
+
+class ArchiveCodec:
+    """Binary frames for ``WebArchive``, replacing the base64 in indented JSON of ``WebArchive.json``.
+
+    A frame is ``magic | version | compression | meta length | body length | meta | body``, where meta is the
+    compact JSON of the url and every network field but the body, and the body is the raw ( optionally compressed )
+    response content.
+    """
+
+    MAGIC: ClassVar = b"ROIA"
+    VERSION: ClassVar = 1
+    HEADER: ClassVar = struct.Struct( ">4sBBII" )
+
+    NONE: ClassVar = 0
+    GZIP: ClassVar = 1
+    ZSTD: ClassVar = 2
+
+    def __init__( self, compression: int = NONE, level: int = None ):
+        if compression not in (self.NONE, self.GZIP, self.ZSTD):
+            raise ValueError( f"Unknown compression {compression}" )
+        if compression == self.ZSTD and not HAS_ZSTD:
+            raise ValueError( "zstd compression needs the zstandard package" )
+        self.compression = compression
+        self.level = level
+
+    def encode( self, archive: WebArchive ) -> bytes:
+        content = archive.content
+        meta = {
+            "url": asdict( archive.url ),
+            "content": {k: v for k, v in vars( content ).items() if k != "response_content"},
+        }
+        meta = json.dumps( meta, separators=(",", ":") ).encode()
+        body = self.compress( content.response_content or b"" )
+
+        return b"".join( [ self.HEADER.pack( self.MAGIC, self.VERSION, self.compression, len( meta ), len( body ) ),
+                           meta,
+                           body ] )
+
+    def compress( self, body: bytes ) -> bytes:
+        match self.compression:
+            case self.NONE:
+                return body
+            case self.GZIP:
+                return zlib.compress( body, self.level if self.level is not None else 6 )
+            case self.ZSTD:
+                return zstandard.ZstdCompressor( level=self.level or 3 ).compress( body )
+            case other:
+                raise ValueError( f"Unknown compression {other}" )
+
+    @classmethod
+    def decompress( cls, compression: int, body: memoryview ) -> bytes:
+        match compression:
+            case cls.NONE:
+                return bytes( body )
+            case cls.GZIP:
+                return zlib.decompress( body )
+            case cls.ZSTD:
+                return zstandard.ZstdDecompressor().decompress( body )
+            case other:
+                raise ValueError( f"Unknown compression {other}" )
+
+    @classmethod
+    def view( cls, frame: bytes | memoryview ) -> ArchiveView:
+        frame = memoryview( frame )
+        if len( frame ) < cls.HEADER.size:
+            raise ValueError( "Truncated WebArchive frame" )
+        magic, version, compression, meta_length, body_length = cls.HEADER.unpack_from( frame )
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise ValueError( "Not a WebArchive frame" )
+
+        meta = slice( cls.HEADER.size, cls.HEADER.size + meta_length )
+        body = slice( meta.stop, meta.stop + body_length )
+        if body.stop > len( frame ):
+            raise ValueError( "Truncated WebArchive frame" )
+        return ArchiveView( frame, compression, meta, body )
+
+    @classmethod
+    def decode( cls, frame: bytes | memoryview ) -> WebArchive:
+        return cls.view( frame ).archive()
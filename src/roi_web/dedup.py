@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import collections
+import hashlib
+import os
+import pathlib
+import struct
+from typing import ClassVar, Dict, List, Tuple
+
+from .domain import PageContent, String
+from .retraf.filters import meaningful_words
+
+
+def simhash( features: List[ String ] ) -> int:
+    """64 bit SimHash: every bit is set when most feature hashes have it set, so repeated features weigh more.
+
+    The bits are counted a byte position at a time with a ``Counter`` over a stride of the packed hashes, so the
+    per feature work stays in C and Python only goes over the ( at most 256 ) distinct byte values.
+    """
+    packed = b"".join( hashlib.blake2b( feature.encode(), digest_size=8 ).digest() for feature in features )
+
+    fingerprint = 0
+    for position in range( 8 ):
+        counts = collections.Counter( packed[ position::8 ] ).items()
+        shift = 8 * (7 - position)
+        for bit in range( 8 ):
+            ones = sum( count for value, count in counts if value >> bit & 1 )
+            if 2 * ones > len( features ):
+                fingerprint |= 1 << (shift + bit)
+    return fingerprint
+
+
+class NearDuplicateIndex:
+    """SimHash index of ``PageContent.text`` finding mirrors, AMP versions and syndicated copies of a page.
+
+    The features are the meaningful words of ``retraf.filters.content_fingerprint``, and texts are near duplicates
+    when their fingerprints differ in at most ``distance`` bits. The fingerprint is cut in ``distance + 1`` bands,
+    and two such fingerprints share at least one band whole, so a query only compares against the pages of its
+    bands instead of the whole index. Fingerprints are persisted as an append only file
+    of ``digest | fingerprint`` entries, replayed on open.
+    """
+
+    ENTRY: ClassVar = struct.Struct( ">16sQ" )
+    FILE_NAME: ClassVar = "simhash.dat"
+    # words rather than shingles, since a changed word then flips a single feature, and 4 bits keep 13 bit bands
+    DISTANCE: ClassVar = 4
+    # below that many meaningful words a few edits flip too many bits to tell anything
+    MIN_WORDS: ClassVar = 30
+
+    def __init__( self, path: pathlib.Path, distance: int = None ):
+        self.path = pathlib.Path( path )
+        self.path.mkdir( parents=True, exist_ok=True )
+        self.distance = self.DISTANCE if distance is None else distance
+
+        bands = self.distance + 1
+        # ( shift, mask ) of every band
+        self._bands = [ (64 * i // bands, (1 << (64 * (i + 1) // bands - 64 * i // bands)) - 1) for i in range( bands ) ]
+        self._tables: List[ Dict[ int, List[ bytes ] ] ] = [ { } for _ in self._bands ]
+        self.fingerprints: Dict[ bytes, int ] = { }
+
+        self._load( self.path / self.FILE_NAME )
+        self._file = open( self.path / self.FILE_NAME, "ab" )
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, exc_type, exc_val, exc_tb ):
+        self.close()
+
+    def __len__( self ) -> int:
+        return len( self.fingerprints )
+
+    def __contains__( self, digest: String ) -> bool:
+        return bytes.fromhex( digest ) in self.fingerprints
+
+    @classmethod
+    def fingerprint( cls, text: String ) -> int | None:
+        words = meaningful_words( text or "" )
+        return simhash( words ) if len( words ) >= cls.MIN_WORDS else None
+
+    def near( self, fingerprint: int, exclude: String = None ) -> List[ Tuple[ String, int ] ]:
+        """Digests of the indexed pages within ``distance`` bits, closest first."""
+        excluded = bytes.fromhex( exclude ) if exclude else None
+        found = { }
+        for (shift, mask), table in zip( self._bands, self._tables ):
+            band = fingerprint >> shift & mask
+            for key in table.get( band, () ):
+                candidate = self.fingerprints[ key ]
+                # entries of a page fingerprinted again stay behind in the tables
+                if key == excluded or candidate >> shift & mask != band:
+                    continue
+                distance = (candidate ^ fingerprint).bit_count()
+                if distance <= self.distance:
+                    found[ key ] = distance
+        return sorted( ((key.hex(), distance) for key, distance in found.items()), key=lambda item: item[ 1 ] )
+
+    def duplicates( self, digest: String ) -> List[ Tuple[ String, int ] ]:
+        """Near duplicates of an indexed page."""
+        fingerprint = self.fingerprints.get( bytes.fromhex( digest ) )
+        return [ ] if fingerprint is None else self.near( fingerprint, exclude=digest )
+
+    def find( self, content: PageContent ) -> Tuple[ String | None, int | None ]:
+        """The digest of the indexed page ``content`` nearly duplicates, if any, and the fingerprint to ``insert`` it
+        with otherwise ( None for texts too short to tell )."""
+        fingerprint = self.fingerprint( content.text )
+        if fingerprint is None:
+            return None, None
+
+        found = self.near( fingerprint, exclude=content.digest() )
+        return (found[ 0 ][ 0 ], fingerprint) if found else (None, fingerprint)
+
+    def insert( self, digest: String, fingerprint: int ) -> None:
+        key = bytes.fromhex( digest )
+        self._file.write( self.ENTRY.pack( key, fingerprint ) )
+        self._file.flush()
+        self._index( key, fingerprint )
+
+    def add( self, content: PageContent ) -> String | None:
+        """Indexes the page unless it nearly duplicates another one, whose digest is returned then."""
+        original, fingerprint = self.find( content )
+        if original is None and fingerprint is not None:
+            self.insert( content.digest(), fingerprint )
+        return original
+
+    def close( self ) -> None:
+        self._file.close()
+
+    # region internals
+    def _index( self, key: bytes, fingerprint: int ) -> None:
+        if self.fingerprints.get( key ) == fingerprint:
+            return
+        self.fingerprints[ key ] = fingerprint
+        for (shift, mask), table in zip( self._bands, self._tables ):
+            table.setdefault( fingerprint >> shift & mask, [ ] ).append( key )
+
+    def _load( self, file: pathlib.Path ) -> None:
+        if not file.exists():
+            return
+
+        payload = file.read_bytes()
+        usable = len( payload ) - len( payload ) % self.ENTRY.size
+        if usable != len( payload ):
+            # torn write of the last entry
+            os.truncate( file, usable )
+
+        for key, fingerprint in self.ENTRY.iter_unpack( payload[ :usable ] ):
+            self._index( key, fingerprint )
+    # endregion
@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import hashlib
+from datetime import datetime, timezone
+from typing import AsyncIterator, Awaitable, Callable, ClassVar, Container, Deque, Iterable, List, Set, Tuple
+
+from courlan import get_hostinfo
+
+from roi_utils import ExecutionContext
+from .domain import String
+from .processing import Fetcher
+from .retraf.feeds import determine_feed, extract_links
+from .retraf.settings import MAX_SITEMAPS_SEEN
+from .retraf.sitemaps import GUESSES, SitemapParser, extract_robots_sitemaps, lastmod_datetime, process_sitemap_entries
+
+
+class Discovery:
+    """Sitemap and feed discovery of ``retraf`` on the ``Fetcher`` session.
+
+    Up to ``concurrency`` documents are downloaded at once, and the links are yielded as every document comes in,
+    so the children of a sitemap index are crawled side by side instead of one after the other. Sitemaps are parsed
+    as they download, without ever holding the whole document. A link of the URL filter ( the path of a non
+    homepage URL ) is kept when it contains that URL, without the feedburner exception of
+    ``retraf.utils.filter_urls``, which needs the whole list.
+    """
+
+    CONCURRENCY: ClassVar = 8
+    # the sitemaps protocol caps the uncompressed file at 50MB
+    MAX_SIZE: ClassVar = 50 * 1024 * 1024
+
+    def __init__( self, fetcher: Fetcher, concurrency: int = None, max_sitemaps: int = MAX_SITEMAPS_SEEN ):
+        self.fetcher = fetcher
+        self.concurrency = concurrency or self.CONCURRENCY
+        self.max_sitemaps = max_sitemaps
+
+    async def download( self, url: String ) -> String | None:
+        """The decoded body, None on any failure, like the blocking ``fetch_url`` of trafilatura."""
+        with ExecutionContext( "Discovering", exc_suppress=True, exc_level="warn", extra={"url": url} ):
+            chunks, size = [ ], 0
+            async for chunk in self.fetcher.stream( url ):
+                size += len( chunk )
+                if size > self.MAX_SIZE:
+                    raise Exception( f"Larger than {self.MAX_SIZE} bytes" )
+                chunks.append( chunk )
+            return b"".join( chunks ).decode( "utf-8", errors="replace" )
+
+    async def sitemap( self, url: String, domainname: String, baseurl: String, target_lang: String = None,
+                       keep: Callable[ [ String, String ], bool ] = None ) -> Tuple[ List[ String ], List[ String ] ] | None:
+        """The nested sitemaps and the links of a sitemap, see ``retraf.sitemaps.process_sitemap_entries``."""
+        with ExecutionContext( "Discovering", exc_suppress=True, exc_level="warn", extra={"url": url} ):
+            parser, entries, size = SitemapParser(), [ ], 0
+            async for chunk in self.fetcher.stream( url ):
+                size += len( chunk )
+                if size > self.MAX_SIZE:
+                    raise Exception( f"Larger than {self.MAX_SIZE} bytes" )
+                entries.extend( parser.feed( chunk ) )
+            entries.extend( parser.close() )
+            return process_sitemap_entries( entries, url, domainname, baseurl, target_lang, keep )
+
+    async def sitemap_links( self, url: String, target_lang: String = None, store: Container[ String ] = None,
+                             since: datetime = None ) -> AsyncIterator[ String ]:
+        """Links of the sitemaps of a website, or of a sitemap URL, trying robots.txt and usual locations next.
+
+        The links of a ``store`` ( of ``PageContent`` digests ) are skipped, unless their ``<lastmod>`` is after
+        ``since``, e.g. the time of the previous discovery.
+        """
+        domainname, baseurl = get_hostinfo( url )
+        if domainname is None:
+            return
+
+        keep = None
+        if store is not None:
+            since = since if since is None or since.tzinfo is not None else since.replace( tzinfo=timezone.utc )
+
+            def keep( link: String, lastmod: String ) -> bool:
+                if hashlib.md5( link.encode() ).digest().hex() not in store:
+                    return True
+                modified = lastmod_datetime( lastmod )
+                return since is not None and modified is not None and modified > since
+
+        urlfilter = None
+        if url.endswith( (".xml", ".gz", "sitemap") ):
+            sitemapurl = url
+        else:
+            sitemapurl = baseurl + "/sitemap.xml"
+            if len( url ) > len( baseurl ) + 2:
+                urlfilter = url
+
+        seen, found = set(), set()
+        async for link in self._crawl( [ sitemapurl ], seen, domainname, baseurl, target_lang, keep ):
+            if self._wanted( link, urlfilter, found ):
+                yield link
+        if found:
+            return
+
+        robots = await self.download( baseurl + "/robots.txt" )
+        sitemapurls = extract_robots_sitemaps( robots, baseurl ) or [ baseurl + "/" + guess for guess in GUESSES ]
+        async for link in self._crawl( sitemapurls, seen, domainname, baseurl, target_lang, keep ):
+            if self._wanted( link, urlfilter, found ):
+                yield link
+
+    async def feed_links( self, url: String, target_lang: String = None ) -> AsyncIterator[ String ]:
+        """Links of a feed, or of the feeds a web page announces, with Google News as a last resort."""
+        domainname, baseurl = get_hostinfo( url )
+        if domainname is None:
+            return
+
+        downloaded = await self.download( url )
+        if downloaded is None:
+            if url.strip( "/" ) != baseurl:
+                # the homepage instead
+                async for link in self.feed_links( baseurl, target_lang ):
+                    yield link
+            return
+
+        urlfilter, found = None, set()
+        links = extract_links( downloaded, domainname, baseurl, url, target_lang )
+        if links:
+            for link in links:
+                if self._wanted( link, urlfilter, found ):
+                    yield link
+            return
+
+        if len( url ) > len( baseurl ) + 2:
+            urlfilter = url
+        feeds = collections.deque( determine_feed( downloaded, baseurl, url ) )
+        async for feed, content in self._download_all( feeds, set() ):
+            for link in extract_links( content, domainname, baseurl, url, target_lang ):
+                if self._wanted( link, urlfilter, found ):
+                    yield link
+
+        if not found and target_lang is not None:
+            news = await self.download( "https://news.google.com/rss/search?q=site:" + baseurl + "&hl=" + target_lang +
+                                        "&scoring=n&num=100" )
+            for link in extract_links( news, domainname, baseurl, url, target_lang ):
+                if self._wanted( link, urlfilter, found ):
+                    yield link
+
+    # region internals
+    async def _crawl( self, sitemapurls: Iterable[ String ], seen: Set[ String ], domainname: String,
+                      baseurl: String, target_lang: String, keep ) -> AsyncIterator[ String ]:
+        pending = collections.deque( sitemapurls )
+
+        def sitemap( url: String ):
+            return self.sitemap( url, domainname, baseurl, target_lang, keep )
+
+        async for _, (sitemaps, links) in self._download_all( pending, seen, sitemap ):
+            # nested sitemaps join the downloads still running
+            pending.extend( sitemaps )
+            for link in links:
+                yield link
+
+    async def _download_all( self, pending: Deque[ String ], seen: Set[ String ],
+                             download: Callable[ [ String ], Awaitable ] = None ) -> AsyncIterator[ Tuple[ String, object ] ]:
+        """Runs ``download`` ( the body by default ) for the URLs of ``pending`` and yields the results as they
+        complete, failures left out. The consumer may add URLs to ``pending`` meanwhile."""
+        download = download or self.download
+        running = { }
+        try:
+            while pending or running:
+                while pending and len( running ) < self.concurrency and len( seen ) < self.max_sitemaps:
+                    url = pending.popleft()
+                    if url not in seen:
+                        seen.add( url )
+                        running[ asyncio.ensure_future( download( url ) ) ] = url
+                if not running:
+                    return
+
+                done, _ = await asyncio.wait( running, return_when=asyncio.FIRST_COMPLETED )
+                for task in done:
+                    url = running.pop( task )
+                    if task.result() is not None:
+                        yield url, task.result()
+        finally:
+            for task in running:
+                task.cancel()
+
+    @staticmethod
+    def _wanted( link: String, urlfilter: String | None, found: Set[ String ] ) -> bool:
+        if link in found or (urlfilter is not None and urlfilter not in link):
+            return False
+        found.add( link )
+        return True
+    # endregion
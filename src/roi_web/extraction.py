@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# SIGPROF isn't present on Windows, detect it
+try:
+    from signal import signal, setitimer, SIGPROF, ITIMER_PROF
+
+    HAS_SIGNAL = True
+except ImportError:
+    HAS_SIGNAL = False
+
+from .domain import PageContent, String, UrlEvent, UrlKinds, WebArchive
+from .parsing import HTML, PDF, Youtube
+
+
+class ExtractionTimeout( Exception ):
+    ...
+
+
+class _CpuLimit( BaseException ):
+    """Raised by the timer, past the ``except Exception`` of the extractors, and turned into an ``ExtractionTimeout``
+    on the way out."""
+
+
+def structure( url: UrlEvent, content_type: String, content: bytes ) -> PageContent | None:
+    match content_type, url.kind:
+
+        case "text/html", UrlKinds.YOUTUBE:
+            return Youtube.structure( url, content.decode() )
+
+        case "text/html", _:
+
+            try:
+                return HTML.structure( url, content )
+            except Exception as e:
+                print( e )
+
+        case "application/pdf", _:
+            return PDF.structure( url, content )
+
+        case mime:
+
+            raise Exception( "Unsupported Mime Type and kind " + str( mime ) )
+
+
+def _on_timeout( signum, frame ):
+    raise _CpuLimit()
+
+
+def _init_worker():
+    if HAS_SIGNAL:
+        signal( SIGPROF, _on_timeout )
+
+
+def _structure_limited( url: UrlEvent, content_type: String, content: bytes, cpu_limit: float ) -> PageContent | None:
+    # ITIMER_PROF counts the cpu time of this worker, the check happens between python steps,
+    # so a single long lxml call finishes before the timeout is raised; it keeps firing, should a bare except or a
+    # finally block go on computing
+    if HAS_SIGNAL and cpu_limit:
+        setitimer( ITIMER_PROF, cpu_limit, min( cpu_limit, 1.0 ) )
+    try:
+        return structure( url, content_type, content )
+    except _CpuLimit:
+        raise ExtractionTimeout( "document exceeded its cpu time budget" ) from None
+    finally:
+        if HAS_SIGNAL and cpu_limit:
+            setitimer( ITIMER_PROF, 0 )
+
+
+class ExtractionService:
+    """Runs HTML / PDF structuring on a process pool, away from the event loop.
+
+    Only the url, the content type and the raw body are shipped to the workers, and only the ``PageContent`` comes
+    back. Every document gets ``cpu_limit`` seconds of cpu time, and the pool is replaced after ``max_documents`` per
+    worker, which returns the memory lxml keeps growing in long lived processes.
+    """
+
+    def __init__( self, workers: int = None, cpu_limit: float = 30.0, max_documents: int = 500 ):
+        self.workers = workers or os.cpu_count()
+        self.cpu_limit = cpu_limit
+        self.max_documents = max_documents
+
+        self.submitted = 0
+        self.executor = self._pool()
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, exc_type, exc_val, exc_tb ):
+        self.close()
+
+    async def structure( self, archive: WebArchive ) -> PageContent | None:
+        self.submitted += 1
+        if self.max_documents and self.submitted % (self.max_documents * self.workers) == 0:
+            self._recycle()
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor( self.executor, _structure_limited,
+                                           archive.url,
+                                           archive.content.response_content_type,
+                                           archive.content.response_content,
+                                           self.cpu_limit )
+
+    def close( self ) -> None:
+        self.executor.shutdown( wait=True )
+
+    def _pool( self ) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor( self.workers, initializer=_init_worker )
+
+    def _recycle( self ) -> None:
+        # documents already submitted still finish on the old pool
+        old, self.executor = self.executor, self._pool()
+        old.shutdown( wait=False )
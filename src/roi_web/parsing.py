@@ -2,7 +2,6 @@ from __future__ import annotations
 
 import math
 
-import trafilatura
 from fitz import fitz
 
 _a = None
@@ -17,6 +16,8 @@ import lxml.html
 from lxml import etree
 
 from .domain import *
+from .retraf.core import bare_extraction
+from .retraf.utils import load_tree
 
 
 class EventParsing( SimpleNamespace ):
@@ -27,14 +28,17 @@ class EventParsing( SimpleNamespace ):
 
     @staticmethod
     def _remove_params( url: UrlEvent[ URaw ] ) -> UrlEvent[ UNorm ]:
-        replacers = [ EventParsing.remove_utm ]
         query = url.query
 
-        if url.kind == UrlKinds.YOUTUBE:
-            replacers.append( EventParsing.remove_timestamp )
+        # both patterns need their key in the query, most urls can skip the substitution
+        if "utm_" in query:
+            query = EventParsing.remove_utm( query )
 
-        for transform in replacers:
-            query = transform( query )
+        if "t=" in query and url.kind == UrlKinds.YOUTUBE:
+            query = EventParsing.remove_timestamp( query )
+
+        if query == url.query:
+            return url
 
         # noinspection PyTypeChecker
         return url.update( {"query": query} )
@@ -59,6 +63,21 @@ class EventParsing( SimpleNamespace ):
 
         return Result.ok( good ).map( EventParsing._remove_params )
 
+    @staticmethod
+    def parse_lines( lines: Iterable[ TabSeparated ] ) -> List[ UrlEvent[ UNorm ] ]:
+        events = [ ]
+        for line in lines:
+            try:
+                url = EventParsing.parse_url( line )
+            except ValueError:
+                # not a date, quality, url triple
+                continue
+
+            if url.successful():
+                events.append( url.expect() )
+
+        return events
+
 
 class Youtube( SimpleNamespace ):
     _RE_FIND_DURATION = re.compile( r"PT(\d+)M(\d+)S" )
@@ -202,27 +221,54 @@ class HTML( SimpleNamespace ):
         ...
 
     @staticmethod
-    def getImage( html: etree.HTML ) -> String:
+    def lookup( html: etree.HTML ) -> Mapping[ String, String ]:
+        """First non empty value of every meta / head link / img in a single walk, keyed like ``property=og:image``."""
+        found = {}
+        for element in html.iter( "meta", "link", "img" ):
+            match element.tag:
+                case "meta":
+                    content = element.get( "content" )
+                    if content:
+                        for attr in ("property", "name", "itemprop"):
+                            if attr in element.attrib:
+                                found.setdefault( f"{attr}={element.get( attr )}", content )
+                case "link":
+                    parent = element.getparent()
+                    href = element.get( "href" )
+                    if href and parent is not None and parent.tag == "head":
+                        found.setdefault( f"rel={element.get( 'rel' )}", href )
+                case "img":
+                    src = element.get( "src" )
+                    if src:
+                        found.setdefault( "img", src )
+        return found
 
-        anyImage = HTML.toAttrib( "src", html.xpath( "//img" ) )
-        headIcon = HTML.toAttrib( "href", html.xpath( "//head/link[@rel='icon']" ) )
-        itemProp = HTML.toAttrib( "content", html.xpath( "//meta[@itemprop='image']" ) )
-        ogImage = HTML.toAttrib( "content", html.xpath( "//meta[@property='og:image']" ) )
-        twitterImage = HTML.toAttrib( "content", html.xpath( "//meta[@name='twitter:image']" ) )
+    @staticmethod
+    def getImage( html: etree.HTML, found: Mapping[ String, String ] = None ) -> String:
+        found = found if found is not None else HTML.lookup( html )
 
-        return HTML.first( ogImage, twitterImage, itemProp, headIcon, anyImage )
+        return HTML.first( [ found.get( "property=og:image" ),
+                             found.get( "name=twitter:image" ),
+                             found.get( "itemprop=image" ),
+                             found.get( "rel=icon" ),
+                             found.get( "img" ) ] )
 
     @staticmethod
     def structure( url: UrlEvent, content: String | NetworkArchive | bytes ) -> PageContent:
         html_element = HTML.htmlElement( content )
-
-        result = trafilatura.bare_extraction( filecontent=html_element,
-                                              include_formatting=True,
-                                              include_links=True,
-                                              include_comments=False,
-                                              include_images=False,
-                                              include_tables=False
-                                              )
+        # the extraction cleans the tree in place, look the metadata up first
+        image = HTML.getImage( html_element, HTML.lookup( html_element ) )
+
+        result = bare_extraction( html_element,
+                                  url=url.raw,
+                                  include_formatting=True,
+                                  include_links=True,
+                                  include_comments=False,
+                                  include_images=False,
+                                  include_tables=False,
+                                  reparse=lambda: HTML.htmlElement( content ),
+                                  fast_path=True
+                                  )
 
         text = result.get( "text", None )
         title = result.get( "title", None )
@@ -230,7 +276,6 @@ class HTML( SimpleNamespace ):
         date = result.get( "date", None )
         categories = [ i for i in result.get( "categories", [ ] ) ]
         tags = [ i for i in result.get( "tags", [ ] ) ]
-        image = HTML.getImage( html_element )
 
         # TODO  24/06/2022 neighbors
         neighbors = re.findall( "(?<=]\()(.+?)(?=\))", text )
@@ -261,17 +306,8 @@ class HTML( SimpleNamespace ):
         else:
             content = response
 
-        HTML_PARSER = lxml.html.HTMLParser( collect_ids=False,
-                                            default_doctype=False,
-                                            encoding='utf-8',
-                                            remove_comments=True,
-                                            remove_pis=True )
-
-        try:
-            return lxml.html.fromstring( content, parser=HTML_PARSER )
-        except ValueError:
-            # "Unicode strings with encoding declaration are not supported."
-            return lxml.html.fromstring( content.encode( 'utf8' ), parser=HTML_PARSER )
+        # the parser the extraction uses, built once
+        return load_tree( content )
 
     @staticmethod
     def xmlElement( response: WebArchive | NetworkArchive | String ) -> lxml.etree.Element:
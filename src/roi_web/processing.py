@@ -1,31 +1,285 @@
 import asyncio
+import collections
+import hashlib
+import json
 import os
 import pathlib
 import re
-from typing import Iterable, ClassVar
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, ClassVar, Container, Deque, Dict, Iterator, List, Tuple, Mapping, AsyncIterator
 
 import aiohttp
 from aiohttp import ClientSession, ClientTimeout
 
 from roi_utils import save_async, ExecutionContext
-from roi_web import WebArchive, UrlEvent, PageContent, NetworkArchive, UrlKinds, String, EventParsing, HTML, PDF, Youtube
+from roi_utils.metrics import registry
+from roi_utils.pipeline import Pipeline, Stage
+from roi_utils.seen import SeenIndex
+from roi_web import WebArchive, UrlEvent, PageContent, NetworkArchive, UrlKinds, String, EventParsing, Youtube
+from roi_web.dedup import NearDuplicateIndex
+from roi_web.extraction import ExtractionService, structure
+from roi_web.scheduling import HostScheduler
+from roi_web.storage import PageStore
+from roi_web.warc import WarcArchiver
 
 WEB_STREAM_FILEPATH = os.environ.get( "GNOSIS_WEB_STREAM", "C:/Users/Mateus/OneDrive/gnosis/limni/lists/stream/articles.tsv" )
 DEFAULT_STREAM_PATH = pathlib.Path( WEB_STREAM_FILEPATH )
+STREAM_BATCH_SIZE = 5000
 
 
-def load_events( filepath: pathlib.Path = None, seen=None ) -> Iterable[ UrlEvent ]:
+class Rejected( Exception ):
+    """An event failing for good, e.g. a 404 or a page without text: settled, where other failures are read again."""
+
+
+def read_stream( filepath: pathlib.Path, offset: int = 0, batch_size: int = STREAM_BATCH_SIZE,
+                 complete_only: bool = False ) -> Iterator[ Tuple[ int, List[ bytes ] ] ]:
+    """Lazily reads the stream in batches of raw lines, each paired with the byte offset right after it.
+
+    With ``complete_only`` a trailing line without its newline is left for the next read, since it may still be
+    in the middle of being written.
+    """
+    with open( str( filepath ), "rb" ) as file:
+        file.seek( offset )
+        if offset == 0:
+            # header
+            offset += len( file.readline() )
+
+        lines = [ ]
+        for line in file:
+            if complete_only and not line.endswith( b"\n" ):
+                break
+            offset += len( line )
+            lines.append( line )
+            if len( lines ) == batch_size:
+                yield offset, lines
+                lines = [ ]
+
+        if lines:
+            yield offset, lines
+
+
+def parse_batch( lines: List[ bytes ] ) -> List[ UrlEvent ]:
+    return EventParsing.parse_lines( line.decode( "utf-8", errors="replace" ) for line in lines )
+
+
+def stream_events( filepath: pathlib.Path = None, offset: int = 0, batch_size: int = STREAM_BATCH_SIZE,
+                   processes: int = None, complete_only: bool = False ) -> Iterator[ Tuple[ int, List[ UrlEvent ] ] ]:
+    """Yields parsed batches of the stream together with the offset to resume from once they are consumed.
+
+    With ``processes`` the batches are parsed on a process pool, keeping at most two batches per worker in flight
+    so memory stays flat however large the stream is.
+    """
+    batches = read_stream( filepath or DEFAULT_STREAM_PATH, offset=offset, batch_size=batch_size,
+                           complete_only=complete_only )
+
+    if not processes:
+        for end, lines in batches:
+            yield end, parse_batch( lines )
+        return
+
+    with ProcessPoolExecutor( processes ) as executor:
+        pending = collections.deque()
+        for end, lines in batches:
+            pending.append( (end, executor.submit( parse_batch, lines )) )
+            if len( pending ) >= 2 * processes:
+                end, future = pending.popleft()
+                yield end, future.result()
+
+        while pending:
+            end, future = pending.popleft()
+            yield end, future.result()
+
+
+class StreamCheckpoint:
+    """Remembers how far the stream was consumed, so later runs only read its new tail.
+
+    Besides the offset it records the inode of the file and a hash of the bytes right before the offset. The stream
+    is append only, so when the inode changed or that hash no longer matches, the file was replaced, rotated or
+    rewritten and reading starts over; the ``SeenIndex`` skips what was already processed.
+    """
+
+    DEFAULT_PATH: ClassVar = PageStore.DEFAULT_PATH / "stream.checkpoint"
+    WINDOW: ClassVar = 1024
+
+    def __init__( self, path: pathlib.Path = None ):
+        self.path = pathlib.Path( path or self.DEFAULT_PATH )
+
+    def load( self ) -> Mapping | None:
+        try:
+            return json.loads( self.path.read_text() )
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def resume( self, filepath: pathlib.Path ) -> int:
+        saved = self.load()
+        if not saved or saved[ "path" ] != str( filepath ):
+            return 0
+
+        offset = saved[ "offset" ]
+        stat = os.stat( filepath )
+        if stat.st_ino != saved[ "inode" ] or stat.st_size < offset:
+            return 0
+        if self.tail_hash( filepath, offset ) != saved[ "tail_hash" ]:
+            return 0
+
+        return offset
+
+    def save( self, filepath: pathlib.Path, offset: int ) -> None:
+        state = {
+            "path": str( filepath ),
+            "offset": offset,
+            "inode": os.stat( filepath ).st_ino,
+            "tail_hash": self.tail_hash( filepath, offset ),
+        }
+
+        self.path.parent.mkdir( parents=True, exist_ok=True )
+        temporary = self.path.with_suffix( ".tmp" )
+        temporary.write_text( json.dumps( state ) )
+        os.replace( temporary, self.path )
+
+    @classmethod
+    def tail_hash( cls, filepath: pathlib.Path, offset: int ) -> String:
+        start = max( 0, offset - cls.WINDOW )
+        with open( str( filepath ), "rb" ) as file:
+            file.seek( start )
+            return hashlib.md5( file.read( offset - start ) ).hexdigest()
+
+
+class StreamProgress:
+    """Saves a ``StreamCheckpoint`` past a batch of the stream only once every event handed out of it is ``done``,
+    e.g. from ``Pipeline.run``, and of the batches before it too.
+
+    A run stopping with events in flight reads them again next time, the ``SeenIndex`` skipping those persisted
+    meanwhile. An event failing other than ``Rejected`` is never done, holding the checkpoint below it so the next
+    run retries it. ``position`` is where reading goes on, ahead of the checkpoint by the batches in flight.
+    """
+
+    def __init__( self, checkpoint: StreamCheckpoint, filepath: pathlib.Path = None ):
+        self.checkpoint = checkpoint
+        self.filepath = filepath or DEFAULT_STREAM_PATH
+        self.position: int | None = None
+        # [end offset, events not done yet], in stream order
+        self._batches: Deque[ List[ int ] ] = collections.deque()
+        self._batch_of: Dict[ int, List[ int ] ] = { }
+
+    def start( self ) -> int:
+        return self.position if self.position is not None else self.checkpoint.resume( self.filepath )
+
+    def restart( self ) -> None:
+        """The stream was replaced: read it from the checkpoint again, forgetting the batches of the old file."""
+        self.position = None
+        self._batches.clear()
+        self._batch_of.clear()
+
+    def handed_out( self, end: int, events: List[ UrlEvent ] ) -> None:
+        """The unseen events of the batch ending at ``end``, about to be yielded."""
+        batch = [ end, len( events ) ]
+        for event in events:
+            self._batch_of[ id( event ) ] = batch
+        self._batches.append( batch )
+        self.position = end
+        self._advance()
+
+    def done( self, event: UrlEvent, error: BaseException = None ) -> None:
+        batch = self._batch_of.pop( id( event ), None )
+        if batch is not None and (error is None or isinstance( error, Rejected )):
+            batch[ 1 ] -= 1
+            self._advance()
+
+    def _advance( self ) -> None:
+        end = None
+        while self._batches and self._batches[ 0 ][ 1 ] == 0:
+            end = self._batches.popleft()[ 0 ]
+        if end is not None:
+            self.checkpoint.save( self.filepath, end )
+
+
+def load_events( filepath: pathlib.Path = None, seen: Container[ String ] = None, offset: int = 0,
+                 batch_size: int = STREAM_BATCH_SIZE, processes: int = None,
+                 progress: StreamProgress = None ) -> Iterable[ UrlEvent ]:
+    """Yields the unseen events of the stream.
+
+    With a ``progress`` reading resumes from its checkpoint, which only advances past events reported ``done``.
+    """
+    filepath = filepath or DEFAULT_STREAM_PATH
+    seen = seen if seen is not None else set()
+    if progress is not None:
+        offset = progress.start()
+
+    for end, events in stream_events( filepath, offset=offset, batch_size=batch_size, processes=processes,
+                                      complete_only=progress is not None ):
+        events = [ event for event in events if event.digest() not in seen ]
+        if progress is not None:
+            progress.handed_out( end, events )
+        yield from events
+
+
+async def load_events_async( filepath: pathlib.Path = None, seen: Container[ String ] = None, offset: int = 0,
+                             batch_size: int = STREAM_BATCH_SIZE, processes: int = None,
+                             progress: StreamProgress = None ) -> AsyncIterator[ UrlEvent ]:
+    """``load_events`` for the event loop, e.g. as the source of a ``Pipeline``: batches are read and parsed on a
+    worker thread so the stages keep running meanwhile.
+    """
+    filepath = filepath or DEFAULT_STREAM_PATH
+    seen = seen if seen is not None else set()
+    if progress is not None:
+        offset = progress.start()
+
+    batches = stream_events( filepath, offset=offset, batch_size=batch_size, processes=processes,
+                             complete_only=progress is not None )
+    async for end, events in _off_loop( batches ):
+        events = [ event for event in events if event.digest() not in seen ]
+        if progress is not None:
+            progress.handed_out( end, events )
+        for event in events:
+            yield event
+
+
+async def _off_loop( batches: Iterator[ Tuple[ int, List[ UrlEvent ] ] ] ) -> AsyncIterator[ Tuple[ int, List[ UrlEvent ] ] ]:
+    """Advances ``batches`` one batch at a time on a worker thread."""
+    try:
+        while True:
+            batch = await asyncio.to_thread( next, batches, None )
+            if batch is None:
+                return
+            yield batch
+    finally:
+        if not batches.gi_running:
+            # otherwise cancelled in the middle of a read, the thread still owns it
+            batches.close()
+
+
+async def tail_events( filepath: pathlib.Path = None, seen: Container[ String ] = None,
+                       progress: StreamProgress = None, batch_size: int = STREAM_BATCH_SIZE,
+                       interval: float = 1.0 ) -> AsyncIterator[ List[ UrlEvent ] ]:
+    """Like ``tail -f``: yields batches of unseen events as they are appended to the stream, forever."""
     filepath = filepath or DEFAULT_STREAM_PATH
-    seen = seen or set()
+    seen = seen if seen is not None else set()
+    progress = progress or StreamProgress( StreamCheckpoint(), filepath )
+
+    identity = None
+    while True:
+        try:
+            stat = os.stat( filepath )
+        except FileNotFoundError:
+            # being replaced
+            await asyncio.sleep( interval )
+            continue
 
-    with open( str( filepath ), "r" ) as file:
-        for i, content in enumerate( file.readlines() ):
-            if i > 0:
-                url = EventParsing.parse_url( content )
-                if url.successful():
-                    event = url.expect()
-                    if event.raw not in seen:
-                        yield event
+        if (stat.st_ino, stat.st_size, stat.st_mtime_ns) != identity:
+            if identity is not None and stat.st_ino != identity[ 0 ]:
+                progress.restart()
+            identity = stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+            batches = stream_events( filepath, offset=progress.start(), batch_size=batch_size, complete_only=True )
+            async for end, events in _off_loop( batches ):
+                events = [ event for event in events if event.digest() not in seen ]
+                progress.handed_out( end, events )
+                if events:
+                    yield events
+
+        await asyncio.sleep( interval )
 
 
 def remove_file( content: PageContent ):
@@ -33,7 +287,11 @@ def remove_file( content: PageContent ):
     file.unlink()
 
 
-def load_processed() -> Iterable[ PageContent ]:
+def load_processed( store: PageStore = None ) -> Iterable[ PageContent ]:
+    if store is not None:
+        yield from store.scan()
+        return
+
     for f in Processer.DEFAULT_PATH.glob( "*" ):
         try:
             with open( f, "rb" ) as file:
@@ -46,12 +304,22 @@ def load_processed() -> Iterable[ PageContent ]:
         yield content
 
 
+DOWNLOADED = registry.counter( "roi_downloaded_bytes_total", "Response body bytes received by the Fetcher" )
+RESPONSES = registry.counter( "roi_responses_total", "Responses received by the Fetcher, by status class", ("status",) )
+FETCHED = registry.counter( "roi_urls_fetched_total", "URLs fetched by the Processer, by kind and outcome",
+                            ("kind", "outcome") )
+IN_FLIGHT = registry.gauge( "roi_in_flight", "Fetches running per host", ("host",) )
+PERSISTED = registry.counter( "roi_pages_persisted_total", "Pages persisted, or skipped as near duplicates",
+                              ("outcome",) )
+
+
 class Fetcher:
     _USER_AGENT: ClassVar = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/83.0.4103.116 Safari/537.36'
 
-    def __init__( self, session: ClientSession = None ):
+    def __init__( self, session: ClientSession = None, limit: int = 100 ):
         if not session:
-            tcp_connector = aiohttp.TCPConnector( verify_ssl=False, limit_per_host=2, limit=10 )
+            # per host concurrency is left to the HostScheduler
+            tcp_connector = aiohttp.TCPConnector( verify_ssl=False, limit_per_host=0, limit=limit )
             timeout = ClientTimeout( total=300 )
             session = aiohttp.ClientSession( connector=tcp_connector, timeout=timeout )
 
@@ -75,8 +343,39 @@ class Fetcher:
                                        request_url=str( resp.request_info.url ),
                                        request_real_url=str( resp.request_info.real_url ),
                                        )
+            DOWNLOADED.inc( len( response.response_content ) )
+            RESPONSES.labels( f"{resp.status // 100}xx" ).inc()
             return response
 
+    async def stream( self, url: String, headers=None, chunk_size: int = 64 * 1024 ) -> AsyncIterator[ bytes ]:
+        """The body of a successful response as it arrives, gunzipped when the file itself is gzip ( ``.xml.gz`` ).
+
+        aiohttp already undoes a gzip ``Content-Encoding``, this is for the files that are stored compressed.
+        """
+        headers = headers or {"User-Agent": self._USER_AGENT}
+
+        async with self.session.get( url, headers=headers ) as resp:
+            if not 200 <= resp.status <= 299:
+                raise Exception( f"Unsucessful response {resp.status}" )
+
+            head, decompressor = b"", None
+            async for chunk in resp.content.iter_chunked( chunk_size ):
+                DOWNLOADED.inc( len( chunk ) )
+                if decompressor is None:
+                    # the magic number could be split over the first chunks
+                    head += chunk
+                    if len( head ) < 2:
+                        continue
+                    chunk, head = head, b""
+                    decompressor = zlib.decompressobj( 16 + zlib.MAX_WBITS ) if chunk[ :2 ] == b"\x1f\x8b" else False
+
+                yield decompressor.decompress( chunk ) if decompressor else chunk
+
+            if head:
+                yield head
+            if decompressor:
+                yield decompressor.flush()
+
     async def __aexit__( self, exc_type, exc_val, exc_tb ):
         await self.session.__aexit__( exc_type, exc_val, exc_tb )
 
@@ -87,18 +386,34 @@ class Processer:
     DEFAULT_PATH: ClassVar = pathlib.Path( basepath ) / "processed"
 
     youtube_pattern: ClassVar = re.compile( r"(?<=v=)(\w+?)(?=\b|&)" )
+    # client errors worth asking again later, the others are final
+    TRANSIENT: ClassVar = frozenset( { 408, 425, 429 } )
 
-    def __init__( self, fetcher: Fetcher, connection="" ):
+    def __init__( self, fetcher: Fetcher, connection="", store: PageStore = None, seen: SeenIndex = None,
+                  scheduler: HostScheduler = None, extraction: ExtractionService = None, archiver: WarcArchiver = None,
+                  dedup: NearDuplicateIndex = None ):
 
-        self.semaphore = asyncio.Semaphore( 1000 )
         self.fetcher = fetcher
+        self.archiver = archiver
+        self.extraction = extraction
+        self.scheduler = scheduler or HostScheduler()
+        self.store = store
+        self.seen = seen
+        self.dedup = dedup
         # self.connection = sqlite3.connect( connection )
 
     async def __aenter__( self ):
+        # read on scrape from the scheduler, which tracks them anyway
+        IN_FLIGHT.collect( self._in_flight )
         return self
 
     async def __aexit__( self, exc_type, exc_val, exc_tb ):
-        await self.fetcher.__aexit__( exc_type, exc_val, exc_tb )
+        IN_FLIGHT.discard( self._in_flight )
+        if self.fetcher is not None:
+            await self.fetcher.__aexit__( exc_type, exc_val, exc_tb )
+
+    def _in_flight( self ):
+        return {(host,): state.in_flight for host, state in self.scheduler.hosts.items() if state.in_flight}
 
     async def process( self, url: UrlEvent ) -> None:
 
@@ -107,67 +422,93 @@ class Processer:
 
             raw_archive = await self.fetch( url )
             rich_content = await self.enrich( raw_archive )
-            if not rich_content.text:
-                raise Exception("No text")
-
             await self.persist( rich_content )
 
+    def pipeline( self, fetchers: int = 200, enrichers: int = 4, persisters: int = 1, capacity: int = 100 ) -> Pipeline:
+        """Fetch → enrich → persist as continuously overlapping stages, see ``roi_utils.pipeline``."""
+        return Pipeline( Stage( "fetch", self.fetch, workers=fetchers, capacity=capacity ),
+                         Stage( "enrich", self.enrich, workers=enrichers, capacity=capacity ),
+                         Stage( "persist", self.persist, workers=persisters, capacity=capacity ) )
+
+    def reprocess( self, enrichers: int = 4, persisters: int = 1, capacity: int = 100 ) -> Pipeline:
+        """Enrich → persist for archives read back from a ``WarcArchiver``, without touching the network."""
+        return Pipeline( Stage( "enrich", self.enrich, workers=enrichers, capacity=capacity ),
+                         Stage( "persist", self.persist, workers=persisters, capacity=capacity ) )
 
     # region raw
     async def fetch( self, url: UrlEvent ) -> WebArchive:
 
         with ExecutionContext( "Fetching Raw",
-                               extra={"digest": url.digest(), "kind": url.kind.value} ):
+                               extra={"digest": url.digest(), "kind": url.kind.value, "host": url.hostname} ):
+
+            try:
+                response = await self.scheduler.submit( url.hostname, lambda: self.fetcher.fetch( url.raw ) )
+            except Exception:
+                FETCHED.labels( url.kind.value, "error" ).inc()
+                raise
+            FETCHED.labels( url.kind.value, "ok" if 200 <= response.response_status <= 299 else "unsuccessful" ).inc()
+            archive = WebArchive( url=url, content=response )
 
-            response = await self.fetcher.fetch( url.raw )
+            if self.archiver is not None:
+                await asyncio.to_thread( self.archiver.write, archive )
 
             if 200 <= response.response_status <= 299:
-                return WebArchive( url=url, content=response )
+                return archive
+            elif 400 <= response.response_status <= 499 and response.response_status not in self.TRANSIENT:
+                raise Rejected( f"Unsucessful response {response.response_status}" )
             else:
-                raise Exception( "Unsucessful response" )
+                raise Exception( f"Unsucessful response {response.response_status}" )
 
     # endregion
 
     # region rich
     async def enrich( self, archive: WebArchive ) -> PageContent:
 
-        url = archive.url
-        content = archive.content.response_content
-
         with ExecutionContext( "Processing", exc_level="error", exc_suppress=False,
                                extra={"digest": archive.digest(), "kind": archive.kind.value} ):
 
-            match archive.content.response_content_type, archive.kind:
-
-                case "text/html", UrlKinds.YOUTUBE:
-                    content = Youtube.structure( url, content.decode() )
-                    return await self.add_transcript( content )
-
-                case "text/html", _:
-
-                    try:
-                        return HTML.structure( url, content )
-                    except Exception as e:
-                        print( e )
+            if self.extraction is None:
+                content = structure( archive.url, archive.content.response_content_type, archive.content.response_content )
+            else:
+                content = await self.extraction.structure( archive )
 
-                case "application/pdf", _:
-                    return PDF.structure( url, content )
+            # transcripts need the network, a reprocessing Processer has no fetcher
+            if content is not None and archive.kind == UrlKinds.YOUTUBE and self.fetcher is not None:
+                content = await self.add_transcript( content )
 
-                case mime:
+            if not content or not content.text:
+                raise Rejected( "No text" )
 
-                    raise Exception( "Unsupported Mime Type and kind " + mime )
+            return content
 
     # endregion
 
     async def persist( self, processed: PageContent ):
-        with ExecutionContext( "Persist Processed", exc_suppress=True,
+        with ExecutionContext( "Persist Processed",
                                extra={"digest": processed.digest(), "kind": "Unknown"} ):
-            await save_async( processed, path=self.DEFAULT_PATH / processed.digest() )
+            original, fingerprint = self.dedup.find( processed ) if self.dedup is not None else (None, None)
+            if original is None:
+                if self.store is not None:
+                    self.store.put( processed )
+                else:
+                    await save_async( processed, path=self.DEFAULT_PATH / processed.digest() )
+                # only once stored, a page failing to persist must not turn its mirrors into duplicates of nothing
+                if fingerprint is not None:
+                    self.dedup.insert( processed.digest(), fingerprint )
+                PERSISTED.labels( "stored" ).inc()
+            else:
+                PERSISTED.labels( "duplicate" ).inc()
+
+            # a near duplicate is seen all the same, so the copy is not fetched again
+            if self.seen is not None:
+                self.seen.add( processed.digest() )
 
     async def add_transcript( self, item: PageContent ):
         video_id = self.youtube_pattern.search( item.url )
         if video_id:
-            content = await self.fetcher.fetch( "https://youtubetranscript.com", params={"server_vid": video_id.group( 0 )} )
+            params = {"server_vid": video_id.group( 0 )}
+            content = await self.scheduler.submit( "youtubetranscript.com",
+                                                   lambda: self.fetcher.fetch( "https://youtubetranscript.com", params=params ) )
             status = content.response_status
             if 200 <= status <= 299:
                 transcript = Youtube.transcript( content )
@@ -0,0 +1,9 @@
+from .batch import BatchResult, batch_extract
+from .xml import TextWriter, xmltotxt
+
+__all__ = (
+    batch_extract,
+    BatchResult,
+    TextWriter,
+    xmltotxt,
+)
@@ -0,0 +1,246 @@
+"""
+Resolve the attribute predicates of the extraction X-Paths from a per tree index of attribute values
+"""
+
+import re
+
+from lxml.etree import XPath
+
+
+TOKENS = re.compile( r'''\s*(\.//\*|//\*|self::[\w-]+|@[\w-]+|"[^"]*"|'[^']*'|starts-with|contains|translate|or|\d+|[()\[\],=])\s*''' )
+
+COLLECTORS = {}
+
+
+class Term:
+    '''One ``contains`` / ``starts-with`` / ``=`` / existence test on an attribute, with an optional ``translate``'''
+    __slots__ = [ 'attribute', 'operation', 'needle', 'table' ]
+
+    def __init__( self, attribute, operation, needle=None, table=None ):
+        self.attribute = attribute
+        self.operation = operation
+        self.needle = needle
+        self.table = table
+
+    def test( self, value ):
+        if self.table is not None:
+            value = value.translate( self.table )
+        if self.operation == 'contains':
+            return self.needle in value
+        if self.operation == 'starts-with':
+            return value.startswith( self.needle )
+        if self.operation == '=':
+            return value == self.needle
+        return True
+
+
+class AttributeIndex:
+    '''Attribute value → elements for the descendants of a context, in a single walk of the tree.
+
+    Values are kept whole, not split on whitespace, since ``contains(@class, " ad ")`` and the like match across class
+    tokens. The values repeat a lot across elements, so every test runs once per distinct value instead of per element.
+    '''
+
+    def __init__( self, context, attributes, absolute=False ):
+        self.values = {attribute: { } for attribute in attributes}
+        self.order = { }
+
+        for value in collector( attributes, absolute )( context ):
+            element = value.getparent()
+            # the union is in document order, and the attributes of an element come before its children
+            self.order.setdefault( element, len( self.order ) )
+            self.values[ value.attrname ].setdefault( str( value ), [ ] ).append( element )
+
+    def select( self, terms ):
+        matched = set()
+        for term in terms:
+            for value, elements in self.values[ term.attribute ].items():
+                if term.test( value ):
+                    matched.update( elements )
+        return matched
+
+    def sort( self, elements ):
+        return sorted( elements, key=self.order.__getitem__ )
+
+
+def collector( attributes, absolute ):
+    '''Compiled union of every wanted attribute of the descendants ( or of the whole document )'''
+    key = (attributes, absolute)
+    evaluator = COLLECTORS.get( key )
+    if evaluator is None:
+        path = '//*' if absolute else './/*'
+        evaluator = COLLECTORS[ key ] = XPath( ' | '.join( path + '/@' + attribute for attribute in attributes ) )
+    return evaluator
+
+
+class AttributeSelector:
+    '''An expression of the form ``[(].//*[(self::a or self::b)][term or term …][)[1]]`` resolved with an index'''
+    __slots__ = [ 'absolute', 'tags', 'terms', 'first', 'attributes' ]
+
+    def __init__( self, absolute, tags, terms, first ):
+        self.absolute = absolute
+        self.tags = tags
+        self.terms = terms
+        self.first = first
+        self.attributes = tuple( sorted( { term.attribute for term in terms } ) )
+
+    def __call__( self, context ):
+        index = AttributeIndex( context, self.attributes, self.absolute )
+        return self.evaluate( index )
+
+    def evaluate( self, index ):
+        matched = index.select( self.terms )
+        if self.tags is not None:
+            matched = [ element for element in matched if element.tag in self.tags ]
+        result = index.sort( matched )
+        return result[ :1 ] if self.first else result
+
+    @classmethod
+    def parse( cls, expression ):
+        '''The selector for an expression, or None when it uses anything else'''
+        tokens = tokenize( expression )
+        if tokens is None:
+            return None
+        try:
+            selector, position = cls._parse( tokens )
+        except (IndexError, ValueError):
+            return None
+        return selector if position == len( tokens ) else None
+
+    @classmethod
+    def _parse( cls, tokens ):
+        position, first = 0, False
+        if tokens[ 0 ] == '(':
+            first, position = True, 1
+
+        if tokens[ position ] not in ('.//*', '//*'):
+            raise ValueError( tokens[ position ] )
+        absolute = tokens[ position ] == '//*'
+        position += 1
+
+        tags, terms = None, None
+        while position < len( tokens ) and tokens[ position ] == '[':
+            if tokens[ position + 1 ] == '(' and tokens[ position + 2 ].startswith( 'self::' ):
+                if tags is not None:
+                    raise ValueError( 'two tag filters' )
+                tags, position = _parse_tags( tokens, position + 2 )
+            else:
+                if terms is not None:
+                    raise ValueError( 'two predicates' )
+                terms, position = _parse_terms( tokens, position + 1 )
+            position = _expect( tokens, position, ']' )
+
+        if not terms:
+            raise ValueError( 'no attribute predicate' )
+        if first:
+            for token in (')', '[', '1', ']'):
+                position = _expect( tokens, position, token )
+        return cls( absolute, tags, terms, first ), position
+
+
+class MergedSelector:
+    '''Union of selectors sharing one index, for the discard lists'''
+    __slots__ = [ 'selectors', 'absolute', 'attributes' ]
+
+    def __init__( self, selectors ):
+        self.selectors = selectors
+        self.absolute = selectors[ 0 ].absolute
+        self.attributes = tuple( sorted( { a for selector in selectors for a in selector.attributes } ) )
+
+    def __call__( self, context ):
+        index = AttributeIndex( context, self.attributes, self.absolute )
+        matched = set()
+        for selector in self.selectors:
+            matched.update( selector.evaluate( index ) )
+        return index.sort( matched )
+
+    @classmethod
+    def parse( cls, expressions ):
+        selectors = [ AttributeSelector.parse( expression ) for expression in expressions ]
+        if not selectors or None in selectors:
+            return None
+        if any( selector.first or selector.absolute != selectors[ 0 ].absolute for selector in selectors ):
+            return None
+        return cls( selectors )
+
+
+def tokenize( expression ):
+    tokens, position = [ ], 0
+    while position < len( expression ):
+        match = TOKENS.match( expression, position )
+        if match is None:
+            return None
+        tokens.append( match.group( 1 ) )
+        position = match.end()
+    return tokens
+
+
+def _expect( tokens, position, token ):
+    if tokens[ position ] != token:
+        raise ValueError( tokens[ position ] )
+    return position + 1
+
+
+def _string( token ):
+    if token[ :1 ] not in ('"', "'"):
+        raise ValueError( token )
+    return token[ 1:-1 ]
+
+
+def _parse_tags( tokens, position ):
+    tags = set()
+    while True:
+        if not tokens[ position ].startswith( 'self::' ):
+            raise ValueError( tokens[ position ] )
+        tags.add( tokens[ position ][ len( 'self::' ): ] )
+        position += 1
+        if tokens[ position ] != 'or':
+            break
+        position += 1
+    return frozenset( tags ), _expect( tokens, position, ')' )
+
+
+def _parse_terms( tokens, position ):
+    terms = [ ]
+    while True:
+        term, position = _parse_term( tokens, position )
+        terms.append( term )
+        if tokens[ position ] != 'or':
+            return terms, position
+        position += 1
+
+
+def _parse_term( tokens, position ):
+    token = tokens[ position ]
+    if token.startswith( '@' ):
+        if tokens[ position + 1 ] == '=':
+            return Term( token[ 1: ], '=', _string( tokens[ position + 2 ] ) ), position + 3
+        return Term( token[ 1: ], 'exists' ), position + 1
+
+    if token not in ('contains', 'starts-with'):
+        raise ValueError( token )
+    position = _expect( tokens, position + 1, '(' )
+
+    table = None
+    if tokens[ position ] == 'translate':
+        position = _expect( tokens, position + 1, '(' )
+        attribute = tokens[ position ]
+        position = _expect( tokens, position + 1, ',' )
+        source = _string( tokens[ position ] )
+        position = _expect( tokens, position + 1, ',' )
+        target = _string( tokens[ position ] )
+        position = _expect( tokens, position + 1, ')' )
+        # XPath drops the characters without a counterpart, and the first occurrence of a character wins
+        table = { }
+        for i, character in enumerate( source ):
+            table.setdefault( ord( character ), target[ i ] if i < len( target ) else None )
+    else:
+        attribute = tokens[ position ]
+        position += 1
+
+    if not attribute.startswith( '@' ):
+        raise ValueError( attribute )
+    position = _expect( tokens, position, ',' )
+    needle = _string( tokens[ position ] )
+    position = _expect( tokens, position + 1, ')' )
+    return Term( attribute[ 1: ], token, needle, table ), position
@@ -0,0 +1,84 @@
+"""
+Extraction of many documents on a pool of warmed worker processes.
+"""
+
+import collections
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from .core import bare_extraction
+from .external import jt_stoplist_init
+from .utils import load_tree
+
+WARMUP_DOCUMENT = '<html><head><title>warm up</title><meta name="date" content="2022-01-01"/></head><body>' \
+                  '<article><p>' + 'Warming up the extraction caches. ' * 20 + '</p></article></body></html>'
+
+
+class BatchResult:
+    'Outcome of one document: its position in the input, the extraction or the error, and the seconds it took'
+    __slots__ = [ 'index', 'document', 'error', 'seconds' ]
+
+    def __init__( self, index, document=None, error=None, seconds=0.0 ):
+        self.index = index
+        self.document = document
+        self.error = error
+        self.seconds = seconds
+
+    def __repr__( self ):
+        return f'BatchResult({self.index}, error={self.error!r}, seconds={self.seconds:.4f})'
+
+
+def warm():
+    '''Loads everything the extraction otherwise builds on its first document: the justext stoplists and the
+       lazy imports and caches of htmldate, readability and the cleaner. XPaths are compiled at import.'''
+    jt_stoplist_init()
+    bare_extraction( load_tree( WARMUP_DOCUMENT ) )
+
+
+def extract_one( index, content, options ):
+    start = time.perf_counter()
+    try:
+        document = bare_extraction( load_tree( content ), **options )
+    except Exception as err:
+        return BatchResult( index, error=f'{type( err ).__name__}: {err}', seconds=time.perf_counter() - start )
+    return BatchResult( index, document=document, seconds=time.perf_counter() - start )
+
+
+def batch_extract( documents, workers=None, ordered=True, in_flight=None, **options ):
+    '''Extract every document of an iterable of HTML bytes, yielding a BatchResult per document.
+
+    Args:
+        documents: HTML code as bytes ( or strings ), consumed lazily.
+        workers: Worker processes, every one warmed once; 0 extracts in this process.
+        ordered: Yield in input order, otherwise as the documents complete.
+        in_flight: Documents submitted ahead of the results, 4 per worker by default.
+        options: Passed to bare_extraction.
+    '''
+    workers = os.cpu_count() if workers is None else workers
+    if workers == 0:
+        warm()
+        for index, content in enumerate( documents ):
+            yield extract_one( index, content, options )
+        return
+
+    in_flight = in_flight or 4 * workers
+    with ProcessPoolExecutor( workers, initializer=warm ) as executor:
+        pending = collections.deque()
+        for index, content in enumerate( documents ):
+            pending.append( executor.submit( extract_one, index, content, options ) )
+            if len( pending ) >= in_flight:
+                yield from _drain( pending, ordered, in_flight - 1 )
+        yield from _drain( pending, ordered, 0 )
+
+
+def _drain( pending, ordered, keep ):
+    while len( pending ) > keep:
+        if ordered:
+            yield pending.popleft().result()
+            continue
+
+        done, _ = wait( pending, return_when=FIRST_COMPLETED )
+        for future in done:
+            pending.remove( future )
+            yield future.result()
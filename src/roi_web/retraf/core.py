@@ -36,7 +36,7 @@ from .utils import trim, is_image_file
 from .xml import (xmltotxt)
 from .xpaths import (BODY_XPATH, COMMENTS_XPATH, COMMENTS_DISCARD_XPATH, OVERALL_DISCARD_XPATH,
                      TEASER_DISCARD_XPATH, PAYWALL_DISCARD_XPATH, PRECISION_DISCARD_XPATH,
-                     DISCARD_IMAGE_ELEMENTS, REMOVE_COMMENTS_XPATH)
+                     DISCARD_IMAGE_ELEMENTS, REMOVE_COMMENTS_XPATH, XPATHS)
 
 LOGGER = logging.getLogger( __name__ )
 
@@ -50,6 +50,21 @@ CODES_QUOTES = {'code', 'quote'}
 NOT_AT_THE_END = {'fw', 'head', 'ref'}
 
 
+class TreeBackup:
+    '''A copy of the tree for the fallbacks: taken right away, or rebuilt by ``rebuild`` the first time one asks'''
+    __slots__ = [ '_tree', '_rebuild' ]
+
+    def __init__( self, tree=None, rebuild=None ):
+        self._tree = deepcopy( tree ) if rebuild is None else None
+        self._rebuild = rebuild
+
+    def get( self ):
+        if self._tree is None and self._rebuild is not None:
+            self._tree = self._rebuild()
+            self._rebuild = None
+        return self._tree
+
+
 def handle_titles( element, dedupbool, config ):
     '''Process head elements (titles)'''
     if len( element ) == 0:
@@ -460,12 +475,12 @@ def prune_unwanted_sections( tree, potential_tags, favor_recall, favor_precision
 
 
 def extract_content( tree, favor_precision=False, favor_recall=False, include_tables=False, include_images=False,
-                     include_links=False, deduplicate=False, config=None ):
+                     include_links=False, deduplicate=False, config=None, backup_tree=None ):
     '''Find the main content of a page using a set of XPath expressions,
        then extract relevant elements, strip them of unwanted subparts and
        convert them'''
     # backup
-    backup_tree = deepcopy( tree )
+    backup_tree = backup_tree or TreeBackup( tree )
     # init
     result_body = Element( 'body' )
     potential_tags = set( TAG_CATALOG )
@@ -479,7 +494,7 @@ def extract_content( tree, favor_precision=False, favor_recall=False, include_ta
     for expr in BODY_XPATH:
         # select tree if the expression has been found
         try:
-            subtree = tree.xpath( expr )[ 0 ]
+            subtree = XPATHS.xpath( tree, expr )[ 0 ]
         except IndexError:
             continue
         # prune the subtree
@@ -528,7 +543,7 @@ def extract_content( tree, favor_precision=False, favor_recall=False, include_ta
     # try parsing wild <p> elements if nothing found or text too short
     # todo: test precision and recall settings here
     if len( result_body ) == 0 or len( temp_text ) < config.getint( 'DEFAULT', 'MIN_EXTRACTED_SIZE' ):
-        result_body = recover_wild_text( backup_tree, result_body, favor_precision=favor_precision,
+        result_body = recover_wild_text( backup_tree.get(), result_body, favor_precision=favor_precision,
                                          favor_recall=favor_recall, potential_tags=potential_tags,
                                          deduplicate=deduplicate, config=config )
         temp_text = trim( ' '.join( result_body.itertext() ) )
@@ -561,7 +576,7 @@ def extract_comments( tree, dedupbool, config ):
     # potential_tags.add('div') trouble with <div class="comment-author meta">
     for expr in COMMENTS_XPATH:
         # select tree if the expression has been found
-        subtree = tree.xpath( expr )
+        subtree = XPATHS.xpath( tree, expr )
         if not subtree:
             continue
         subtree = subtree[ 0 ]
@@ -588,6 +603,19 @@ def extract_comments( tree, dedupbool, config ):
     return comments_body, temp_comments, len( temp_comments ), tree
 
 
+def confident_extraction( postbody, len_text, config ):
+    '''Tell if the main extraction is long, made of paragraphs and light on links
+       enough to be kept without trying the fallback algorithms'''
+    if len_text < config.getint( 'DEFAULT', 'FAST_PATH_MIN_SIZE' ):
+        return False
+    paragraphs = sum( 1 for elem in postbody.iter( 'p' ) if text_chars_test( ''.join( elem.itertext() ) ) )
+    if paragraphs < config.getint( 'DEFAULT', 'FAST_PATH_MIN_PARAGRAPHS' ):
+        return False
+    # links are only kept as <ref> with include_links
+    len_links = sum( len( trim( ''.join( elem.itertext() ) ) ) for elem in postbody.iter( 'ref' ) )
+    return len_links <= len_text * config.getfloat( 'DEFAULT', 'FAST_PATH_MAX_LINK_DENSITY' )
+
+
 def compare_extraction( tree, backup_tree, url, body, text, len_text, target_language, favor_precision, favor_recall,
                         include_formatting, include_links, include_images, include_tables, config ):
     '''Decide whether to choose own or external extraction
@@ -598,7 +626,7 @@ def compare_extraction( tree, backup_tree, url, body, text, len_text, target_lan
         return body, text, len_text
     algo_flag, jt_result = False, False
     # prior cleaning
-    backup_tree = prune_unwanted_nodes( backup_tree, PAYWALL_DISCARD_XPATH )
+    backup_tree = prune_unwanted_nodes( backup_tree.get(), PAYWALL_DISCARD_XPATH )
     if favor_precision is True:
         backup_tree = prune_unwanted_nodes( backup_tree, OVERALL_DISCARD_XPATH )
     # try with readability
@@ -632,10 +660,10 @@ def compare_extraction( tree, backup_tree, url, body, text, len_text, target_lan
     else:
         LOGGER.info( 'using custom extraction: %s', url )
     # override faulty extraction: try with justext
-    if body.xpath( SANITIZED_XPATH ) or len_text < min_target_length:
+    if XPATHS.xpath( body, SANITIZED_XPATH ) or len_text < min_target_length:
         # or favor_recall is True ?
         # tree = prune_unwanted_sections(tree, {}, favor_recall, favor_precision)
-        body2, text2, len_text2, jt_result = justext_rescue( tree, url, target_language, body, 0, '' )
+        body2, text2, len_text2, jt_result = justext_rescue( tree.get(), url, target_language, body, 0, '' )
         if jt_result is True:  # and not len_text > 2*len_text2:
             LOGGER.debug( 'using justext, length: %s', len_text2 )
             body, text, len_text = body2, text2, len_text2
@@ -710,7 +738,10 @@ def bare_extraction( tree: HtmlElement, url=None, no_fallback=False,
                      only_with_metadata=False,
                      max_tree_size=None,
                      author_blacklist=None,
-                     config=DEFAULT_CONFIG ):
+                     config=DEFAULT_CONFIG,
+                     reparse=None,
+                     fast_path=False,
+                     text_sink=None ):
     """Internal function for text extraction returning bare Python variables.
 
     Args:
@@ -738,6 +769,13 @@ def bare_extraction( tree: HtmlElement, url=None, no_fallback=False,
         author_blacklist: Provide a blacklist of Author Names as set() to filter out authors.
         as_dict: Legacy option, return a dictionary instead of a class with attributes.
         config: Directly provide a configparser configuration.
+        reparse: Callable parsing the source again, the fallback trees are then
+            rebuilt from it only when a fallback runs, instead of copied up front.
+        fast_path: Skip readability, justext and the baseline when the main extraction clears
+            the FAST_PATH_* thresholds of the config. The path taken is in 'extraction_path':
+            'fast', 'fallback' (compared with the other algorithms), 'primary' or 'baseline'.
+        text_sink: Stream the main text into this ( a file, a socket file, a TextWriter )
+            as it is converted, 'text' is then None.
 
     Returns:
         A Python dict() containing all the extracted information or None.
@@ -753,41 +791,55 @@ def bare_extraction( tree: HtmlElement, url=None, no_fallback=False,
     document = extract_metadata( tree, url )
 
     # backup (or not) for further processing
-    tree_backup_1 = deepcopy( tree ) if no_fallback is False else None
-    tree_backup_2 = deepcopy( tree )
+    def clean( tree ):
+        return tree_cleaning( tree, include_tables, include_images )
+
+    def prepare( tree ):
+        # convert tags, the rest does not work without conversion
+        tree = convert_tags( tree, include_formatting, include_tables, include_images, include_links )
+        # comments first, then remove
+        comments = extract_comments( tree, deduplicate, config )
+        tree = comments[ -1 ]
+        if favor_precision is True:
+            tree = prune_unwanted_nodes( tree, REMOVE_COMMENTS_XPATH )
+        return comments[ :-1 ], tree
+
+    lazy = reparse is not None
+    tree_backup_1 = TreeBackup( tree, reparse ) if no_fallback is False else None
+    tree_backup_2 = TreeBackup( tree, reparse )
 
     # clean + use LXML cleaner
-    cleaned_tree = tree_cleaning( tree, include_tables, include_images )
-    cleaned_tree_backup = deepcopy( cleaned_tree )
+    cleaned_tree = clean( tree )
+    cleaned_tree_backup = TreeBackup( cleaned_tree, (lambda: clean( reparse() )) if lazy else None )
 
-    # convert tags, the rest does not work without conversion
-    cleaned_tree = convert_tags( cleaned_tree, include_formatting, include_tables, include_images, include_links )
-
-    # comments first, then remove
-    commentsbody, temp_comments, len_comments, cleaned_tree = extract_comments( cleaned_tree, deduplicate,
-                                                                                config )
-    if favor_precision is True:
-        cleaned_tree = prune_unwanted_nodes( cleaned_tree, REMOVE_COMMENTS_XPATH )
+    (commentsbody, temp_comments, len_comments), cleaned_tree = prepare( cleaned_tree )
+    content_backup = TreeBackup( cleaned_tree, (lambda: prepare( clean( reparse() ) )[ 1 ]) if lazy else None )
 
     # extract content
     postbody, temp_text, len_text = extract_content( cleaned_tree, favor_precision, favor_recall, include_tables,
-                                                     include_images, include_links, deduplicate, config )
+                                                     include_images, include_links, deduplicate, config,
+                                                     content_backup )
 
     # compare if necessary
-
-    postbody, temp_text, len_text = compare_extraction( cleaned_tree_backup, tree_backup_1, url, postbody,
-                                                        temp_text, len_text, target_language, favor_precision,
-                                                        favor_recall, include_formatting, include_links,
-                                                        include_images, include_tables, config )
+    document.extraction_path = 'primary'
+    if fast_path is True and confident_extraction( postbody, len_text, config ):
+        document.extraction_path = 'fast'
+    elif no_fallback is False:
+        document.extraction_path = 'fallback'
+        postbody, temp_text, len_text = compare_extraction( cleaned_tree_backup, tree_backup_1, url, postbody,
+                                                            temp_text, len_text, target_language, favor_precision,
+                                                            favor_recall, include_formatting, include_links,
+                                                            include_images, include_tables, config )
     # add baseline as additional fallback
 
     # rescue: try to use original/dirty tree # and favor_precision is False=?
     if len_text < config.getint( 'DEFAULT', 'MIN_EXTRACTED_SIZE' ):
-        postbody, temp_text, len_text = baseline( tree_backup_2 )
+        postbody, temp_text, len_text = baseline( tree_backup_2.get() )
+        document.extraction_path = 'baseline'
         LOGGER.debug( 'non-clean extracted length: %s (extraction)', len_text )
 
     # special case: python variables
-    document.text = xmltotxt( postbody, include_formatting )
+    document.text = xmltotxt( postbody, include_formatting, text_sink )
     document.comments = xmltotxt( commentsbody, include_formatting )
     document = {slot: getattr( document, slot, None ) for slot in document.__slots__}
     return document
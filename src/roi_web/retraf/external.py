@@ -14,7 +14,7 @@ from pickle import load as load_pickle
 
 # third-party
 from justext.core import classify_paragraphs, ParagraphMaker, preprocessor, revise_paragraph_classification
-from justext.utils import get_stoplist  # , get_stoplists
+from justext.utils import get_stoplist, get_stoplists
 from lxml.etree import Element, strip_tags
 from lxml.html import fromstring
 
@@ -24,7 +24,7 @@ from .readability_lxml import Document as ReadabilityDocument  # fork
 from .settings import JUSTEXT_LANGUAGES
 from .utils import trim, HTML_PARSER
 from .xml import TEI_VALID_TAGS
-from .xpaths import PAYWALL_DISCARD_XPATH, REMOVE_COMMENTS_XPATH
+from .xpaths import PAYWALL_DISCARD_XPATH, REMOVE_COMMENTS_XPATH, XPATHS
 
 LOGGER = logging.getLogger( __name__ )
 
@@ -32,6 +32,7 @@ JT_STOPLIST = None
 JT_PICKLE = str( Path( __file__ ).parent / 'data/jt-stopwords-pickle.lzma' )
 
 SANITIZED_XPATH = '//aside|//audio|//button|//fieldset|//figure|//footer|//iframe|//input|//label|//link|//nav|//noindex|//noscript|//object|//option|//select|//source|//svg|//time'
+XPATHS.register( SANITIZED_XPATH )
 
 
 def try_readability( htmlinput ):
@@ -48,12 +49,15 @@ def try_readability( htmlinput ):
 def jt_stoplist_init():
     'Retrieve and return the content of all JusText stoplists'
     global JT_STOPLIST
-    with lzma.open( JT_PICKLE, 'rb' ) as picklefile:
-        JT_STOPLIST = load_pickle( picklefile )
-    # stoplist = set()
-    # for language in get_stoplists():
-    #     stoplist.update(get_stoplist(language))
-    # JT_STOPLIST = tuple(stoplist)
+    if Path( JT_PICKLE ).exists():
+        with lzma.open( JT_PICKLE, 'rb' ) as picklefile:
+            JT_STOPLIST = load_pickle( picklefile )
+        return JT_STOPLIST
+    # the pickle isn't vendored, build the same union from justext
+    stoplist = set()
+    for language in get_stoplists():
+        stoplist.update( get_stoplist( language ) )
+    JT_STOPLIST = tuple( stoplist )
     return JT_STOPLIST
 
 
@@ -110,7 +114,7 @@ def sanitize_tree( tree, include_formatting=False, include_links=False, include_
     '''Convert and sanitize the output from the generic algorithm (post-processing)'''
     # 1. clean
     cleaned_tree = tree_cleaning( tree, include_tables, include_images )
-    for elem in tree.xpath( SANITIZED_XPATH ):
+    for elem in XPATHS.xpath( tree, SANITIZED_XPATH ):
         elem.getparent().remove( elem )
     if include_links is False:
         strip_tags( cleaned_tree, 'a' )
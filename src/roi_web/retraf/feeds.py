@@ -1,5 +1,5 @@
 """
-Examining feeds and extracting links for further processing.
+Examining feeds and extracting links for further processing, the downloads are left to roi_web.discovery.
 """
 
 ## This file is available from https://github.com/adbar/trafilatura
@@ -11,8 +11,7 @@ import re
 
 from courlan import check_url, clean_url, fix_relative_urls, get_hostinfo, validate_url
 
-from .downloads import fetch_url
-from .utils import filter_urls, load_html
+from .utils import load_html
 
 LOGGER = logging.getLogger(__name__)
 
@@ -140,61 +139,3 @@ def determine_feed(htmlstring, baseurl, reference):
     # log result
     LOGGER.debug('Feed URLs found: %s of which %s valid', len(feed_urls), len(output_urls))
     return output_urls
-
-
-def find_feed_urls(url, target_lang=None):
-    """Try to find feed URLs.
-
-    Args:
-        url: Webpage or feed URL as string.
-             Triggers URL-based filter if the webpage isn't a homepage.
-        target_lang: Define a language to filter URLs based on heuristics
-             (two-letter string, ISO 639-1 format).
-
-    Returns:
-        The extracted links as a list (sorted list of unique links).
-
-    """
-    domainname, baseurl = get_hostinfo(url)
-    if domainname is None:
-        LOGGER.warning('Invalid URL: %s', url)
-        return []
-    urlfilter = None
-    downloaded = fetch_url(url)
-    if downloaded is not None:
-        # assume it's a feed
-        feed_links = extract_links(downloaded, domainname, baseurl, url, target_lang)
-        if len(feed_links) == 0:
-            # assume it's a web page
-            for feed in determine_feed(downloaded, baseurl, url):
-                feed_string = fetch_url(feed)
-                feed_links.extend(extract_links(feed_string, domainname, baseurl, url, target_lang))
-            # filter triggered, prepare it
-            if len(url) > len(baseurl) + 2:
-                urlfilter = url
-        # return links found
-        if len(feed_links) > 0:
-            feed_links = filter_urls(feed_links, urlfilter)
-            LOGGER.debug('%s feed links found for %s', len(feed_links), domainname)
-            return feed_links
-        LOGGER.debug('No usable feed links found: %s', url)
-    else:
-        LOGGER.warning('Could not download web page: %s', url)
-        if url.strip('/') != baseurl:
-            return try_homepage(baseurl, target_lang)
-    # try alternative: Google News
-    if target_lang is not None:
-        downloaded = fetch_url('https://news.google.com/rss/search?q=site:' + baseurl + '&hl=' + target_lang + '&scoring=n&num=100')
-        if downloaded is not None:
-            feed_links = extract_links(downloaded, domainname, baseurl, url, target_lang)
-            feed_links = filter_urls(feed_links, urlfilter)
-            LOGGER.debug('%s Google news links found for %s', len(feed_links), domainname)
-            return feed_links
-    return []
-
-
-def try_homepage(baseurl, target_lang):
-    '''Shift into reverse and try the homepage instead of the particular feed
-       page that was given as input.'''
-    LOGGER.info('Probing homepage for feeds instead: %s', baseurl)
-    return find_feed_urls(baseurl, target_lang)
@@ -7,6 +7,7 @@ import logging
 import re
 
 from base64 import b64encode
+from collections import OrderedDict
 from hashlib import sha1
 
 # language detection
@@ -21,8 +22,13 @@ from .utils import trim
 
 LOGGER = logging.getLogger( __name__ )
 
+LRU_SIZE = 4096
+LRU_TEST = OrderedDict()
+
 RE_HTML_LANG = re.compile( r'([a-z]{2})', re.I )
 
+MEANINGFUL_WORDS = re.compile( r'\w{5,}' )
+
 # Mostly filters for social media
 RE_FILTER = re.compile( r'\W*(Drucken|E-?Mail|Facebook|Flipboard|Google|Instagram|'
                         'Linkedin|Mail|PDF|Pinterest|Pocket|Print|QQ|Reddit|Twitter|'
@@ -54,10 +60,28 @@ def text_chars_test( string ):
     return string not in (None, '') and not string.isspace()
 
 
+def meaningful_words( string ):
+    '''Lowercased words of 5+ characters, the bits of the content that tell documents apart'''
+    return MEANINGFUL_WORDS.findall( string.lower() )
+
+
 def content_fingerprint( string ):
     '''Calculate a hash value for meaningful bits of the content'''
-    teststring = ' '.join( re.findall( r'\w{5,}', string.lower() ) )
+    teststring = ' '.join( meaningful_words( string ) )
     m = sha1()
     m.update( teststring.encode() )
     fingerprint = m.digest()
     return b64encode( fingerprint ).decode()
+
+
+def duplicate_test( element, config ):
+    '''Check for duplicate text with a least recently used cache'''
+    teststring = trim( ' '.join( element.itertext() ) )
+    if len( teststring ) > config.getint( 'DEFAULT', 'MIN_DUPLCHECK_SIZE' ):
+        cacheval = LRU_TEST.pop( teststring, 0 )
+        LRU_TEST[ teststring ] = cacheval + 1
+        if len( LRU_TEST ) > LRU_SIZE:
+            LRU_TEST.popitem( last=False )
+        if cacheval > config.getint( 'DEFAULT', 'MAX_REPETITIONS' ):
+            return True
+    return False
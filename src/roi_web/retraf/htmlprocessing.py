@@ -14,9 +14,10 @@ from copy import deepcopy
 from lxml.etree import strip_tags
 from lxml.html.clean import Cleaner
 
-from .filters import textfilter
+from .filters import duplicate_test, textfilter
 from .settings import CUT_EMPTY_ELEMS, DEFAULT_CONFIG, MANUALLY_CLEANED, MANUALLY_STRIPPED
 from .utils import trim, uniquify_list
+from .xpaths import XPATHS
 
 
 LOGGER = logging.getLogger(__name__)
@@ -64,8 +65,10 @@ def tree_cleaning(tree, include_tables, include_images=False):
             except AttributeError:
                 element.getparent().remove(element)
     HTML_CLEANER.kill_tags, HTML_CLEANER.remove_tags = cleaning_list, stripping_list
-    # save space and processing time
-    return HTML_CLEANER.clean_html(prune_html(tree))
+    # save space and processing time, cleaning in place instead of on the copy clean_html makes
+    tree = prune_html(tree)
+    HTML_CLEANER(tree)
+    return tree
 
 
 def prune_html(tree):
@@ -84,8 +87,8 @@ def prune_unwanted_nodes(tree, nodelist, with_backup=False):
     if with_backup is True:
         old_len = len(tree.text_content())  # ' '.join(tree.itertext())
         backup = deepcopy(tree)
-    for expr in nodelist:
-        for subtree in tree.xpath(expr):
+    for subtrees in XPATHS.passes(tree, nodelist):
+        for subtree in subtrees:
             # preserve tail text from deletion
             if subtree.tail is not None:
                 previous = subtree.getprevious()
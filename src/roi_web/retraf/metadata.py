@@ -16,17 +16,20 @@ from .htmlprocessing import prune_unwanted_nodes
 from .json_metadata import extract_json
 from .metaxpaths import author_xpaths, categories_xpaths, tags_xpaths, title_xpaths, author_discard_xpaths
 from .utils import check_authors, line_processing, normalize_authors, normalize_tags, trim, unescape, uniquify_list
+from .xpaths import XPATHS
 
 LOGGER = logging.getLogger( __name__ )
 logging.getLogger( 'htmldate' ).setLevel( logging.WARNING )
 
+XPATHS.register_discard( author_discard_xpaths )
+
 
 class Document:
     "Defines a class to store all necessary data and metadata fields for extracted information."
     __slots__ = [
         'title', 'author', 'url', 'hostname', 'description', 'sitename',
         'date', 'categories', 'tags', 'fingerprint', 'id', 'license',
-        'body', 'comments', 'commentsbody', 'raw_text', 'text'
+        'body', 'comments', 'commentsbody', 'raw_text', 'text', 'extraction_path'
     ]
 
     # consider dataclasses for Python 3.7+
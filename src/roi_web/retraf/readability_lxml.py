@@ -21,7 +21,7 @@ This code: GPLv3+
 import logging
 import re
 
-from lxml.etree import tostring
+from lxml.etree import iterwalk, tostring
 from lxml.html import fragment_fromstring
 
 from .utils import trim
@@ -89,6 +89,83 @@ def text_length(elem):
     return len(trim(elem.text_content())) or 0
 
 
+class TextStats:
+    """Trimmed text length, comma count and link text length of every element, in one post-order walk.
+
+    The trimmed length of a text is its non space characters plus one space between words, so it adds up from the
+    pieces of the element ( text, children, tails ) as long as words running across two pieces are counted once.
+    Link lengths add up the same way, from the children that are <a> and the links below them.
+    """
+    __slots__ = ['index', 'lengths', 'commas', 'links']
+
+    def __init__(self, root):
+        self.index, self.lengths, self.commas, self.links = {}, [], [], []
+
+        # accumulator: [non empty, non space chars, words, starts with a word, ends with a word, commas, links]
+        stack = []
+        for event, elem in iterwalk(root, events=("start", "end")):
+            if event == "start":
+                accumulator = [False, 0, 0, False, False, 0, 0]
+                self._add_text(accumulator, elem.text)
+                # the walk skips comments and processing instructions, but their tails are text of the element
+                for child in elem:
+                    if isinstance(child.tag, str):
+                        break
+                    self._add_text(accumulator, child.tail)
+                stack.append(accumulator)
+                continue
+
+            accumulator = stack.pop()
+            length = accumulator[1] + max(accumulator[2] - 1, 0)
+            self.index[elem] = len(self.lengths)
+            self.lengths.append(length)
+            self.commas.append(accumulator[5])
+            self.links.append(accumulator[6])
+
+            if stack:
+                parent = stack[-1]
+                self._add(parent, accumulator)
+                parent[6] += accumulator[6] + (length if elem.tag == "a" else 0)
+                self._add_text(parent, elem.tail)
+                sibling = elem.getnext()
+                while sibling is not None and not isinstance(sibling.tag, str):
+                    self._add_text(parent, sibling.tail)
+                    sibling = sibling.getnext()
+
+    def __contains__(self, elem):
+        return elem in self.index
+
+    def length(self, elem):
+        return self.lengths[self.index[elem]]
+
+    def comma_count(self, elem):
+        return self.commas[self.index[elem]]
+
+    def link_density(self, elem):
+        position = self.index[elem]
+        return self.links[position] / (self.lengths[position] or 1)
+
+    @staticmethod
+    def _add(accumulator, other):
+        if not other[0]:
+            return
+        if not accumulator[0]:
+            accumulator[:6] = other[:6]
+            return
+        accumulator[1] += other[1]
+        accumulator[2] += other[2] - (1 if accumulator[4] and other[3] else 0)
+        accumulator[4] = other[4]
+        accumulator[5] += other[5]
+
+    @classmethod
+    def _add_text(cls, accumulator, text):
+        if not text:
+            return
+        words = text.split()
+        cls._add(accumulator, [True, sum(map(len, words)), len(words),
+                               not text[0].isspace(), not text[-1].isspace(), text.count(","), 0])
+
+
 class Candidate:
     "Defines a class to score candidate elements."
     __slots__ = ['score', 'elem']
@@ -100,7 +177,7 @@ class Candidate:
 
 class Document:
     """Class to build a etree document out of html."""
-    __slots__ = ['doc', 'min_text_length', 'retry_length']
+    __slots__ = ['doc', 'min_text_length', 'retry_length', 'stats']
 
     def __init__(self, doc, min_text_length=25, retry_length=250):
         """Generate the document
@@ -118,6 +195,7 @@ class Document:
         self.doc = doc
         self.min_text_length = min_text_length
         self.retry_length = retry_length
+        self.stats = None
 
     def get_clean_html(self):
         """
@@ -190,7 +268,7 @@ class Document:
             ):
                 append = True
             elif sibling.tag == "p":
-                link_density = self.get_link_density(sibling)
+                link_density = self.stats.link_density(sibling)
                 node_content = sibling.text or ""
                 node_length = len(node_content)
 
@@ -228,14 +306,15 @@ class Document:
     def score_paragraphs(self):
         candidates = {}
         ordered = []
+        # the lengths hold until the tree changes, in sanitize
+        self.stats = stats = TextStats(self.doc)
         for elem in self.tags(self.doc, "p", "pre", "td"):
             parent_node = elem.getparent()
             if parent_node is None:
                 continue
             grand_parent_node = parent_node.getparent()
 
-            elem_text = trim(elem.text_content() or "")
-            elem_text_len = len(elem_text)
+            elem_text_len = stats.length(elem)
 
             # don't count too short paragraphs
             if elem_text_len < self.min_text_length:
@@ -249,7 +328,7 @@ class Document:
                 candidates[grand_parent_node] = self.score_node(grand_parent_node)
                 ordered.append(grand_parent_node)
 
-            score = 1 + len(elem_text.split(",")) + min((elem_text_len / 100), 3)
+            score = 1 + stats.comma_count(elem) + 1 + min((elem_text_len / 100), 3)
             #if elem not in candidates:
             #    candidates[elem] = self.score_node(elem)
 
@@ -262,7 +341,7 @@ class Document:
         # mostly unaffected by this operation.
         for elem in ordered:
             candidate = candidates[elem]
-            density = self.get_link_density(elem)
+            density = stats.link_density(elem)
             LOGGER.debug("Branch %6.3f link density %.3f -> %6.3f",
                 candidate.score, density, candidate.score * (1 - density)
             )
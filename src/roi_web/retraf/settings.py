@@ -6,8 +6,26 @@ Listing a series of settings that are applied module-wide.
 ## This file is available from https://github.com/adbar/trafilatura
 ## under GNU GPL v3 license
 
+from configparser import ConfigParser
 
-DEFAULT_CONFIG = {}
+# the values of trafilatura's settings.cfg that the extraction reads
+DEFAULT_CONFIG = ConfigParser()
+DEFAULT_CONFIG.read_dict( {'DEFAULT': {
+    'MIN_EXTRACTED_SIZE': '250',
+    'MIN_EXTRACTED_COMM_SIZE': '1',
+    'MIN_OUTPUT_SIZE': '1',
+    'MIN_OUTPUT_COMM_SIZE': '1',
+    'MIN_DUPLCHECK_SIZE': '100',
+    'MAX_REPETITIONS': '2',
+    'EXTRACTION_TIMEOUT': '30',
+    # fast path: the primary extraction is kept without running the fallbacks above these
+    'FAST_PATH_MIN_SIZE': '2000',
+    'FAST_PATH_MIN_PARAGRAPHS': '5',
+    'FAST_PATH_MAX_LINK_DENSITY': '0.2',
+}} )
+
+# sitemaps
+MAX_SITEMAPS_SEEN = 10000
 
 # filters
 CUT_EMPTY_ELEMS = {'article', 'b', 'blockquote', 'dd', 'div', 'dt', 'em',
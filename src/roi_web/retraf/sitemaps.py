@@ -1,5 +1,5 @@
 """
-Deriving link info from sitemaps.
+Deriving link info from sitemaps, the downloads are left to roi_web.discovery.
 """
 
 ## This file is available from https://github.com/adbar/trafilatura
@@ -8,87 +8,35 @@ Deriving link info from sitemaps.
 
 import logging
 import re
+import zlib
+
+from datetime import datetime, timedelta, timezone
 # import urllib.robotparser # Python >= 3.8
 # ROBOT_PARSER = urllib.robotparser.RobotFileParser()
 
-from courlan import clean_url, extract_domain, fix_relative_urls, get_hostinfo, lang_filter
-
-from .downloads import fetch_url
-from .settings import MAX_SITEMAPS_SEEN
-from .utils import filter_urls
+from courlan import clean_url, extract_domain, fix_relative_urls, lang_filter
+from lxml.etree import XMLPullParser
 
 
 LOGGER = logging.getLogger(__name__)
 
-LINK_REGEX = re.compile(r'<loc>(<!\[CDATA\[)?(http.+?)(\]\]>)?</loc>')
-XHTML_REGEX = re.compile(r'<xhtml:link.+?>', re.DOTALL)
-HREFLANG_REGEX = re.compile(r'href=["\'](.+?)["\']')
+XHTML_LINK = '{http://www.w3.org/1999/xhtml}link'
+SITEMAP_ROOTS = {'urlset', 'sitemapindex'}
+SITEMAP_TAGS = {}
 WHITELISTED_PLATFORMS = re.compile(r'(?:blogger|blogpost|ghost|hubspot|livejournal|medium|typepad|squarespace|tumblr|weebly|wix|wordpress)\.')
 
 SITEMAP_FORMAT = re.compile(r'<\?xml|<sitemap|<urlset')
 DETECT_SITEMAP_LINK = re.compile(r'\.xml(\..{2,4})?$|\.xml[?#]')
 DETECT_LINKS = re.compile(r'https?://[^\s\r\n]+')
+# YYYY, YYYY-MM, YYYY-MM-DD, then hh:mm, hh:mm:ss or hh:mm:ss.s and the offset, Z or +hh:mm
+W3C_DATETIME = re.compile(r'(\d{4})(?:-(\d\d)(?:-(\d\d)(?:[T ](\d\d):(\d\d)(?::(\d\d)(?:[.,](\d+))?)?)?)?)?\s*(Z|[+-]\d\d:?\d\d)?$', re.I)
+DETECT_LINKS_BYTES = re.compile(rb'https?://[^\s\r\n]+')
 SCRUB_REGEX = re.compile(r'\?.*$|#.*$')
 POTENTIAL_SITEMAP = re.compile(r'\.xml\b')
 
 GUESSES = ['sitemap.xml.gz', 'sitemap', 'sitemap_index.xml', 'sitemap_news.xml']
 
 
-def sitemap_search(url, target_lang=None):
-    """Look for sitemaps for the given URL and gather links.
-
-    Args:
-        url: Webpage or sitemap URL as string.
-             Triggers URL-based filter if the webpage isn't a homepage.
-        target_lang: Define a language to filter URLs based on heuristics
-             (two-letter string, ISO 639-1 format).
-
-    Returns:
-        The extracted links as a list (sorted list of unique links).
-
-    """
-    domainname, baseurl = get_hostinfo(url)
-    if domainname is None:
-        LOGGER.warning('Invalid URL: %s', url)
-        return []
-    urlfilter = None
-    # determine sitemap URL
-    if url.endswith('.xml') or url.endswith('.gz') or url.endswith('sitemap'):
-        sitemapurl = url
-    else:
-        sitemapurl = baseurl + '/sitemap.xml'
-        # filter triggered, prepare it
-        if len(url) > len(baseurl) + 2:
-            urlfilter = url
-    sitemapurls, linklist = download_and_process_sitemap(sitemapurl, domainname, baseurl, target_lang)
-    sitemaps_seen = {sitemapurl}
-    if sitemapurls == [] and len(linklist) > 0:
-        linklist = filter_urls(linklist, urlfilter)
-        LOGGER.debug('%s sitemap links found for %s', len(linklist), domainname)
-        return linklist
-    # try sitemaps in robots.txt file if nothing has been found
-    if sitemapurls == [] and linklist == []:
-        sitemapurls = find_robots_sitemaps(baseurl)
-        # try additional URLs just in case
-        if not sitemapurls:
-            sitemapurls = [''.join([baseurl, '/', g]) for g in GUESSES]
-    # iterate through nested sitemaps and results
-    i = 1
-    while sitemapurls:
-        sitemapurl = sitemapurls.pop()
-        sitemapurls, linklist = download_and_process_sitemap(sitemapurl, domainname, baseurl, target_lang, sitemapurls, linklist)
-        # sanity check: keep track of visited sitemaps and exclude them
-        sitemaps_seen.add(sitemapurl)
-        sitemapurls = [s for s in sitemapurls if s not in sitemaps_seen]
-        # counter and safeguard
-        i += 1
-        if i > MAX_SITEMAPS_SEEN:
-            break
-    linklist = filter_urls(linklist, urlfilter)
-    LOGGER.debug('%s sitemap links found for %s', len(linklist), domainname)
-    return linklist
-
-
 def check_sitemap(url, contents):
     '''Check if the sitemap corresponds to an expected format,
        i.e. TXT or XML.'''
@@ -103,19 +51,8 @@ def check_sitemap(url, contents):
     return contents
 
 
-def download_and_process_sitemap(url, domain, baseurl, target_lang, sitemapurls=None, linklist=None):
-    'Helper function chaining download and processing of sitemaps.'
-    # variables init
-    sitemapurls, linklist = sitemapurls or [], linklist or []
-    # fetch and pre-process
-    LOGGER.info('fetching sitemap: %s', url)
-    pagecontent = fetch_url(url)
-    add_sitemaps, add_links = process_sitemap(url, domain, baseurl, pagecontent, target_lang)
-    return sitemapurls + add_sitemaps, linklist + add_links
-
-
 def process_sitemap(url, domain, baseurl, pagecontent, target_lang=None):
-    'Download a sitemap and extract the links it contains.'
+    'Extract the links a downloaded sitemap contains.'
     contents = check_sitemap(url, pagecontent)
     # safeguard
     if contents is None:
@@ -129,11 +66,151 @@ def process_sitemap(url, domain, baseurl, pagecontent, target_lang=None):
             sitemapurls, linklist = store_sitemap_link(sitemapurls, linklist, link, state)
         return sitemapurls, linklist
     # process XML sitemap
-    if target_lang is not None:
-        sitemapurls, linklist = extract_sitemap_langlinks(contents, url, domain, baseurl, target_lang)
-        if len(sitemapurls) != 0 or len(linklist) != 0:
-            return sitemapurls, linklist
-    return extract_sitemap_links(contents, url, domain, baseurl, target_lang)
+    return process_sitemap_entries(iter_sitemap([contents.encode('utf-8')]), url, domain, baseurl, target_lang)
+
+
+def process_sitemap_entries(entries, url, domain, baseurl, target_lang=None, keep=None):
+    '''Sort the ( loc, lastmod, hreflang ) entries of a sitemap into sitemaps and links,
+       the alternates in the target language win over the rest when there are any.
+       keep( link, lastmod ) can drop page links, e.g. the ones already processed.'''
+    sitemapurls, linklist, langurls, langlinks = [], [], [], []
+    for loc, lastmod, hreflang in entries:
+        if hreflang is None:
+            link, state = handle_link(loc, url, domain, baseurl, target_lang)
+            if state != 'link' or keep is None or keep(link, lastmod):
+                sitemapurls, linklist = store_sitemap_link(sitemapurls, linklist, link, state)
+        elif target_lang is not None and (hreflang.startswith(target_lang) or hreflang == 'x-default'):
+            link, state = handle_link(loc, url, domain, baseurl, target_lang)
+            if state != 'link' or keep is None or keep(link, lastmod):
+                langurls, langlinks = store_sitemap_link(langurls, langlinks, link, state)
+    if langurls or langlinks:
+        sitemapurls, linklist = langurls, langlinks
+    LOGGER.debug('%s sitemaps and %s links found for %s', len(sitemapurls), len(linklist), url)
+    return sitemapurls, linklist
+
+
+class SitemapParser:
+    '''Incremental parser of XML ( or TXT ) sitemaps fed with bytes, gzipped or not. It returns
+       ( loc, lastmod, hreflang ) entries as they are complete, the <xhtml:link> alternates of an entry
+       after it, and clears every entry once read, so memory stays flat whatever the size of the sitemap.'''
+    __slots__ = ['decompressor', 'head', 'parser', 'partial']
+
+    def __init__(self):
+        # None until the first bytes tell, then False for plain content
+        self.decompressor = None
+        self.head = b''
+        # None until the format is known, then the XML parser or False for TXT
+        self.parser = None
+        self.partial = b''
+
+    def feed(self, data):
+        if self.decompressor is None:
+            data, self.head = self.head + data, b''
+            if len(data) < 2:
+                self.head = data
+                return []
+            self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if data[:2] == b'\x1f\x8b' else False
+        if self.decompressor:
+            data = self.decompressor.decompress(data)
+        return self._feed(data)
+
+    def close(self):
+        entries = self._feed(self.head + (self.decompressor.flush() if self.decompressor else b''))
+        self.head = b''
+        if self.parser:
+            try:
+                self.parser.close()
+            except Exception as err:
+                LOGGER.debug('unfinished sitemap: %s', err)
+            entries.extend(self._entries())
+        elif self.parser is False and self.partial:
+            entries.extend((link.decode('utf-8', 'replace'), None, None) for link in DETECT_LINKS_BYTES.findall(self.partial))
+        self.partial = b''
+        return entries
+
+    def _feed(self, data):
+        if self.parser is None:
+            data, self.partial = self.partial + data, b''
+            start = data.lstrip(b'\xef\xbb\xbf \t\r\n')
+            if not start:
+                self.partial = data
+                return []
+            if start[:1] == b'<':
+                self.parser = XMLPullParser(events=('end',), tag=('{*}url', '{*}sitemap'), recover=True,
+                                            resolve_entities=False, no_network=True)
+            else:
+                self.parser = False
+        if self.parser is False:
+            # links hold no white space, so only the last unfinished line waits for more data
+            data = self.partial + data
+            end = data.rfind(b'\n') + 1
+            data, self.partial = data[:end], data[end:]
+            return [(link.decode('utf-8', 'replace'), None, None) for link in DETECT_LINKS_BYTES.findall(data)]
+        self.parser.feed(data)
+        return self._entries()
+
+    def _entries(self):
+        entries, elem = [], None
+        for _, elem in self.parser.read_events():
+            tag = elem.tag
+            namespace = tag[:tag.find('}') + 1]
+            loc_tag, lastmod_tag, roots = SITEMAP_TAGS.get(namespace) or sitemap_tags(namespace)
+            parent = elem.getparent()
+            if parent is not None and parent.tag in roots:
+                loc, lastmod, alternates = None, None, []
+                for child in elem:
+                    if child.tag == loc_tag:
+                        loc = child.text
+                    elif child.tag == lastmod_tag:
+                        lastmod = child.text
+                    elif child.tag == XHTML_LINK:
+                        alternates.append(child)
+                lastmod = lastmod.strip() if lastmod else None
+                if loc and loc.strip():
+                    entries.append((loc.strip(), lastmod, None))
+                for alternate in alternates:
+                    if alternate.get('hreflang') and alternate.get('href'):
+                        entries.append((alternate.get('href').strip(), lastmod, alternate.get('hreflang')))
+            elem.clear(keep_tail=True)
+        # the entries read are done with, only an entry still being parsed comes after the last one
+        if elem is not None and elem.getparent() is not None:
+            del elem.getparent()[:-1]
+        return entries
+
+
+def sitemap_tags(namespace):
+    'The <loc> and <lastmod> tags and the root tags of a sitemap namespace'
+    tags = SITEMAP_TAGS[namespace] = (namespace + 'loc', namespace + 'lastmod', {namespace + root for root in SITEMAP_ROOTS})
+    return tags
+
+
+def lastmod_datetime(lastmod):
+    '''The <lastmod> W3C datetime ( or date, or year and month, or year ) as an aware datetime, UTC when no offset is
+       given, None when invalid. Parsed by hand, datetime.fromisoformat takes neither the partial dates nor, before
+       Python 3.11, the Z suffix.'''
+    match = W3C_DATETIME.match(lastmod.strip()) if isinstance(lastmod, str) else None
+    if match is None:
+        return None
+    year, month, day, hour, minute, second, fraction, offset = match.groups()
+    try:
+        zone = timezone.utc
+        if offset and offset.upper() != 'Z':
+            digits = offset[1:].replace(':', '')
+            delta = timedelta(hours=int(digits[:2]), minutes=int(digits[2:]))
+            zone = timezone(-delta if offset[0] == '-' else delta)
+        return datetime(int(year), int(month or 1), int(day or 1), int(hour or 0), int(minute or 0),
+                        int(second or 0), int((fraction or '0')[:6].ljust(6, '0')), zone)
+    except ValueError:
+        return None
+
+
+def iter_sitemap(chunks):
+    '''Yield the ( loc, lastmod, hreflang ) entries of a sitemap given as an iterable of bytes,
+       e.g. iter(partial(file.read, 65536), b'') for a file.'''
+    parser = SitemapParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
 
 
 def handle_link(link, sitemapurl, domainname, baseurl, target_lang):
@@ -169,42 +246,6 @@ def store_sitemap_link(sitemapurls, linklist, link, state):
     return sitemapurls, linklist
 
 
-def extract_sitemap_langlinks(pagecontent, sitemapurl, domainname, baseurl, target_lang):
-    'Extract links corresponding to a given target language.'
-    if 'hreflang=' not in pagecontent:
-        return [], []
-    sitemapurls, linklist = [], []
-    # compile regex here for modularity and efficiency
-    lang_regex = re.compile(r"hreflang=[\"']({}.*?|x-default)[\"']".format(target_lang), re.DOTALL)
-    for attributes in XHTML_REGEX.findall(pagecontent):
-        if lang_regex.search(attributes):
-            match = HREFLANG_REGEX.search(attributes)
-            if match:
-                link, state = handle_link(match.group(1), sitemapurl, domainname, baseurl, target_lang)
-                sitemapurls, linklist = store_sitemap_link(sitemapurls, linklist, link, state)
-    LOGGER.debug('%s sitemaps and %s links with hreflang found for %s', len(sitemapurls), len(linklist), sitemapurl)
-    return sitemapurls, linklist
-
-
-def extract_sitemap_links(pagecontent, sitemapurl, domainname, baseurl, target_lang):
-    'Extract sitemap links and web page links from a sitemap file.'
-    sitemapurls, linklist = [], []
-    # extract
-    for match in LINK_REGEX.findall(pagecontent):
-        # process middle part of the match tuple
-        link, state = handle_link(match[1], sitemapurl, domainname, baseurl, target_lang)
-        sitemapurls, linklist = store_sitemap_link(sitemapurls, linklist, link, state)
-    LOGGER.debug('%s sitemaps and %s links found for %s', len(sitemapurls), len(linklist), sitemapurl)
-    return sitemapurls, linklist
-
-
-def find_robots_sitemaps(baseurl):
-    '''Guess the location of the robots.txt file and try to extract
-       sitemap URLs from it'''
-    robotstxt = fetch_url(baseurl + '/robots.txt')
-    return extract_robots_sitemaps(robotstxt, baseurl)
-
-
 def extract_robots_sitemaps(robotstxt, baseurl):
     'Read a robots.txt file and find sitemap links.'
     # sanity check on length (cause: redirections)
@@ -77,9 +77,40 @@ def handle_gz_file( filecontent ):
     return filecontent
 
 
+def load_tree( content ):
+    'Parse HTML bytes or text the way the extraction expects it, raising where load_html returns None'
+    content = handle_gz_file( content )
+    try:
+        return fromstring( content, parser=HTML_PARSER )
+    except ValueError:
+        # "Unicode strings with encoding declaration are not supported."
+        return fromstring( content.encode( 'utf8' ), parser=HTML_PARSER )
+
+
+def load_html( htmlobject ):
+    '''Parse HTML bytes or text into a tree, None when it is not HTML'''
+    if isinstance( htmlobject, HtmlElement ):
+        return htmlobject
+    htmlobject = handle_gz_file( htmlobject )
+    if not htmlobject:
+        return None
+    try:
+        return fromstring( htmlobject, parser=HTML_PARSER )
+    except ValueError:
+        # "Unicode strings with encoding declaration are not supported."
+        try:
+            return fromstring( htmlobject.encode( 'utf8' ), parser=HTML_PARSER )
+        except Exception as err:
+            LOGGER.error( 'lxml parsing failed: %s', err )
+    except Exception as err:
+        LOGGER.error( 'lxml parsing failed: %s', err )
+    return None
+
 
 def remove_control_characters( string ):
     '''Prevent non-printable and XML invalid character errors'''
+    if string.isprintable():
+        return string
     return ''.join( [ c for c in string if c.isprintable() or c.isspace() ] )
 
 
@@ -8,7 +8,7 @@ All functions related to XML generation, processing and validation.
 
 import logging
 import lzma
-
+from io import StringIO
 from json import dumps as json_dumps
 from html import unescape
 from pathlib import Path
@@ -18,7 +18,7 @@ from lxml.etree import Element, RelaxNG, SubElement, XMLParser, fromstring, tost
 
 
 from .filters import text_chars_test
-from .utils import sanitize
+from .utils import line_processing
 
 
 LOGGER = logging.getLogger(__name__)
@@ -34,6 +34,9 @@ CONTROL_PARSER = XMLParser(remove_blank_text=True)
 NEWLINE_ELEMS = {'code', 'fw', 'graphic', 'head', 'lb', 'list', 'p', 'quote', 'row', 'table'}
 SPECIAL_FORMATTING = {'del', 'head', 'hi'}
 
+# the boundaries of str.splitlines(), a \r\n cut in two only adds an empty line, which is pruned
+LINE_BREAKS = frozenset('\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029')
+
 
 def build_json_output(docmeta):
     '''Build JSON output based on extracted information'''
@@ -238,11 +241,61 @@ def merge_with_parent(element, include_formatting=False):
     parent.remove(element)
 
 
-def xmltotxt(xmloutput, include_formatting):
-    '''Convert to plain text format and optionally preserve formatting as markdown.'''
-    returnlist = []
+class TextWriter:
+    '''Sanitizes text line by line as it is written and hands the kept lines to a sink, a chunk at a time,
+       so that the text is never held in full unless the sink is the default StringIO'''
+    __slots__ = ['sink', 'pending', 'size', 'started']
+
+    CHUNK_SIZE = 65536
+
+    def __init__(self, sink=None):
+        self.sink = sink if sink is not None else StringIO()
+        self.pending = []
+        self.size = 0
+        self.started = False
+
+    def write(self, text):
+        self.pending.append(text)
+        self.size += len(text)
+        if self.size >= self.CHUNK_SIZE:
+            self._flush(final=False)
+
+    def close(self):
+        '''Flush the last line'''
+        self._flush(final=True)
+
+    def getvalue(self):
+        '''Text written to the default sink, which is emptied for the next document'''
+        self.close()
+        text = self.sink.getvalue()
+        self.sink.seek(0)
+        self.sink.truncate()
+        self.started = False
+        return text
+
+    def _flush(self, final):
+        text = ''.join(self.pending)
+        lines = text.splitlines()
+        # an unfinished line waits for the next chunk, which is counted from here on
+        # so that a long line is not split again on every write
+        self.pending = [lines.pop()] if not final and lines and text[-1] not in LINE_BREAKS else []
+        self.size = 0
+
+        kept = [unescape(line) for line in map(line_processing, filter(None, lines)) if line is not None]
+        if kept:
+            if self.started:
+                self.sink.write('\n')
+            self.sink.write('\n'.join(kept))
+            self.started = True
+
+
+def xmltotxt(xmloutput, include_formatting, sink=None):
+    '''Convert to plain text format and optionally preserve formatting as markdown.
+       The text is returned, or streamed into sink ( a TextWriter or anything with write ) and None is returned.'''
+    writer = sink if isinstance(sink, TextWriter) else TextWriter(sink)
+    write = writer.write
     # strip_tags(xmloutput, 'div', 'main', 'span')
-    # iterate and convert to list of strings
+    # iterate and write the converted strings
     for element in xmloutput.iter('*'):
         if element.text is None and element.tail is None:
             if element.tag == 'graphic':
@@ -250,28 +303,32 @@ def xmltotxt(xmloutput, include_formatting):
                 text = element.get('title', '')
                 if element.get('alt') is not None:
                     text += ' ' + element.get('alt')
-                returnlist.extend(['![', text, ']', '(', element.get('src', ''), ')'])
+                write(''.join(['![', text, ']', '(', element.get('src', ''), ')']))
             # newlines for textless elements
             if element.tag in ('graphic', 'row', 'table'):
-                returnlist.append('\n')
+                write('\n')
             continue
         # process text
         textelement = replace_element_text(element, include_formatting)
         # common elements
         if element.tag in NEWLINE_ELEMS:
-            returnlist.extend(['\n', textelement, '\n'])
+            write(''.join(['\n', textelement, '\n']))
         # particular cases
         elif element.tag == 'item':
-            returnlist.extend(['\n- ', textelement, '\n'])
+            write(''.join(['\n- ', textelement, '\n']))
         elif element.tag == 'cell':
-            returnlist.extend(['|', textelement, '|'])
+            write(''.join(['|', textelement, '|']))
         elif element.tag == 'comments':
-            returnlist.append('\n\n')
+            write('\n\n')
         else:
             if element.tag not in SPECIAL_FORMATTING:
                 LOGGER.debug('unprocessed element in output: %s', element.tag)
-            returnlist.extend([textelement, ' '])
-    return unescape(sanitize(''.join(returnlist)))
+            write(textelement)
+            write(' ')
+    if sink is None:
+        return writer.getvalue()
+    writer.close()
+    return None
 
 
 def write_teitree(docmeta):
@@ -4,6 +4,12 @@ X-Path expressions needed to extract and filter the main text content
 ## This file is available from https://github.com/adbar/trafilatura
 ## under GNU GPL v3 license
 
+import time
+
+from lxml.etree import XPath
+
+from .attributes import AttributeSelector, MergedSelector
+
 
 BODY_XPATH = [
     '''.//*[(self::article or self::div or self::main or self::section)][
@@ -202,3 +208,91 @@ COMMENTS_DISCARD_XPATH = [
     contains(@id, "akismet") or contains(@class, "akismet") or contains(@style, "display:none")]''',
 ]
 
+
+
+class XPathRegistry:
+    '''Compiles every expression once, instead of on each tree.xpath() call.
+
+    Discard lists are also compiled as one union, evaluated in a single pass. Removing its matches in document order
+    leaves the tree the expression by expression loop leaves, tails included, as long as no match is inside another;
+    when one is, the list runs expression by expression after all. With profiling on, the lists run expression by
+    expression too, to count calls, hits and time for each.
+
+    Expressions made only of class / id / … attribute tests are resolved by an ``AttributeSelector`` instead, which
+    tests every distinct attribute value once rather than every element against the whole disjunction.
+    '''
+
+    def __init__( self, indexed=True ):
+        self.compiled = {}
+        self.selectors = {}
+        self.merged = {}
+        self.stats = None
+        self.indexed = indexed
+
+    def register( self, *expressions ):
+        for expression in expressions:
+            self.compile( expression )
+
+    def register_discard( self, *nodelists ):
+        for nodelist in nodelists:
+            self.register( *nodelist )
+            union = ' | '.join( '(' + expression.strip() + ')' for expression in nodelist )
+            self.merged[ tuple( nodelist ) ] = union
+            self.compile( union )
+            # only when every expression translates, the results must stay in document order
+            merged = MergedSelector.parse( nodelist )
+            if merged is not None:
+                self.selectors[ union ] = merged
+
+    def compile( self, expression ):
+        evaluator = self.compiled.get( expression )
+        if evaluator is None:
+            evaluator = self.compiled[ expression ] = XPath( expression )
+            selector = AttributeSelector.parse( expression )
+            if selector is not None:
+                self.selectors[ expression ] = selector
+        return evaluator
+
+    def xpath( self, tree, expression ):
+        evaluator = self.compiled.get( expression ) or self.compile( expression )
+        if self.indexed:
+            evaluator = self.selectors.get( expression, evaluator )
+        if self.stats is None:
+            return evaluator( tree )
+
+        start = time.perf_counter()
+        result = evaluator( tree )
+        stat = self.stats.setdefault( expression, [ 0, 0, 0.0 ] )
+        stat[ 0 ] += 1
+        stat[ 1 ] += len( result ) if isinstance( result, list ) else bool( result )
+        stat[ 2 ] += time.perf_counter() - start
+        return result
+
+    def passes( self, tree, nodelist ):
+        '''The nodes to remove for a discard list, pass after pass, each pass evaluated once the previous one is
+        removed: the matches of its union, or of each expression in turn'''
+        union = self.merged.get( tuple( nodelist ) ) if self.stats is None else None
+        if union is not None:
+            nodes = self.xpath( tree, union )
+            matched = set( nodes )
+            # an ancestor removed first strands the tail of a nested match, the expression order decides where it goes
+            if not any( ancestor in matched for node in nodes for ancestor in node.iterancestors() ):
+                yield nodes
+                return
+        for expression in nodelist:
+            yield self.xpath( tree, expression )
+
+    def profile( self, enabled=True ):
+        self.stats = { } if enabled else None
+
+    def report( self ):
+        '''(calls, hits, seconds, expression) rows, the most expensive first'''
+        rows = [ (calls, hits, seconds, ' '.join( expression.split() )) for expression, (calls, hits, seconds)
+                 in (self.stats or { }).items() ]
+        return sorted( rows, key=lambda row: row[ 2 ], reverse=True )
+
+
+XPATHS = XPathRegistry()
+XPATHS.register( *BODY_XPATH, *COMMENTS_XPATH )
+XPATHS.register_discard( REMOVE_COMMENTS_XPATH, PAYWALL_DISCARD_XPATH, OVERALL_DISCARD_XPATH, TEASER_DISCARD_XPATH,
+                         PRECISION_DISCARD_XPATH, DISCARD_IMAGE_ELEMENTS, COMMENTS_DISCARD_XPATH )
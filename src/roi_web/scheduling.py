@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import email.utils
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, ClassVar, Deque, Dict
+
+from .domain import NetworkArchive, String
+
+
+@dataclass
+class HostState:
+    limit: float
+    in_flight: int = 0
+    latency: float = 0.0
+    error_rate: float = 0.0
+    blocked_until: float = 0.0
+    throttled: int = 0
+    last_decrease: float = 0.0
+    queue: Deque[ asyncio.Future ] = field( default_factory=collections.deque )
+
+
+class Throttled( Exception ):
+    def __init__( self, host: String, status: int ):
+        super().__init__( f"{host} answered {status} after all retries" )
+        self.host = host
+        self.status = status
+
+
+class HostScheduler:
+    """Host aware admission for fetches.
+
+    Every host has its own queue and an AIMD concurrency limit: it grows by one slot per window of successful,
+    fast responses, and is cut multiplicatively when latency goes over ``latency_target`` or requests fail.
+    429/503 responses block the host for their ``Retry-After`` ( or an exponential backoff ) before being retried,
+    and ``max_in_flight`` caps the requests running across all hosts, handed out round robin between hosts.
+    """
+
+    THROTTLE_STATUS: ClassVar = frozenset( [ 429, 503 ] )
+    MAX_BACKOFF: ClassVar = 300.0
+    SMOOTHING: ClassVar = 0.2
+
+    def __init__( self, max_in_flight: int = 100, initial: float = 2, minimum: float = 1, maximum: float = 16,
+                  latency_target: float = 10.0, decrease: float = 0.5, retries: int = 2 ):
+        self.max_in_flight = max_in_flight
+        self.initial = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.decrease = decrease
+        self.retries = retries
+
+        self.in_flight = 0
+        self.hosts: Dict[ String, HostState ] = {}
+        self._waiting: Dict[ String, HostState ] = collections.OrderedDict()
+        self._timer: asyncio.TimerHandle | None = None
+
+    async def submit( self, host: String, fetch: Callable[ [ ], Awaitable[ NetworkArchive ] ] ) -> NetworkArchive:
+        state = self.hosts.get( host )
+        if state is None:
+            state = self.hosts[ host ] = HostState( limit=self.initial )
+
+        for attempt in range( self.retries + 1 ):
+            await self._acquire( host, state )
+
+            start = time.perf_counter()
+            # stays None when cancelled, which frees the slot but says nothing about the host
+            failed = None
+            try:
+                response = await fetch()
+                failed = response.response_status >= 500
+            except Exception:
+                failed = True
+                raise
+            finally:
+                self._release( state, time.perf_counter() - start, failed=bool( failed ), observe=failed is not None )
+
+            if response.response_status not in self.THROTTLE_STATUS:
+                state.throttled = 0
+                return response
+
+            self._throttle( state, response )
+
+        raise Throttled( host, response.response_status )
+
+    # region admission
+    async def _acquire( self, host: String, state: HostState ) -> None:
+        waiter = asyncio.get_running_loop().create_future()
+        state.queue.append( waiter )
+        self._waiting[ host ] = state
+        self._dispatch()
+
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # the slot was granted right before the cancellation
+                self._release( state, 0.0, failed=False, observe=False )
+            raise
+
+    def _release( self, state: HostState, elapsed: float, failed: bool, observe: bool = True ) -> None:
+        state.in_flight -= 1
+        self.in_flight -= 1
+
+        if observe:
+            self._observe( state, elapsed, failed )
+        self._dispatch()
+
+    def _dispatch( self ) -> None:
+        now = time.monotonic()
+
+        for host, state in list( self._waiting.items() ):
+            if self.in_flight >= self.max_in_flight:
+                return
+
+            if state.blocked_until > now:
+                self._wake_at( state.blocked_until - now )
+                continue
+
+            while state.queue and state.in_flight < int( state.limit ) and self.in_flight < self.max_in_flight:
+                waiter = state.queue.popleft()
+                if waiter.done():
+                    # cancelled while waiting
+                    continue
+                state.in_flight += 1
+                self.in_flight += 1
+                waiter.set_result( None )
+
+            if state.queue:
+                self._waiting.move_to_end( host )
+            else:
+                del self._waiting[ host ]
+
+    def _wake_at( self, delay: float ) -> None:
+        loop = asyncio.get_running_loop()
+        when = loop.time() + delay
+        if self._timer is not None and self._timer.when() <= when:
+            return
+
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = loop.call_at( when, self._wake )
+
+    def _wake( self ) -> None:
+        self._timer = None
+        self._dispatch()
+    # endregion
+
+    # region feedback
+    def _observe( self, state: HostState, elapsed: float, failed: bool ) -> None:
+        state.latency += self.SMOOTHING * (elapsed - state.latency)
+        state.error_rate += self.SMOOTHING * (float( failed ) - state.error_rate)
+
+        if failed or elapsed > self.latency_target:
+            now = time.monotonic()
+            # a single congestion event usually fails a whole window of requests, cut once per window
+            if now - state.last_decrease > state.latency:
+                state.limit = max( self.minimum, state.limit * self.decrease )
+                state.last_decrease = now
+        else:
+            state.limit = min( self.maximum, state.limit + 1 / state.limit )
+
+    def _throttle( self, state: HostState, response: NetworkArchive ) -> None:
+        state.throttled += 1
+        delay = self.retry_after( response.response_headers )
+        if delay is None:
+            delay = min( self.MAX_BACKOFF, 2.0 ** state.throttled )
+
+        state.blocked_until = max( state.blocked_until, time.monotonic() + delay )
+        state.limit = self.minimum
+
+    @classmethod
+    def retry_after( cls, headers ) -> float | None:
+        value = next( (v for k, v in (headers or {}).items() if k.lower() == "retry-after"), None )
+        if not value:
+            return None
+
+        try:
+            return min( cls.MAX_BACKOFF, max( 0.0, float( value ) ) )
+        except ValueError:
+            pass
+
+        try:
+            when = email.utils.parsedate_to_datetime( value )
+        except (TypeError, ValueError):
+            return None
+        return min( cls.MAX_BACKOFF, max( 0.0, when.timestamp() - time.time() ) )
+    # endregion
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import json
+import os
+import pathlib
+from dataclasses import asdict
+from typing import ClassVar, Iterator
+
+from roi_utils.segments import SegmentStore
+from .domain import PageContent, String
+
+
+class PageStore:
+    DEFAULT_PATH: ClassVar = pathlib.Path( os.environ.get( "ROI_BASEDIR", "." ) ) / "store"
+
+    def __init__( self, path: pathlib.Path = None, segment_size: int = None ):
+        self.segments = SegmentStore( path or self.DEFAULT_PATH, segment_size=segment_size )
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, exc_type, exc_val, exc_tb ):
+        self.close()
+
+    def __len__( self ) -> int:
+        return len( self.segments )
+
+    def __contains__( self, digest: String ) -> bool:
+        return self.segments.contains( digest )
+
+    def put( self, content: PageContent ) -> None:
+        self.segments.put( content.digest(), self.encode( content ) )
+
+    def get( self, digest: String ) -> PageContent | None:
+        payload = self.segments.get( digest )
+        if payload is None:
+            return None
+        return PageContent.from_json( payload )
+
+    def contains( self, digest: String ) -> bool:
+        return self.segments.contains( digest )
+
+    def digests( self ) -> Iterator[ String ]:
+        for key in self.segments.index:
+            yield key.hex()
+
+    def scan( self ) -> Iterator[ PageContent ]:
+        for _, payload in self.segments.scan():
+            yield PageContent.from_json( payload )
+
+    def close( self ) -> None:
+        self.segments.close()
+
+    @staticmethod
+    def encode( content: PageContent ) -> bytes:
+        return json.dumps( asdict( content ), separators=(",", ":") ).encode( "utf-8" )
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import http
+import io
+import json
+import os
+import pathlib
+import threading
+import zlib
+from dataclasses import asdict
+from typing import ClassVar, Dict, Iterator, Tuple
+
+from warcio.archiveiterator import ArchiveIterator
+from warcio.statusandheaders import StatusAndHeaders
+from warcio.warcwriter import WARCWriter
+
+from roi_utils.segments import Location, OffsetIndex
+from .domain import NetworkArchive, String, UrlEvent, WebArchive
+
+
+class WarcArchiver:
+    """Keeps every fetched response in rolling gzip WARC files, indexed by ``UrlEvent.digest()``.
+
+    Each record is its own gzip member, so ``get`` decompresses a single record from its offset, and ``scan``
+    replays the whole archive sequentially. The ``UrlEvent`` and the request side of the ``NetworkArchive`` travel
+    as ``WARC-Roi-*`` headers, so a ``WebArchive`` comes back exactly as ``Processer.fetch`` built it.
+    """
+
+    DEFAULT_PATH: ClassVar = pathlib.Path( os.environ.get( "ROI_BASEDIR", "." ) ) / "warc"
+    FILE_SIZE: ClassVar = 1024 * 1024 * 1024
+    FILE_PATTERN: ClassVar = "archive-{:06d}.warc.gz"
+    INDEX_NAME: ClassVar = "index.dat"
+
+    # aiohttp hands out the decoded body, so the transfer headers would no longer describe it
+    DROPPED_HEADERS: ClassVar = frozenset( [ "content-encoding", "transfer-encoding", "content-length" ] )
+
+    def __init__( self, path: pathlib.Path = None, file_size: int = None ):
+        self.path = pathlib.Path( path or self.DEFAULT_PATH )
+        self.path.mkdir( parents=True, exist_ok=True )
+        self.file_size = file_size or self.FILE_SIZE
+
+        self.index = OffsetIndex( self.path / self.INDEX_NAME )
+        self._lock = threading.Lock()
+        self._number = max( self._files(), default=0 )
+        self._recover()
+        self._file = open( self._file_path( self._number ), "ab" )
+        self._writer = WARCWriter( self._file, gzip=True )
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, exc_type, exc_val, exc_tb ):
+        self.close()
+
+    def __len__( self ) -> int:
+        return len( self.index )
+
+    def __contains__( self, digest: String ) -> bool:
+        return bytes.fromhex( digest ) in self.index
+
+    def write( self, archive: WebArchive ) -> None:
+        """Thread safe, so callers on the loop can hand the gzip work to ``asyncio.to_thread``."""
+        record = self._record( archive )
+
+        with self._lock:
+            if self._file.tell() > self.file_size:
+                self._roll()
+
+            offset = self._file.tell()
+            try:
+                self._writer.write_record( record )
+            finally:
+                # warcio buffers the payload in a temporary file to digest it
+                record.raw_stream.close()
+            self._file.flush()
+            self.index.add( bytes.fromhex( archive.digest() ), Location( self._number, offset, self._file.tell() - offset ) )
+
+    def get( self, digest: String ) -> WebArchive | None:
+        location = self.index.get( bytes.fromhex( digest ) )
+        if location is None:
+            return None
+
+        with open( self._file_path( location.segment ), "rb" ) as file:
+            file.seek( location.offset )
+            member = io.BytesIO( file.read( location.length ) )
+
+        for record in ArchiveIterator( member ):
+            return self._archive( record, record.content_stream().read() )
+
+    def scan( self ) -> Iterator[ WebArchive ]:
+        """Every archived response, in write order, skipping the ones superseded by a later fetch."""
+        for number in sorted( self._files() ):
+            for location, record, payload in self._records( number ):
+                digest = bytes.fromhex( record.rec_headers.get_header( "WARC-Roi-Digest" ) )
+                latest = self.index.get( digest )
+                if latest is not None and latest[ :2 ] == location[ :2 ]:
+                    yield self._archive( record, payload )
+
+    def close( self ) -> None:
+        with self._lock:
+            self._file.close()
+            self.index.close()
+
+    # region internals
+    def _file_path( self, number: int ) -> pathlib.Path:
+        return self.path / self.FILE_PATTERN.format( number )
+
+    def _files( self ) -> Iterator[ int ]:
+        for file in self.path.glob( "archive-*.warc.gz" ):
+            yield int( file.name.split( "." )[ 0 ].split( "-" )[ 1 ] )
+
+    def _recover( self ) -> None:
+        """Indexes the records the index is missing, written just before a crash or all of them with the index lost,
+        and cuts a record torn by a crash off the current file, past it a sequential ``scan`` would fail."""
+        ends: Dict[ int, int ] = { }
+        for location in self.index.values():
+            ends[ location.segment ] = max( ends.get( location.segment, 0 ), location.offset + location.length )
+
+        # files rolled over are complete, the index only falls behind on the one written last
+        for number in sorted( self._files() ):
+            if number == self._number or number not in ends:
+                end = self._reindex( number, ends.get( number, 0 ) )
+                path = self._file_path( number )
+                if number == self._number and path.stat().st_size > end:
+                    os.truncate( path, end )
+
+    def _reindex( self, number: int, start: int ) -> int:
+        """Indexes the complete records of a file from ``start`` on, and returns where the last of them ends."""
+        end = start
+        with open( self._file_path( number ), "rb" ) as file, open( self._file_path( number ), "rb" ) as members:
+            file.seek( start )
+            records = ArchiveIterator( file )
+            try:
+                for record in records:
+                    record.content_stream().read()
+                    offset, length = records.get_record_offset(), records.get_record_length()
+                    # warcio reads a gzip member missing its trailer as if it were whole
+                    members.seek( offset )
+                    member = zlib.decompressobj( 16 + zlib.MAX_WBITS )
+                    member.decompress( members.read( length ) )
+                    if not member.eof:
+                        break
+
+                    if record.rec_type == "response":
+                        digest = bytes.fromhex( record.rec_headers.get_header( "WARC-Roi-Digest" ) )
+                        self.index.add( digest, Location( number, offset, length ) )
+                    end = offset + length
+            except Exception:
+                # whatever warcio makes of a torn record, e.g. ArchiveLoadFailed or headers cut short
+                pass
+        return end
+
+    def _roll( self ) -> None:
+        self._file.close()
+        self._number += 1
+        self._file = open( self._file_path( self._number ), "ab" )
+        self._writer = WARCWriter( self._file, gzip=True )
+
+    def _records( self, number: int ) -> Iterator[ Tuple[ Location, object, bytes ] ]:
+        with open( self._file_path( number ), "rb" ) as file:
+            records = ArchiveIterator( file )
+            for record in records:
+                if record.rec_type != "response":
+                    continue
+                # read the payload before asking for the offset, which otherwise skips over it
+                payload = record.content_stream().read()
+                yield Location( number, records.get_record_offset(), records.get_record_length() ), record, payload
+
+    def _record( self, archive: WebArchive ):
+        content = archive.content
+        try:
+            reason = http.HTTPStatus( content.response_status ).phrase
+        except ValueError:
+            reason = ""
+
+        headers = [ (k, v) for k, v in content.response_headers.items() if k.lower() not in self.DROPPED_HEADERS ]
+        http_headers = StatusAndHeaders( f"{content.response_status} {reason}", headers, protocol="HTTP/1.1" )
+
+        request = {k: v for k, v in asdict( content ).items() if k not in ("response_content", "response_headers")}
+        warc_headers = {
+            "WARC-Roi-Digest": archive.digest(),
+            "WARC-Roi-Event": json.dumps( asdict( archive.url ) ),
+            "WARC-Roi-Archive": json.dumps( request ),
+        }
+
+        return self._writer.create_warc_record( content.response_url or archive.url.raw, "response",
+                                                payload=io.BytesIO( content.response_content ),
+                                                http_headers=http_headers,
+                                                warc_headers_dict=warc_headers )
+
+    @staticmethod
+    def _archive( record, payload: bytes ) -> WebArchive:
+        url = UrlEvent( **json.loads( record.rec_headers.get_header( "WARC-Roi-Event" ) ) )
+        fields = json.loads( record.rec_headers.get_header( "WARC-Roi-Archive" ) )
+        content = NetworkArchive( response_content=payload,
+                                  response_headers={k: v for k, v in record.http_headers.headers},
+                                  **fields )
+        return WebArchive( url=url, content=content )
+    # endregion
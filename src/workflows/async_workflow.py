@@ -1,52 +1,50 @@
-import asyncio
-import logging
-import threading
-
-from roi_utils.logging import ExecutionContext, log, sync_queue
-from roi_web import Processer, load_events
-from roi_web.processing import Fetcher, load_processed
-
-
-def batch( n, itr ):
-    batch = [ ]
-    cnt = 0
-    for el in itr:
-        batch.append( el )
-        cnt += 1
-        if cnt == n:
-            yield batch
-            batch = [ ]
-            cnt = 0
-    else:
-        yield batch
-
-
-async def main():
-    seen = {i.url for i in load_processed()}
-    events = load_events( seen=seen )
-    batches = batch( 3000, events )
-
-
-    async with Processer( fetcher=Fetcher() ) as processer:
-        with ExecutionContext( "Processing all events" ):
-            for i, minibatch in enumerate( batches ):
-                with ExecutionContext( f"Processing batch", exc_suppress=True,
-                                       extra={"number": i + 1, "length": len( minibatch )} ):
-                    #
-                    #
-                    await asyncio.gather( *map( processer.process, minibatch ) )
-
-    logging.finished = True
+import contextlib
+import functools
+import os
+import sys
+
+from roi_utils.entrypoint import run
+from roi_utils.logging import ExecutionContext
+from roi_utils.seen import SeenIndex
+from roi_web import Processer, PageStore, WarcArchiver, NearDuplicateIndex
+from roi_web.extraction import ExtractionService
+from roi_web.processing import Fetcher, StreamCheckpoint, StreamProgress, load_events_async, tail_events
+
+
+async def stream( seen, progress, follow ):
+    # reading and parsing stay off the event loop, the fetchers keep going meanwhile
+    async for event in load_events_async( seen=seen, progress=progress ):
+        yield event
+
+    if follow:
+        async for events in tail_events( seen=seen, progress=progress ):
+            for event in events:
+                yield event
+
+
+async def main( follow=False ):
+    # closed however the run ends, so what was persisted is flushed
+    with contextlib.ExitStack() as stack:
+        store = stack.enter_context( PageStore() )
+        seen = stack.enter_context( SeenIndex( store.segments.path ) )
+        if not len( seen ):
+            seen.update( store.digests() )
+            seen.compact()
+
+        # the checkpoint only moves past events the pipeline is done with
+        progress = StreamProgress( StreamCheckpoint() )
+        events = stream( seen, progress, follow )
+        archiver = stack.enter_context( WarcArchiver() )
+        dedup = stack.enter_context( NearDuplicateIndex( store.segments.path ) )
+
+        with ExtractionService( workers=os.cpu_count() ) as extraction:
+            async with Processer( fetcher=Fetcher(), store=store, seen=seen, extraction=extraction,
+                                  archiver=archiver, dedup=dedup ) as processer:
+                with ExecutionContext( "Processing all events" ):
+                    pipeline = processer.pipeline( fetchers=200, enrichers=os.cpu_count(), persisters=1 )
+                    await pipeline.run( events, done=progress.done )
 
 
 if __name__ == "__main__":
-    logger = logging.getLogger( "Roi" )
-    logger.setLevel( logging.INFO )
-    handler = logging.StreamHandler()
-    handler.setLevel( logging.INFO )
-    logger.addHandler( handler )
-
-    logging_thread = threading.Thread( target=log, args=(logger, sync_queue) )
-    logging_thread.start()
-
-    asyncio.run( main() )
+    # see roi_utils.entrypoint for the options, --follow tails the stream once read
+    run( functools.partial( main, follow="--follow" in sys.argv ) )
@@ -0,0 +1,33 @@
+import os
+import pathlib
+import statistics
+import sys
+import time
+
+from roi_web.retraf import batch_extract
+
+CORPUS = pathlib.Path( __file__ ).parents[ 2 ] / "test" / "roi_web" / "data"
+
+
+def main( corpus: pathlib.Path, documents: int = 200 ):
+    pages = [ path.read_bytes() for path in sorted( corpus.glob( "*.html" ) ) ]
+    batch = [ pages[ i % len( pages ) ] for i in range( documents ) ]
+    print( f"{len( batch )} documents from {len( pages )} pages, {os.cpu_count()} cpus" )
+
+    workers = 1
+    while workers <= os.cpu_count():
+        start = time.perf_counter()
+        results = list( batch_extract( batch, workers=workers, include_formatting=True, include_links=True,
+                                       include_tables=False ) )
+        elapsed = time.perf_counter() - start
+
+        failed = sum( result.error is not None for result in results )
+        per_document = statistics.median( result.seconds for result in results )
+        print( f"{workers:3d} workers  {len( results ) / elapsed:8.1f} docs/s  "
+               f"median {per_document * 1000:7.2f} ms/doc  {failed} failed" )
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main( pathlib.Path( sys.argv[ 1 ] ) if len( sys.argv ) > 1 else CORPUS,
+          int( sys.argv[ 2 ] ) if len( sys.argv ) > 2 else 200 )
@@ -0,0 +1,43 @@
+import os
+import sys
+
+from roi_utils.benchmark import measure
+from roi_web import WebArchive, UrlEvent, NetworkArchive
+from roi_web.codec import ArchiveCodec, HAS_ZSTD
+
+
+def sample( size: int ) -> WebArchive:
+    url = UrlEvent( raw="https://example.com/a?b=c", quality="", date="2022-09-01", scheme="https",
+                    netloc="example.com", path="/a", query="b=c", hostname="example.com" )
+    # html compresses, random bytes don't, use half of each
+    body = (b"<p>lorem ipsum dolor sit amet</p>" * (size // 64 + 1))[ :size // 2 ] + os.urandom( size // 2 )
+    content = NetworkArchive( host="example.com", request_headers={"Accept": "*/*"}, request_method="GET",
+                              request_real_url=url.raw, request_url=url.raw, response_charset="utf-8",
+                              response_content=body, response_content_type="text/html",
+                              response_headers={"Content-Type": "text/html"}, response_real_url=url.raw,
+                              response_status=200, response_url=url.raw )
+    return WebArchive( url=url, content=content )
+
+
+def main( size: int ):
+    archive = sample( size )
+    encoded = archive.json()
+    print( f"json {len( encoded )} bytes" )
+    print( measure( "json encode", archive.json, size=size ) )
+    print( measure( "json decode", lambda: WebArchive.from_json( encoded ), size=size ) )
+
+    codecs = [ ("binary", ArchiveCodec()), ("binary+gzip", ArchiveCodec( ArchiveCodec.GZIP, level=1 )) ]
+    if HAS_ZSTD:
+        codecs.append( ("binary+zstd", ArchiveCodec( ArchiveCodec.ZSTD )) )
+
+    for name, codec in codecs:
+        frame = codec.encode( archive )
+        assert ArchiveCodec.decode( frame ) == archive
+        print( f"{name} {len( frame )} bytes" )
+        print( measure( f"{name} encode", lambda: codec.encode( archive ), size=size ) )
+        print( measure( f"{name} decode", lambda: ArchiveCodec.decode( frame ), size=size ) )
+        print( measure( f"{name} url only", lambda: ArchiveCodec.view( frame ).url, size=size ) )
+
+
+if __name__ == "__main__":
+    main( int( sys.argv[ 1 ] ) if len( sys.argv ) > 1 else 1024 * 1024 )
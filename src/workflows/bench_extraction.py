@@ -0,0 +1,36 @@
+import pathlib
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from roi_web.parsing import HTML
+from roi_web.retraf.core import bare_extraction
+
+CORPUS = pathlib.Path( __file__ ).parents[ 2 ] / "test" / "roi_web" / "data"
+
+
+def run( pages, lazy: bool, repeat: int ):
+    # peak rss only grows, every mode gets a fresh process
+    start = time.perf_counter()
+    for _ in range( repeat ):
+        for page in pages:
+            reparse = (lambda: HTML.htmlElement( page )) if lazy else None
+            bare_extraction( HTML.htmlElement( page ), include_formatting=True, include_links=True,
+                             include_tables=False, reparse=reparse )
+    elapsed = time.perf_counter() - start
+    return elapsed / (repeat * len( pages )), resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss
+
+
+def main( corpus: pathlib.Path, repeat: int = 20 ):
+    pages = [ path.read_bytes() for path in sorted( corpus.glob( "*.html" ) ) ]
+    print( f"{len( pages )} pages, {sum( len( page ) for page in pages )} bytes" )
+
+    for name, lazy in (("deepcopy backups", False), ("copy on demand", True)):
+        with ProcessPoolExecutor( 1 ) as executor:
+            per_page, rss = executor.submit( run, pages, lazy, repeat ).result()
+        print( f"{name:<20} {per_page * 1000:9.3f} ms/page  peak rss {rss / 1024:9.1f} MB" )
+
+
+if __name__ == "__main__":
+    main( pathlib.Path( sys.argv[ 1 ] ) if len( sys.argv ) > 1 else CORPUS )
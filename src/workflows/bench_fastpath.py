@@ -0,0 +1,43 @@
+import collections
+import pathlib
+import statistics
+import sys
+import time
+
+from roi_web.parsing import HTML
+from roi_web.retraf.core import bare_extraction
+
+CORPUS = pathlib.Path( __file__ ).parents[ 2 ] / "test" / "roi_web" / "data"
+
+
+def latencies( pages, fast_path: bool, repeat: int ):
+    runs, paths, texts = [ ], collections.Counter(), [ ]
+    for _ in range( repeat ):
+        for page in pages:
+            start = time.perf_counter()
+            document = bare_extraction( HTML.htmlElement( page ), include_formatting=True, include_links=True,
+                                        include_tables=False, reparse=lambda: HTML.htmlElement( page ),
+                                        fast_path=fast_path )
+            runs.append( time.perf_counter() - start )
+            paths[ document[ "extraction_path" ] ] += 1
+            texts.append( document[ "text" ] )
+    return runs, paths, texts
+
+
+def main( corpus: pathlib.Path, repeat: int = 5 ):
+    pages = [ path.read_bytes() for path in sorted( corpus.glob( "*.html" ) ) ]
+    print( f"{len( pages )} pages x {repeat}" )
+
+    results = { }
+    for name, fast_path in (("always compare", False), ("fast path", True)):
+        runs, paths, texts = results[ name ] = latencies( pages, fast_path, repeat )
+        quantiles = statistics.quantiles( runs, n=100, method="inclusive" ) if len( runs ) > 1 else runs * 99
+        print( f"{name:<16} p50 {quantiles[ 49 ] * 1000:8.2f} ms  p90 {quantiles[ 89 ] * 1000:8.2f} ms  "
+               f"p99 {quantiles[ 98 ] * 1000:8.2f} ms  max {max( runs ) * 1000:8.2f} ms  {dict( paths )}" )
+
+    changed = sum( a != b for a, b in zip( results[ "always compare" ][ 2 ], results[ "fast path" ][ 2 ] ) )
+    print( f"text changed by the fast path on {changed} of {len( results[ 'fast path' ][ 2 ] )} runs" )
+
+
+if __name__ == "__main__":
+    main( pathlib.Path( sys.argv[ 1 ] ) if len( sys.argv ) > 1 else CORPUS )
@@ -0,0 +1,84 @@
+import asyncio
+import contextlib
+import hashlib
+import logging
+import os
+import sys
+import threading
+import time
+
+from roi_utils.logging import AsyncLogSink, ExecutionContext, log, sync_queue
+from roi_utils.tracing import JsonlExporter, Tracer
+
+CONCURRENCY = 200
+STEPS = ("Fetching Raw", "Processing", "Persist Processed")
+
+
+async def step( operation, digest, traced ):
+    if not traced:
+        await asyncio.sleep( 0 )
+        return
+    with ExecutionContext( operation, exc_suppress=True, extra={"digest": digest, "kind": "other"} ):
+        await asyncio.sleep( 0 )
+
+
+async def process( digest, traced ):
+    # the contexts of Processer.process for one URL
+    if traced:
+        with ExecutionContext( "Processing url", exc_suppress=True, extra={"digest": digest, "kind": "other"} ):
+            for operation in STEPS:
+                await step( operation, digest, traced )
+    else:
+        for operation in STEPS:
+            await step( operation, digest, traced )
+
+
+async def run( digests, traced, sink=None ):
+    async with sink or contextlib.nullcontext():
+        for i in range( 0, len( digests ), CONCURRENCY ):
+            await asyncio.gather( *(process( digest, traced ) for digest in digests[ i:i + CONCURRENCY ]) )
+
+
+def timed( fn ) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def log_thread( digests, devnull ):
+    logger = logging.getLogger( "bench" )
+    logger.propagate = False
+    logger.handlers = [ logging.StreamHandler( devnull ) ]
+    logger.setLevel( logging.INFO )
+    thread = threading.Thread( target=log, args=(logger, sync_queue) )
+    thread.start()
+    asyncio.run( run( digests, True ) )
+    # until the last line is out
+    sync_queue.put( None )
+    thread.join()
+
+
+def main( count: int ):
+    digests = [ hashlib.md5( str( i ).encode() ).hexdigest() for i in range( count ) ]
+    with open( os.devnull, "w" ) as devnull:
+        variants = {
+            "no contexts": lambda: asyncio.run( run( digests, False ) ),
+            "log thread": lambda: log_thread( digests, devnull ),
+            "AsyncLogSink": lambda: asyncio.run( run( digests, True, AsyncLogSink( devnull.fileno() ) ) ),
+        }
+        timings = { name: min( timed( fn ) for _ in range( 3 ) ) for name, fn in variants.items() }
+
+        for rate in (1.0, 0.0):
+            with Tracer( JsonlExporter( os.devnull ), sample_rate=rate ) as tracer:
+                ExecutionContext.install( tracer )
+                timings[ f"tracer {rate:.0%} to jsonl" ] = min( timed( lambda: asyncio.run( run( digests, True ) ) )
+                                                               for _ in range( 3 ) )
+            ExecutionContext.install( None )
+
+    baseline = timings[ "no contexts" ]
+    for name, seconds in timings.items():
+        print( f"{name:<24} {seconds * 1e6 / count:8.1f} us per url  overhead {(seconds - baseline) * 1e6 / count:8.1f} us" )
+
+
+if __name__ == "__main__":
+    main( int( sys.argv[ 1 ] ) if len( sys.argv ) > 1 else 20_000 )
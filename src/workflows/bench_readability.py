@@ -0,0 +1,43 @@
+import pathlib
+import sys
+
+from roi_utils.benchmark import measure
+from roi_web.parsing import HTML
+from roi_web.retraf.readability_lxml import Document, TextStats
+from roi_web.retraf.utils import trim
+
+CORPUS = pathlib.Path( __file__ ).parents[ 2 ] / "test" / "roi_web" / "data"
+
+
+def walking_scores( document: Document ):
+    # what score_paragraphs measured before: text_content per paragraph, then a link walk per candidate
+    lengths, candidates = [ ], set()
+    for elem in document.tags( document.doc, "p", "pre", "td" ):
+        text = trim( elem.text_content() or "" )
+        lengths.append( (len( text ), len( text.split( "," ) )) )
+        candidates.update( node for node in (elem.getparent(), elem.getparent().getparent()) if node is not None )
+    return lengths, [ document.get_link_density( node ) for node in candidates ]
+
+
+def stats_scores( document: Document ):
+    stats = TextStats( document.doc )
+    lengths, candidates = [ ], set()
+    for elem in document.tags( document.doc, "p", "pre", "td" ):
+        lengths.append( (stats.length( elem ), stats.comma_count( elem ) + 1) )
+        candidates.update( node for node in (elem.getparent(), elem.getparent().getparent()) if node is not None )
+    return lengths, [ stats.link_density( node ) for node in candidates ]
+
+
+def main( corpus: pathlib.Path ):
+    pages = [ path.read_bytes() for path in sorted( corpus.glob( "*.html" ) ) ]
+    trees = [ HTML.htmlElement( page ) for page in pages ]
+    documents = [ Document( tree ) for tree in trees ]
+    print( f"{len( trees )} pages, {sum( len( list( tree.iter() ) ) for tree in trees )} elements" )
+
+    print( measure( "subtree walks", lambda: [ walking_scores( document ) for document in documents ] ) )
+    print( measure( "one post-order pass", lambda: [ stats_scores( document ) for document in documents ] ) )
+    print( measure( "summary", lambda: [ Document( HTML.htmlElement( page ) ).summary() for page in pages ], repeat=3 ) )
+
+
+if __name__ == "__main__":
+    main( pathlib.Path( sys.argv[ 1 ] ) if len( sys.argv ) > 1 else CORPUS )
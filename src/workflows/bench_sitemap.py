@@ -0,0 +1,54 @@
+import gzip
+import re
+import sys
+import tracemalloc
+
+from roi_utils.benchmark import measure
+from roi_web.retraf.sitemaps import iter_sitemap
+
+# what retraf.sitemaps ran over the whole decoded sitemap before the streaming parser
+LINK_REGEX = re.compile( r'<loc>(<!\[CDATA\[)?(http.+?)(\]\]>)?</loc>' )
+CHUNK = 64 * 1024
+
+
+def sample( urls: int ) -> bytes:
+    entries = "".join( f"<url><loc>https://example.com/news/2024/01/article-{i}.html</loc><lastmod>2024-01-01</lastmod>"
+                       f"<changefreq>daily</changefreq></url>\n" for i in range( urls ) )
+    return gzip.compress( ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                           '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+                           f"{entries}</urlset>").encode() )
+
+
+def chunks( payload: bytes ):
+    for start in range( 0, len( payload ), CHUNK ):
+        yield payload[ start:start + CHUNK ]
+
+
+def whole( payload: bytes ):
+    return sum( 1 for _ in LINK_REGEX.finditer( gzip.decompress( payload ).decode() ) )
+
+
+def streamed( payload: bytes ):
+    return sum( 1 for _ in iter_sitemap( chunks( payload ) ) )
+
+
+def peak( fn, payload: bytes ) -> float:
+    tracemalloc.start()
+    fn( payload )
+    _, top = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return top / 1024 / 1024
+
+
+def main( urls: int ):
+    payload = sample( urls )
+    size = len( gzip.decompress( payload ) )
+    print( f"{urls} urls, {size / 1024 / 1024:.1f}MB uncompressed, {len( payload ) / 1024 / 1024:.1f}MB gzipped" )
+    assert whole( payload ) == streamed( payload ) == urls
+
+    for name, fn in (("decode + regex", whole), ("iterparse stream", streamed)):
+        print( measure( name, lambda: fn( payload ), repeat=3, size=size ), f"peak {peak( fn, payload ):.1f}MB" )
+
+
+if __name__ == "__main__":
+    main( int( sys.argv[ 1 ] ) if len( sys.argv ) > 1 else 300_000 )
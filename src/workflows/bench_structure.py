@@ -0,0 +1,48 @@
+import pathlib
+import sys
+
+import trafilatura
+
+from roi_utils.benchmark import measure
+from roi_web.domain import UrlEvent
+from roi_web.parsing import HTML
+
+CORPUS = pathlib.Path( __file__ ).parents[ 2 ] / "test" / "roi_web" / "data"
+
+
+def legacy_image( html ):
+    # the five rooted scans HTML.getImage used to run
+    anyImage = HTML.toAttrib( "src", html.xpath( "//img" ) )
+    headIcon = HTML.toAttrib( "href", html.xpath( "//head/link[@rel='icon']" ) )
+    itemProp = HTML.toAttrib( "content", html.xpath( "//meta[@itemprop='image']" ) )
+    ogImage = HTML.toAttrib( "content", html.xpath( "//meta[@property='og:image']" ) )
+    twitterImage = HTML.toAttrib( "content", html.xpath( "//meta[@name='twitter:image']" ) )
+    return HTML.first( ogImage, twitterImage, itemProp, headIcon, anyImage )
+
+
+def legacy_structure( content: bytes ):
+    html_element = HTML.htmlElement( content )
+    result = trafilatura.bare_extraction( filecontent=html_element, include_formatting=True, include_links=True,
+                                          include_comments=False, include_images=False, include_tables=False )
+    return result, legacy_image( html_element )
+
+
+def main( corpus: pathlib.Path ):
+    pages = [ path.read_bytes() for path in sorted( corpus.glob( "*.html" ) ) ]
+    size = sum( len( page ) for page in pages )
+    url = UrlEvent( raw="https://example.com/", quality="", date="2022-09-01", scheme="https",
+                    netloc="example.com", path="/", query="", hostname="example.com" )
+    print( f"{len( pages )} pages, {size} bytes" )
+
+    for page in pages:
+        tree = HTML.htmlElement( page )
+        assert legacy_image( tree ) == HTML.getImage( tree )
+
+    print( measure( "image, five xpath scans", lambda: [ legacy_image( HTML.htmlElement( p ) ) for p in pages ], size=size ) )
+    print( measure( "image, one iter pass", lambda: [ HTML.getImage( HTML.htmlElement( p ) ) for p in pages ], size=size ) )
+    print( measure( "structure, trafilatura", lambda: [ legacy_structure( p ) for p in pages ], size=size ) )
+    print( measure( "structure, single parse", lambda: [ HTML.structure( url, p ) for p in pages ], size=size ) )
+
+
+if __name__ == "__main__":
+    main( pathlib.Path( sys.argv[ 1 ] ) if len( sys.argv ) > 1 else CORPUS )
@@ -0,0 +1,49 @@
+import hashlib
+import sys
+
+from roi_utils.benchmark import measure
+from roi_utils.latency import LatencyRecorder
+from roi_utils.logging import ExecutionContext, sync_queue
+from roi_utils.tracing import Tracer
+
+
+class NullExporter:
+
+    def export( self, spans ):
+        pass
+
+    def close( self ):
+        pass
+
+
+def spans( digests ):
+    for digest in digests:
+        with ExecutionContext( "Fetching Raw", extra={"digest": digest, "kind": "Web"} ):
+            pass
+
+
+def logged( digests ):
+    spans( digests )
+    # what the log thread would have to take off the queue
+    while not sync_queue.empty():
+        sync_queue.get_nowait()
+
+
+def main( count: int ):
+    digests = [ hashlib.md5( str( i ).encode() ).hexdigest() for i in range( count ) ]
+    print( measure( "json + sync_queue", lambda: logged( digests ), number=1 ) )
+
+    for rate in (1.0, 0.1, 0.0):
+        with Tracer( NullExporter(), sample_rate=rate ) as tracer:
+            ExecutionContext.install( tracer )
+            print( measure( f"tracer, sampling {rate:.0%}", lambda: spans( digests ) ), f"dropped {tracer.dropped}" )
+
+    with Tracer( NullExporter(), sample_rate=0.0 ) as tracer:
+        ExecutionContext.install( tracer, LatencyRecorder() )
+        print( measure( "latency only", lambda: spans( digests ) ) )
+    ExecutionContext.install( None )
+    print( f"per {count} spans" )
+
+
+if __name__ == "__main__":
+    main( int( sys.argv[ 1 ] ) if len( sys.argv ) > 1 else 100_000 )
@@ -0,0 +1,42 @@
+import argparse
+import pathlib
+
+from roi_web import PageContent, PageStore
+from roi_web.processing import Processer
+
+
+def migrate( source: pathlib.Path, store: PageStore ):
+    migrated, skipped, failed = 0, 0, 0
+
+    for f in source.glob( "*" ):
+        try:
+            content = PageContent.from_json( f.read_bytes() )
+        except Exception as e:
+            print( f"Could not read {f}: {e}" )
+            failed += 1
+            continue
+
+        if content.digest() in store:
+            skipped += 1
+            continue
+
+        store.put( content )
+        migrated += 1
+
+    return migrated, skipped, failed
+
+
+def main():
+    parser = argparse.ArgumentParser( description="Moves the one-file-per-digest processed directory into a PageStore." )
+    parser.add_argument( "--source", type=pathlib.Path, default=Processer.DEFAULT_PATH )
+    parser.add_argument( "--target", type=pathlib.Path, default=PageStore.DEFAULT_PATH )
+    args = parser.parse_args()
+
+    with PageStore( args.target ) as store:
+        migrated, skipped, failed = migrate( args.source, store )
+
+    print( f"Migrated {migrated} entries into {args.target}, skipped {skipped} already present, {failed} failed." )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import pathlib
+import sys
+
+from roi_utils.benchmark import measure
+from roi_web.parsing import HTML
+from roi_web.retraf.core import bare_extraction
+from roi_web.retraf.xpaths import XPATHS
+
+CORPUS = pathlib.Path( __file__ ).parents[ 2 ] / "test" / "roi_web" / "data"
+
+
+def extract_all( pages ):
+    for page in pages:
+        bare_extraction( HTML.htmlElement( page ), include_formatting=True, include_links=True, include_tables=False )
+
+
+def main( corpus: pathlib.Path, top: int = 20 ):
+    pages = [ path.read_bytes() for path in sorted( corpus.glob( "*.html" ) ) ]
+    size = sum( len( page ) for page in pages )
+    print( f"{len( pages )} pages, {size} bytes" )
+
+    print( measure( "attribute index", lambda: extract_all( pages ), size=size ) )
+    XPATHS.indexed = False
+    print( measure( "merged discard lists", lambda: extract_all( pages ), size=size ) )
+    XPATHS.indexed = True
+    XPATHS.profile()
+    print( measure( "one expression at a time", lambda: extract_all( pages ), size=size ) )
+
+    print( f"\n{'calls':>7} {'hits':>7} {'ms':>9}  expression" )
+    for calls, hits, seconds, expression in XPATHS.report()[ :top ]:
+        print( f"{calls:7d} {hits:7d} {seconds * 1000:9.2f}  {expression[ :100 ]}" )
+
+
+if __name__ == "__main__":
+    main( pathlib.Path( sys.argv[ 1 ] ) if len( sys.argv ) > 1 else CORPUS )
@@ -0,0 +1,32 @@
+import contextlib
+import os
+
+from roi_utils.entrypoint import run
+from roi_utils.logging import ExecutionContext
+from roi_web import Processer, PageStore, WarcArchiver, NearDuplicateIndex
+from roi_web.extraction import ExtractionService
+
+
+def successful( archives ):
+    for archive in archives:
+        if 200 <= archive.content.response_status <= 299:
+            yield archive
+
+
+async def main():
+    # closed however the run ends, so what was persisted is flushed
+    with contextlib.ExitStack() as stack:
+        store = stack.enter_context( PageStore() )
+        archiver = stack.enter_context( WarcArchiver() )
+        dedup = stack.enter_context( NearDuplicateIndex( store.segments.path ) )
+
+        with ExtractionService( workers=os.cpu_count() ) as extraction:
+            async with Processer( fetcher=None, store=store, extraction=extraction, dedup=dedup ) as processer:
+                with ExecutionContext( "Reprocessing archive", extra={"length": len( archiver )} ):
+                    pipeline = processer.reprocess( enrichers=os.cpu_count(), persisters=1 )
+                    await pipeline.run( successful( archiver.scan() ) )
+
+
+if __name__ == "__main__":
+    # see roi_utils.entrypoint for the options
+    run( main )
@@ -0,0 +1,37 @@
+import json
+import pathlib
+import tempfile
+import unittest
+
+from roi_utils.entrypoint import parse_options, run
+from roi_utils.logging import ExecutionContext
+
+
+class TestEntrypoint( unittest.TestCase ):
+
+    def tearDown( self ):
+        ExecutionContext.install()
+
+    def test_options_leave_the_flags_out( self ):
+        self.assertEqual( parse_options( [ "--trace=out.jsonl", "--follow", "--summary=30" ] ),
+                          {"trace": "out.jsonl", "summary": "30"} )
+
+    def test_run_traces_main_and_closes_the_tracer( self ):
+        ran = [ ]
+
+        async def main():
+            with ExecutionContext( "Workflow step" ):
+                ran.append( ExecutionContext.tracer )
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = pathlib.Path( directory ) / "trace.jsonl"
+            run( main, [ f"--trace={path}", "--follow" ] )
+            spans = [ json.loads( line ) for line in path.read_text().splitlines() ]
+
+        self.assertEqual( len( ran ), 1 )
+        self.assertIsNotNone( ran[ 0 ] )
+        self.assertIn( "Workflow step", json.dumps( spans ) )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import random
+import unittest
+
+from roi_utils.latency import LatencyHistogram, LatencyRecorder
+
+
+class TestLatencyHistogram( unittest.TestCase ):
+
+    def test_percentiles_within_a_bucket( self ):
+        generator = random.Random( 7 )
+        values = sorted( int( generator.lognormvariate( 16, 2 ) ) for _ in range( 20000 ) )
+        histogram = LatencyHistogram()
+        for value in values:
+            histogram.record( value )
+
+        for q in (50, 95, 99, 100):
+            exact = values[ max( 0, round( q / 100 * len( values ) ) - 1 ) ]
+            self.assertLessEqual( abs( histogram.percentile( q ) - exact ), exact / 64 + 1 )
+        self.assertEqual( (histogram.min, histogram.max, len( histogram )), (values[ 0 ], values[ -1 ], 20000) )
+
+    def test_merge_and_buckets( self ):
+        first, second = LatencyHistogram(), LatencyHistogram()
+        for value in (3, 3, 300):
+            first.record( value )
+        second.record( 10 ** 12 )
+        first.merge( second )
+
+        buckets = list( first.buckets() )
+        self.assertEqual( buckets[ 0 ], (3, 2) )
+        self.assertEqual( sum( count for _, count in buckets ), 4 )
+        self.assertGreaterEqual( buckets[ -1 ][ 0 ], 10 ** 12 )
+        self.assertEqual( first.percentile( 100 ), 10 ** 12 )
+
+
+class TestLatencyRecorder( unittest.TestCase ):
+
+    def test_summary_per_operation_and_kind( self ):
+        recorder = LatencyRecorder()
+        for i in range( 100 ):
+            recorder.record( "Fetching Raw", "youtube" if i % 4 == 0 else "other", 1_000_000 * (i + 1), i % 10 == 0 )
+        recorder.record( "Processing all events", None, 5_000_000_000 )
+
+        elapsed, window = recorder.snapshot()
+        histogram, errors = window[ ("Fetching Raw", LatencyRecorder.ALL) ]
+        self.assertEqual( (len( histogram ), errors), (100, 10) )
+        self.assertEqual( len( window[ ("Fetching Raw", "youtube") ][ 0 ] ), 25 )
+        self.assertNotIn( ("Processing all events", None), window )
+        self.assertEqual( recorder.snapshot()[ 1 ], { } )
+
+        recorder.record( "Fetching Raw", "other", 2_000_000, True )
+        lines = recorder.summary().splitlines()
+        self.assertEqual( len( lines ), 4 )
+        self.assertIn( "100.0%", lines[ -1 ] )
+
+
+if __name__ == '__main__':
+    unittest.main()
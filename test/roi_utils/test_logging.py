@@ -0,0 +1,105 @@
+import asyncio
+import json
+import queue
+import tempfile
+import threading
+import unittest
+
+from roi_utils.logging import AsyncLogSink, ExecutionContext, log
+
+
+class ListLogger:
+
+    def __init__( self ):
+        self.lines = [ ]
+
+    def info( self, message ):
+        self.lines.append( ("info", message) )
+
+    def warning( self, message ):
+        self.lines.append( ("warn", message) )
+
+    def error( self, message ):
+        self.lines.append( ("error", message) )
+
+
+def records( text ):
+    return [ json.loads( line[ line.index( "{" ):line.rindex( "}" ) + 1 ] ) for line in text.splitlines() ]
+
+
+class TestAsyncLogSink( unittest.TestCase ):
+
+    def setUp( self ):
+        self.file = tempfile.TemporaryFile()
+
+    def tearDown( self ):
+        self.file.close()
+
+    def read( self ):
+        self.file.seek( 0 )
+        return self.file.read().decode()
+
+    def test_everything_is_written_on_exit( self ):
+        async def main():
+            async with AsyncLogSink( self.file.fileno(), max_delay=60 ) as sink:
+                self.assertIs( ExecutionContext.sink, sink )
+                for i in range( 300 ):
+                    with ExecutionContext( "Processing", exc_suppress=True, exc_level="warn", extra={"i": i} ):
+                        if i % 100 == 0:
+                            raise Exception( "No text" )
+            self.assertIsNone( ExecutionContext.sink )
+            return sink
+
+        sink = asyncio.run( main() )
+        lines = records( self.read() )
+        self.assertEqual( len( lines ), 600 )
+        self.assertEqual( sink.written, len( self.read().encode() ) )
+        self.assertEqual( [ line[ "i" ] for line in lines[ 1::2 ] ], list( range( 300 ) ) )
+        self.assertEqual( sum( line[ "step" ] == "WARN" for line in lines ), 3 )
+
+    def test_size_budget_flushes_before_the_delay( self ):
+        async def main():
+            async with AsyncLogSink( self.file.fileno(), max_bytes=1024, max_delay=60 ) as sink:
+                # from another thread, like the latency reporter
+                thread = threading.Thread( target=lambda: [ sink.write( "info", "x" * 99 ) for _ in range( 20 ) ] )
+                thread.start()
+                thread.join()
+                for _ in range( 50 ):
+                    await asyncio.sleep( 0.01 )
+                    if sink.written:
+                        break
+                return sink.written
+
+        self.assertGreaterEqual( asyncio.run( main() ), 1024 )
+        self.assertEqual( self.read(), ("x" * 99 + "\n") * 20 )
+
+    def test_lines_written_while_flushing_are_kept( self ):
+        async def main():
+            async with AsyncLogSink( self.file.fileno(), max_bytes=64, max_delay=0.001 ) as sink:
+                threads = [ threading.Thread( target=lambda t=t: [ sink.write( "info", f"{t} {i}" ) for i in range( 2000 ) ] )
+                            for t in range( 4 ) ]
+                for thread in threads:
+                    thread.start()
+                while any( thread.is_alive() for thread in threads ):
+                    await asyncio.sleep( 0.001 )
+
+        asyncio.run( main() )
+        self.assertEqual( sorted( self.read().splitlines() ), sorted( f"{t} {i}" for t in range( 4 ) for i in range( 2000 ) ) )
+
+
+class TestLog( unittest.TestCase ):
+
+    def test_stops_on_none( self ):
+        lines, logger = queue.Queue(), ListLogger()
+        thread = threading.Thread( target=log, args=(logger, lines) )
+        thread.start()
+        for item in (("info", "a"), ("warn", "b"), ("error", "c"), None):
+            lines.put( item )
+        thread.join( 5 )
+
+        self.assertFalse( thread.is_alive() )
+        self.assertEqual( logger.lines, [ ("info", "a"), ("warn", "b"), ("error", "c") ] )
+
+
+if __name__ == '__main__':
+    unittest.main()
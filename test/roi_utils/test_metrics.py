@@ -0,0 +1,88 @@
+import asyncio
+import unittest
+
+from roi_utils.logging import ExecutionContext
+from roi_utils.metrics import MetricsServer, Registry, SpanMetrics
+
+
+def samples( text ):
+    return dict( line.rsplit( " ", 1 ) for line in text.splitlines() if not line.startswith( "#" ) )
+
+
+class TestRegistry( unittest.TestCase ):
+
+    def test_exposition( self ):
+        registry = Registry()
+        fetched = registry.counter( "roi_urls_fetched_total", "URLs fetched", ("kind", "outcome") )
+        fetched.labels( "youtube", "ok" ).inc()
+        fetched.labels( "youtube", "ok" ).inc( 2 )
+        fetched.labels( 'say "hi"\n', "error" ).inc()
+        registry.counter( "roi_downloaded_bytes_total", "Bytes" ).inc( 1024 )
+        queues = {"fetch": 3, "persist": 0}
+        registry.gauge( "roi_pipeline_queue_depth", "Waiting", ("stage",) ).collect(
+            lambda: {(stage,): depth for stage, depth in queues.items()} )
+        seconds = registry.histogram( "roi_span_seconds", "Durations", ("operation",), buckets=(0.01, 1.0) )
+        for nanoseconds in (5_000_000, 20_000_000, 3_000_000_000):
+            seconds.labels( "Processing" ).observe( nanoseconds )
+
+        text = registry.exposition()
+        self.assertIn( "# TYPE roi_urls_fetched_total counter\n", text )
+        self.assertIn( "# TYPE roi_span_seconds histogram\n", text )
+        values = samples( text )
+        self.assertEqual( values[ 'roi_urls_fetched_total{kind="youtube",outcome="ok"}' ], "3" )
+        self.assertEqual( values[ 'roi_urls_fetched_total{kind="say \\"hi\\"\\n",outcome="error"}' ], "1" )
+        self.assertEqual( values[ "roi_downloaded_bytes_total" ], "1024" )
+        self.assertEqual( values[ 'roi_pipeline_queue_depth{stage="fetch"}' ], "3" )
+        self.assertEqual( values[ 'roi_span_seconds_bucket{operation="Processing",le="0.01"}' ], "1" )
+        self.assertEqual( values[ 'roi_span_seconds_bucket{operation="Processing",le="1.0"}' ], "2" )
+        self.assertEqual( values[ 'roi_span_seconds_bucket{operation="Processing",le="+Inf"}' ], "3" )
+        self.assertEqual( values[ 'roi_span_seconds_count{operation="Processing"}' ], "3" )
+        self.assertAlmostEqual( float( values[ 'roi_span_seconds_sum{operation="Processing"}' ] ), 3.025 )
+
+        with self.assertRaises( ValueError ):
+            registry.gauge( "roi_urls_fetched_total", "Again" )
+
+    def test_functions_of_live_instances_add_up( self ):
+        registry = Registry()
+        depth = registry.gauge( "roi_pipeline_queue_depth", "Waiting", ("stage",) )
+        first, second = (lambda: {("fetch",): 3, ("persist",): 1}), (lambda: {("fetch",): 2})
+
+        depth.collect( first )
+        depth.collect( second )
+        values = samples( registry.exposition() )
+        self.assertEqual( (values[ 'roi_pipeline_queue_depth{stage="fetch"}' ],
+                           values[ 'roi_pipeline_queue_depth{stage="persist"}' ]), ("5", "1") )
+
+        depth.discard( first )
+        depth.discard( first )
+        self.assertEqual( samples( registry.exposition() ), {'roi_pipeline_queue_depth{stage="fetch"}': "2"} )
+        depth.discard( second )
+        self.assertEqual( samples( registry.exposition() ), { } )
+
+    def test_served_with_span_metrics( self ):
+        registry = Registry()
+
+        async def main():
+            ExecutionContext.install( metrics=SpanMetrics( registry ) )
+            try:
+                async with MetricsServer( registry, port=0 ) as server:
+                    with ExecutionContext( "Fetching Raw", exc_suppress=True, extra={"kind": "arxiv"} ):
+                        raise Exception( "Unsucessful response" )
+
+                    reader, writer = await asyncio.open_connection( server.host, server.port )
+                    writer.write( b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n" )
+                    response = await reader.read()
+                    writer.close()
+                    return response.decode()
+            finally:
+                ExecutionContext.install()
+
+        head, body = asyncio.run( main() ).split( "\r\n\r\n", 1 )
+        self.assertTrue( head.startswith( "HTTP/1.1 200 OK" ) )
+        values = samples( body )
+        self.assertEqual( values[ 'roi_span_errors_total{operation="Fetching Raw",kind="arxiv"}' ], "1" )
+        self.assertEqual( values[ 'roi_span_seconds_count{operation="Fetching Raw",kind="arxiv"}' ], "1" )
+
+
+if __name__ == '__main__':
+    unittest.main()
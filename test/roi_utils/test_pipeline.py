@@ -0,0 +1,132 @@
+import asyncio
+import unittest
+
+from roi_utils.pipeline import ITEMS, QUEUE_DEPTH, Pipeline, Stage
+
+
+def run( pipeline, source, done=None, timeout=5.0 ):
+    asyncio.run( asyncio.wait_for( pipeline.run( source, done=done ), timeout ) )
+
+
+class TestPipeline( unittest.TestCase ):
+
+    def test_single_workers_keep_the_order( self ):
+        seen = [ ]
+
+        async def double( item ):
+            await asyncio.sleep( 0 )
+            return item * 2
+
+        async def collect( item ):
+            seen.append( item )
+
+        pipeline = Pipeline( Stage( "double", double ), Stage( "collect", collect, capacity=2 ) )
+        run( pipeline, range( 50 ) )
+        self.assertEqual( seen, [ i * 2 for i in range( 50 ) ] )
+        self.assertEqual( [ (stage.done, stage.failed) for stage in pipeline.stages ], [ (50, 0), (50, 0) ] )
+
+    def test_failing_items_are_dropped_and_counted( self ):
+        seen, settled = [ ], [ ]
+
+        async def check( item ):
+            if item % 3 == 0:
+                raise ValueError( item )
+            return item if item % 3 == 1 else None
+
+        async def collect( item ):
+            seen.append( item )
+
+        pipeline = Pipeline( Stage( "check", check, workers=2 ), Stage( "collect", collect ) )
+        run( pipeline, range( 9 ), done=lambda item, error: settled.append( (item, type( error ).__name__) ) )
+        self.assertEqual( sorted( seen ), [ 1, 4, 7 ] )
+        self.assertEqual( (pipeline.stages[ 0 ].done, pipeline.stages[ 0 ].failed), (6, 3) )
+        self.assertEqual( (pipeline.stages[ 1 ].done, pipeline.stages[ 1 ].failed), (3, 0) )
+        # every source item is settled once, dropped or through, with what dropped it
+        self.assertEqual( sorted( settled ), [ (i, ("ValueError", "NoneType", "NoneType")[ i % 3 ]) for i in range( 9 ) ] )
+
+    def test_a_full_queue_holds_the_source_back( self ):
+        pulled, release = [ ], None
+
+        def source():
+            for i in range( 20 ):
+                pulled.append( i )
+                yield i
+
+        async def stuck( item ):
+            await release.wait()
+
+        async def main():
+            nonlocal release
+            release = asyncio.Event()
+            pipeline = Pipeline( Stage( "stuck", stuck, workers=1, capacity=2 ) )
+            task = asyncio.create_task( pipeline.run( source() ) )
+            for _ in range( 20 ):
+                await asyncio.sleep( 0 )
+            # one item in the worker, two queued, one waiting to be put
+            waiting = len( pulled )
+            release.set()
+            await asyncio.wait_for( task, 5.0 )
+            return waiting
+
+        self.assertEqual( asyncio.run( main() ), 4 )
+        self.assertEqual( len( pulled ), 20 )
+
+    def test_shutdown_reaches_every_worker( self ):
+        seen = [ ]
+
+        async def slow( item ):
+            await asyncio.sleep( 0.001 * (item % 4) )
+            return item
+
+        async def collect( item ):
+            seen.append( item )
+
+        for workers in [ (3, 1, 2), (1, 4, 1), (2, 2, 5) ]:
+            with self.subTest( workers=workers ):
+                seen.clear()
+                pipeline = Pipeline( Stage( "first", slow, workers=workers[ 0 ], capacity=1 ),
+                                     Stage( "second", slow, workers=workers[ 1 ], capacity=1 ),
+                                     Stage( "collect", collect, workers=workers[ 2 ], capacity=1 ) )
+                run( pipeline, range( 30 ) )
+                self.assertEqual( sorted( seen ), list( range( 30 ) ) )
+
+    def test_metrics_are_collected_while_running( self ):
+        release = None
+
+        async def stuck( item ):
+            await release.wait()
+
+        async def main():
+            nonlocal release
+            release = asyncio.Event()
+            pipelines = [ Pipeline( Stage( "stuck", stuck, capacity=5 ) ) for _ in range( 2 ) ]
+            tasks = [ asyncio.create_task( pipeline.run( range( 4 ) ) ) for pipeline in pipelines ]
+            for _ in range( 10 ):
+                await asyncio.sleep( 0 )
+            running = { labels[ "stage" ]: value for _, labels, value in QUEUE_DEPTH.samples() }
+            release.set()
+            await asyncio.gather( *tasks )
+            return running
+
+        # one item in each worker, the other three and the end marker queued, in both pipelines
+        self.assertEqual( asyncio.run( main() ), {"stuck": 8} )
+        self.assertEqual( (QUEUE_DEPTH.functions, ITEMS.functions), ([ ], [ ]) )
+
+    def test_empty_sources_and_async_sources( self ):
+        seen = [ ]
+
+        async def collect( item ):
+            seen.append( item )
+
+        async def source():
+            for i in range( 5 ):
+                yield i
+
+        run( Pipeline( Stage( "collect", collect, workers=3 ) ), [ ] )
+        self.assertEqual( seen, [ ] )
+        run( Pipeline( Stage( "collect", collect ) ), source() )
+        self.assertEqual( seen, list( range( 5 ) ) )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import hashlib
+import tempfile
+import unittest
+
+from roi_utils.seen import SeenIndex
+
+
+def digest( i ):
+    return hashlib.md5( str( i ).encode() ).hexdigest()
+
+
+class TestSeenIndex( unittest.TestCase ):
+
+    def setUp( self ):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = self.directory.name
+
+    def tearDown( self ):
+        self.directory.cleanup()
+
+    def test_membership_survives_compaction_and_reopen( self ):
+        with SeenIndex( self.path ) as seen:
+            seen.update( digest( i ) for i in range( 500 ) )
+            seen.compact()
+            seen.add( digest( 1000 ) )
+
+            self.assertEqual( len( seen ), 501 )
+            self.assertIn( digest( 42 ), seen )
+            self.assertIn( digest( 1000 ), seen )
+            self.assertNotIn( digest( 600 ), seen )
+
+        with SeenIndex( self.path ) as seen:
+            self.assertEqual( len( seen ), 501 )
+            self.assertIn( digest( 499 ), seen )
+            self.assertIn( digest( 1000 ), seen )
+            self.assertNotIn( digest( 600 ), seen )
+
+
+if __name__ == '__main__':
+    unittest.main()
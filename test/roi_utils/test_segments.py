@@ -0,0 +1,71 @@
+import hashlib
+import tempfile
+import unittest
+
+from roi_utils.segments import SegmentStore, OffsetIndex
+
+
+def digest( i ):
+    return hashlib.md5( str( i ).encode() ).hexdigest()
+
+
+class TestSegmentStore( unittest.TestCase ):
+
+    def setUp( self ):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = self.directory.name
+
+    def tearDown( self ):
+        self.directory.cleanup()
+
+    def test_put_get_rolls_segments( self ):
+        with SegmentStore( self.path, segment_size=128 ) as store:
+            for i in range( 20 ):
+                store.put( digest( i ), str( i ).encode() * 4 )
+
+            self.assertEqual( len( store ), 20 )
+            self.assertEqual( store.get( digest( 7 ) ), b"7777" )
+            self.assertTrue( store.contains( digest( 19 ) ) )
+            self.assertFalse( store.contains( digest( 20 ) ) )
+            self.assertIsNone( store.get( digest( 20 ) ) )
+            self.assertGreater( store._segment, 0 )
+
+    def test_rolling_closes_the_reader_of_the_sealed_segment( self ):
+        with SegmentStore( self.path, segment_size=128 ) as store:
+            store.put( digest( 0 ), b"0" * 40 )
+            self.assertEqual( store.get( digest( 0 ) ), b"0" * 40 )
+            reader = store._readers[ 0 ]
+
+            store.put( digest( 1 ), b"1" * 40 )
+            store.put( digest( 2 ), b"2" * 40 )
+            self.assertEqual( store._segment, 1 )
+            self.assertTrue( reader.closed )
+            self.assertNotIn( 0, store._readers )
+            # opened again on demand
+            self.assertEqual( store.get( digest( 0 ) ), b"0" * 40 )
+
+    def test_latest_put_wins( self ):
+        with SegmentStore( self.path ) as store:
+            store.put( digest( 1 ), b"old" )
+            store.put( digest( 1 ), b"new" )
+            self.assertEqual( store.get( digest( 1 ) ), b"new" )
+            self.assertEqual( list( store.scan() ), [ (digest( 1 ), b"new") ] )
+
+    def test_reopen_recovers_unindexed_records( self ):
+        with SegmentStore( self.path ) as store:
+            for i in range( 5 ):
+                store.put( digest( i ), b"payload" )
+
+        index = f"{self.path}/{SegmentStore.INDEX_NAME}"
+        with open( index, "rb" ) as file:
+            payload = file.read()
+        with open( index, "wb" ) as file:
+            file.write( payload[ :-OffsetIndex.ENTRY.size * 2 - 3 ] )
+
+        with SegmentStore( self.path ) as store:
+            self.assertEqual( len( store ), 5 )
+            self.assertEqual( store.get( digest( 4 ) ), b"payload" )
+
+
+if __name__ == '__main__':
+    unittest.main()
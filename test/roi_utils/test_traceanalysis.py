@@ -0,0 +1,121 @@
+import hashlib
+import json
+import pathlib
+import tempfile
+import unittest
+
+from roi_utils.traceanalysis import TraceAnalysis, TraceReader, load_hosts
+from roi_utils.tracing import BinaryExporter, DONE, FAIL, JsonlExporter, Span
+
+
+def line( step, operation, start, finish, digest=None, **extra ):
+    record = {"step": step, "start": f"{start:.2f}", "finish": f"{finish:.2f}", "duration": f"{finish - start:6.2f}",
+              "operation": operation}
+    if digest is not None:
+        record.update( digest=digest, kind="youtube" )
+    record.update( extra )
+    return json.dumps( record )
+
+
+def url( operation, start, fetch, process, finish, digest, failed=False ):
+    """The log lines of ``Processer.process`` for one URL."""
+    return [ line( "INIT", operation, start, start, digest ),
+             line( "INIT", "Fetching Raw", start, start, digest ),
+             line( "DONE", "Fetching Raw", start, fetch, digest ),
+             line( "INIT", "Processing", process, process, digest ),
+             line( "DONE", "Processing", process, finish, digest ),
+             line( "FAIL" if failed else "DONE", operation, start, finish, digest,
+                   **({"error": "<class 'Exception'> No text\nTraceback"} if failed else { }) ) ]
+
+
+class TestTraceAnalysis( unittest.TestCase ):
+
+    def analyze( self, lines, **options ):
+        reader = TraceReader()
+        return reader, TraceAnalysis( **options ).analyze( reader, reader.read( lines ) )
+
+    def test_log_lines( self ):
+        lines = [ line( "INIT", "Processing all events", 100.0, 100.0 ),
+                  *url( "Processing url", 100.0, 110.0, 111.0, 112.0, "a" ),
+                  "\x1b[31m'NoneType' object has no attribute 'get'\x1b[0m",
+                  "\x1b[32m" + line( "INIT", "Fetching Raw", 101.0, 101.0, "b", host="slow.org" ) + "\x1b[0m",
+                  *url( "Processing url", 102.0, 103.0, 103.5, 104.0, "c", failed=True ),
+                  line( "DONE", "Processing all events", 100.0, 130.0 ) ]
+        reader, analysis = self.analyze( lines, slow=5.0 )
+
+        self.assertEqual( (reader.lines, reader.invalid, analysis.spans, analysis.urls), (16, 1, 8, 3) )
+        self.assertEqual( analysis.operations[ "Fetching Raw" ].open, 1 )
+        self.assertEqual( analysis.operations[ "Processing url" ].errors, 1 )
+        self.assertEqual( analysis.errors[ ("Processing url", "<class 'Exception'> No text") ], 1 )
+
+        # a: 10s fetching, 1s waiting, 1s processing; c: 1s, 0.5s, 0.5s; b never finished, 29s of fetching
+        self.assertAlmostEqual( analysis.critical[ "Fetching Raw" ], 40.0 )
+        self.assertAlmostEqual( analysis.critical[ TraceAnalysis.WAITING ], 1.5 )
+        self.assertAlmostEqual( analysis.critical[ "Processing" ], 1.5 )
+        self.assertEqual( max( analysis.slowest )[ 2 ], "b" )
+
+        self.assertEqual( analysis.host_stats[ "slow.org" ].slow, 1 )
+        self.assertEqual( analysis.host_stats[ "( unknown )" ].count, 2 )
+
+        folded = dict( stack.rsplit( " ", 1 ) for stack in analysis.folded_stacks() )
+        self.assertEqual( folded[ "youtube;Processing url;Fetching Raw" ], "10000" )
+        self.assertEqual( folded[ "youtube;Processing url ( failed );Processing" ], "500" )
+
+        _, width, series = analysis.concurrency()
+        self.assertEqual( width, 1.0 )
+        self.assertAlmostEqual( max( series[ "Fetching Raw" ] ), 3.0 )
+        self.assertIn( "<svg", analysis.html() )
+        self.assertIn( "slow.org", analysis.text() )
+
+    def test_same_url_twice_at_once( self ):
+        first, second = url( "Processing url", 0.0, 5.0, 5.0, 6.0, "a" ), url( "Processing url", 1.0, 9.0, 9.0, 10.0, "a" )
+        _, analysis = self.analyze( first[ :2 ] + second[ :2 ] + first[ 2: ] + second[ 2: ] )
+
+        self.assertEqual( analysis.urls, 2 )
+        self.assertAlmostEqual( analysis.critical[ "Fetching Raw" ], 13.0 )
+        self.assertAlmostEqual( analysis.critical[ TraceAnalysis.OVERHEAD ], 0.0 )
+        self.assertEqual( set( stack.rsplit( " ", 1 )[ 0 ] for stack in analysis.folded_stacks() ),
+                          { "youtube;Processing url;Fetching Raw", "youtube;Processing url;Processing" } )
+
+    def test_tracer_exports( self ):
+        second = 1_000_000_000
+        start = 1_700_000_000 * second
+        a, b = hashlib.md5( b"a" ).hexdigest(), hashlib.md5( b"b" ).hexdigest()
+        spans = [ Span( "Fetching Raw", start, start + 3 * second, DONE, a, {"kind": "other", "host": "x.org"}, None, 2 ),
+                  Span( "Processing", start + 4 * second, start + 5 * second, FAIL, a, {"kind": "other"},
+                        "<class 'Exception'> No text", 3 ),
+                  Span( "Persist Processed", start + 5 * second, start + 6 * second, DONE, b, None, None, 4 ),
+                  Span( "Processing all events", start, start + 6 * second, DONE, None, None, None, 1 ) ]
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = pathlib.Path( directory )
+            exporter = JsonlExporter( path / "trace.jsonl" )
+            exporter.export( spans )
+            exporter.close()
+            exporter = BinaryExporter( path / "binary" )
+            exporter.export( spans )
+            exporter.close()
+
+            with open( path / "trace.jsonl" ) as lines:
+                _, jsonl = self.analyze( lines )
+            reader = TraceReader()
+            binary = TraceAnalysis().analyze( reader, reader.read_binary( path / "binary" ) )
+
+        for analysis in (jsonl, binary):
+            self.assertEqual( (analysis.spans, analysis.urls), (4, 2) )
+            self.assertAlmostEqual( analysis.critical[ "Fetching Raw" ], 3.0 )
+            self.assertAlmostEqual( analysis.critical[ TraceAnalysis.WAITING ], 1.0 )
+            self.assertEqual( analysis.host_stats[ "x.org" ].count, 1 )
+            self.assertEqual( analysis.operations[ "Processing" ].errors, 1 )
+            self.assertAlmostEqual( analysis.last - analysis.first, 6.0 )
+
+    def test_hosts_of_an_event_stream( self ):
+        with tempfile.TemporaryDirectory() as directory:
+            path = pathlib.Path( directory ) / "events.tsv"
+            path.write_text( "2022-06-08\t5\thttps://www.example.org/a?utm_source=x\nnot an event\n" )
+            hosts = load_hosts( path )
+        self.assertEqual( hosts, {hashlib.md5( b"https://www.example.org/a?utm_source=x" ).hexdigest(): "www.example.org"} )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+import array
+import asyncio
+import hashlib
+import json
+import pathlib
+import tempfile
+import unittest
+
+from roi_utils.logging import ExecutionContext
+from roi_utils.tracing import BinaryExporter, ChromeTraceExporter, DONE, FAIL, JsonlExporter, Tracer, WARN
+
+
+class ListExporter:
+
+    def __init__( self ):
+        self.spans = [ ]
+        self.closed = False
+
+    def export( self, spans ):
+        self.spans.extend( spans )
+
+    def close( self ):
+        self.closed = True
+
+
+def digest( i ):
+    return hashlib.md5( str( i ).encode() ).hexdigest()
+
+
+class TestTracer( unittest.TestCase ):
+
+    def setUp( self ):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path( self.directory.name )
+
+    def tearDown( self ):
+        ExecutionContext.install( None )
+        self.directory.cleanup()
+
+    def test_contexts_become_spans( self ):
+        exporter = ListExporter()
+        with Tracer( exporter ) as tracer:
+            ExecutionContext.install( tracer )
+            with ExecutionContext( "Fetching Raw", extra={"digest": digest( 1 ), "kind": "Web"} ):
+                pass
+            with ExecutionContext( "Processing", exc_suppress=True, exc_level="warn", extra={"digest": digest( 2 )} ):
+                raise Exception( "No text" )
+            with self.assertRaises( ValueError ):
+                with ExecutionContext( "Persist Processed" ):
+                    raise ValueError( "broken" )
+
+        self.assertTrue( exporter.closed )
+        fetched, processed, persisted = exporter.spans
+        self.assertEqual( (fetched.operation, fetched.step, fetched.digest), ("Fetching Raw", "DONE", digest( 1 )) )
+        self.assertEqual( fetched.attributes[ "kind" ], "Web" )
+        self.assertGreaterEqual( fetched.duration, 0 )
+        self.assertEqual( processed.status, WARN )
+        self.assertIn( "No text", processed.error )
+        self.assertEqual( persisted.status, FAIL )
+        self.assertIn( "broken", persisted.error )
+
+    def test_spans_nest_across_tasks( self ):
+        exporter = ListExporter()
+
+        async def fetch( i ):
+            with ExecutionContext( "Fetching Raw", extra={"digest": digest( i )} ):
+                await asyncio.sleep( 0 )
+
+        async def main():
+            with ExecutionContext( "Processing all events" ):
+                await asyncio.gather( *(asyncio.create_task( fetch( i ) ) for i in range( 3 )) )
+            with ExecutionContext( "Reprocessing archive" ):
+                pass
+
+        with Tracer( exporter ) as tracer:
+            ExecutionContext.install( tracer )
+            asyncio.run( main() )
+
+        *fetched, root, other = exporter.spans
+        self.assertEqual( (root.operation, root.parent, other.parent), ("Processing all events", 0, 0) )
+        self.assertEqual( { span.parent for span in fetched }, { root.span } )
+        self.assertEqual( len( { span.span for span in exporter.spans } ), 5 )
+
+    def test_sampling_keeps_or_drops_whole_digests( self ):
+        exporter = ListExporter()
+        with Tracer( exporter, sample_rate=0.25 ) as tracer:
+            for i in range( 2000 ):
+                for operation in ("Fetching Raw", "Processing"):
+                    if tracer.sampled( operation, digest( i ) ):
+                        tracer.record( operation, 0, 1, digest=digest( i ) )
+
+        kept = { span.digest for span in exporter.spans }
+        self.assertEqual( len( exporter.spans ), 2 * len( kept ) )
+        self.assertLess( abs( len( kept ) - 500 ), 100 )
+
+    def test_overrun_drops_the_oldest( self ):
+        exporter = ListExporter()
+        tracer = Tracer( exporter, capacity=16, interval=60 )
+        # the exporter thread only wakes on full batches, hold it off meanwhile
+        with tracer._lock:
+            for i in range( 40 ):
+                tracer.record( "Processing", i, i + 1 )
+        tracer.close()
+
+        self.assertEqual( tracer.dropped + len( exporter.spans ), 40 )
+        self.assertEqual( exporter.spans[ -1 ].finish - exporter.spans[ -1 ].start, 1 )
+        starts = [ span.start for span in exporter.spans ]
+        self.assertEqual( starts, sorted( starts ) )
+
+    def test_failed_spans_are_kept_unsampled( self ):
+        exporter = ListExporter()
+        with Tracer( exporter, sample_rate=0.0, operations={ "Fetching Raw", "Processing" } ) as tracer:
+            ExecutionContext.install( tracer )
+            with ExecutionContext( "Fetching Raw", extra={"digest": digest( 1 )} ):
+                pass
+            with ExecutionContext( "Fetching Raw", exc_suppress=True, exc_level="warn", extra={"digest": digest( 2 )} ):
+                raise Exception( "Not found" )
+            with ExecutionContext( "Processing", exc_suppress=True, extra={"digest": digest( 3 )} ):
+                raise ValueError( "broken" )
+            # not a traced operation
+            with ExecutionContext( "Persist Processed", exc_suppress=True ):
+                raise ValueError( "broken" )
+
+        self.assertEqual( [ (span.operation, span.status, span.digest) for span in exporter.spans ],
+                          [ ("Fetching Raw", WARN, digest( 2 )), ("Processing", FAIL, digest( 3 )) ] )
+        self.assertNotIn( DONE, [ span.status for span in exporter.spans ] )
+
+    def test_a_slot_being_written_is_not_read( self ):
+        exporter = ListExporter()
+        tracer = Tracer( exporter, capacity=16, interval=60 )
+        # drained by hand from here on
+        tracer.close()
+        for i in range( 16 ):
+            tracer.record( "Processing", i, i + 1 )
+
+        class Preempted( array.array ):
+            """The writer of the next lap, preempted by a drain before its last field and its sequence."""
+
+            def __setitem__( self, slot, value ):
+                super().__setitem__( slot, value )
+                if not drained:
+                    drained.append( True )
+                    tracer.flush()
+
+        drained = [ ]
+        tracer._parent = Preempted( "q", tracer._parent )
+        tracer.record( "Processing", 100, 101 )
+        self.assertEqual( (exporter.spans, tracer.dropped), ([ ], 0) )
+
+        tracer.flush()
+        self.assertEqual( tracer.dropped, 1 )
+        self.assertEqual( [ span.start - tracer._offset for span in exporter.spans ], list( range( 1, 16 ) ) + [ 100 ] )
+        self.assertTrue( all( span.duration == 1 for span in exporter.spans ) )
+
+    def test_exporters( self ):
+        spans_path = self.path / "trace.jsonl"
+        chrome_path = self.path / "trace.json"
+        for exporter in (JsonlExporter( spans_path ), ChromeTraceExporter( chrome_path ), BinaryExporter( self.path / "bin" )):
+            with Tracer( exporter ) as tracer:
+                tracer.record( "Fetching Raw", 1000, 3000, digest=digest( 1 ), attributes={"kind": "Web"} )
+                tracer.record( "Processing", 3000, 4000, FAIL, error="boom" )
+
+        first, second = [ json.loads( line ) for line in spans_path.read_text().splitlines() ]
+        self.assertEqual( (first[ "operation" ], first[ "duration" ], first[ "kind" ]), ("Fetching Raw", 2000, "Web") )
+        self.assertEqual( (second[ "step" ], second[ "error" ]), ("FAIL", "boom") )
+
+        events = json.loads( chrome_path.read_text() )
+        self.assertEqual( [ (event[ "ph" ], event[ "dur" ]) for event in events ], [ ("X", 2.0), ("X", 1.0) ] )
+
+        first, second = BinaryExporter.read( next( (self.path / "bin").glob( "*.bin" ) ) )
+        self.assertEqual( (first.digest, first.attributes, first.duration), (digest( 1 ), {"kind": "Web"}, 2000) )
+        self.assertEqual( (second.digest, second.error, second.status), (None, "boom", FAIL) )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import pathlib
+import unittest
+
+from lxml.etree import XPath
+
+from roi_web.parsing import HTML
+from roi_web.retraf import xpaths
+from roi_web.retraf.attributes import AttributeSelector, MergedSelector
+from roi_web.retraf.metaxpaths import author_discard_xpaths
+
+DATA = pathlib.Path( __file__ ).parent / "data"
+
+PAGE = b"""<html><body>
+<div class="footer share">x<p class="Related">related</p><span class="caption">c</span>tail</div>
+<div id="paywall">pay</div><p class="teaser">t</p><p id="Teaser-1">t</p>
+<div class="comments-list"><p>comment</p><div id="respond">r</div></div><div id="Comment-2">c</div>
+<main id="ArticleBody"><div class="ad x ad y"><p class="a ad b" style="display:none">z</p></div>
+<section class="article post" id="primary-x"><p aria-hidden="true" data-lp-replacement-content="">q</p>
+<p>main text</p><nav role="Navigation">n</nav><div class="post-content">body</div></section></main>
+<div class="FullText"><div class="text">u</div><div class="content">v</div></div>
+<article class="story-body"><div class="hide-print message">m</div></article>
+</body></html>"""
+
+LISTS = [ xpaths.BODY_XPATH, xpaths.COMMENTS_XPATH, xpaths.REMOVE_COMMENTS_XPATH, xpaths.PAYWALL_DISCARD_XPATH,
+          xpaths.OVERALL_DISCARD_XPATH, xpaths.TEASER_DISCARD_XPATH, xpaths.PRECISION_DISCARD_XPATH,
+          xpaths.DISCARD_IMAGE_ELEMENTS, xpaths.COMMENTS_DISCARD_XPATH, author_discard_xpaths ]
+
+
+class TestAttributeSelector( unittest.TestCase ):
+
+    def setUp( self ):
+        pages = [ PAGE ] + [ path.read_bytes() for path in sorted( DATA.glob( "*.html" ) ) ]
+        trees = [ HTML.htmlElement( page ) for page in pages ]
+        # relative expressions also run on subtrees
+        self.contexts = trees + [ tree.find( ".//main" ) for tree in trees if tree.find( ".//main" ) is not None ]
+
+    def test_selectors_match_xpath( self ):
+        translated = 0
+        for nodelist in LISTS:
+            for expression in nodelist:
+                selector = AttributeSelector.parse( expression )
+                if selector is None:
+                    continue
+                translated += 1
+                for context in self.contexts:
+                    with self.subTest( expression=expression[ :60 ] ):
+                        self.assertEqual( selector( context ), XPath( expression )( context ) )
+        self.assertGreater( translated, 10 )
+
+    def test_merged_selectors_match_the_xpath_union( self ):
+        for nodelist in LISTS:
+            merged = MergedSelector.parse( nodelist )
+            if merged is None:
+                continue
+            union = XPath( " | ".join( "(" + expression.strip() + ")" for expression in nodelist ) )
+            for context in self.contexts:
+                self.assertEqual( merged( context ), union( context ) )
+
+    def test_selectors_find_matches( self ):
+        tree = HTML.htmlElement( PAGE )
+        found = MergedSelector.parse( xpaths.OVERALL_DISCARD_XPATH )( tree )
+        self.assertIn( "footer share", [ element.get( "class" ) for element in found ] )
+        self.assertIn( "a ad b", [ element.get( "class" ) for element in found ] )
+
+    def test_other_expressions_are_left_to_xpath( self ):
+        self.assertIsNone( AttributeSelector.parse( "(.//article)[1]" ) )
+        self.assertIsNone( AttributeSelector.parse( ".//cite|.//quote" ) )
+        self.assertIsNone( AttributeSelector.parse( ".//*[@class='a' and @id='b']" ) )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+from roi_web import WebArchive, UrlEvent, NetworkArchive
+from roi_web.codec import ArchiveCodec, HAS_ZSTD
+
+
+def archive( body ):
+    url = UrlEvent( raw="https://example.com/a", quality="", date="2022-09-01", scheme="https",
+                    netloc="example.com", path="/a", query="", hostname="example.com" )
+    content = NetworkArchive( host="example.com", request_headers={"Accept": "*/*"}, request_method="GET",
+                              request_real_url=url.raw, request_url=url.raw, response_charset="utf-8",
+                              response_content=body, response_content_type="text/html",
+                              response_headers={"Content-Type": "text/html"}, response_real_url=url.raw,
+                              response_status=200, response_url=url.raw )
+    return WebArchive( url=url, content=content )
+
+
+class TestArchiveCodec( unittest.TestCase ):
+
+    def test_round_trip( self ):
+        original = archive( bytes( range( 256 ) ) * 10 )
+        compressions = [ ArchiveCodec.NONE, ArchiveCodec.GZIP ] + ([ ArchiveCodec.ZSTD ] if HAS_ZSTD else [ ])
+
+        for compression in compressions:
+            frame = ArchiveCodec( compression ).encode( original )
+            self.assertEqual( ArchiveCodec.decode( frame ), original )
+            self.assertEqual( ArchiveCodec.decode( frame ).json(), original.json() )
+
+    def test_view_reads_metadata_without_the_body( self ):
+        frame = ArchiveCodec( ArchiveCodec.GZIP ).encode( archive( b"<html></html>" ) )
+        # a corrupted body only fails once it is read
+        frame = frame[ :-4 ] + b"\0\0\0\0"
+
+        view = ArchiveCodec.view( frame )
+        self.assertEqual( view.url.hostname, "example.com" )
+        self.assertEqual( view.status, 200 )
+        self.assertEqual( view.content_type, "text/html" )
+        with self.assertRaises( Exception ):
+            view.body
+
+    def test_rejects_unknown_compressions( self ):
+        for compression in (3, -1, "gzip", None):
+            with self.subTest( compression=compression ):
+                with self.assertRaises( ValueError ):
+                    ArchiveCodec( compression )
+
+    def test_rejects_truncated_frames( self ):
+        frame = ArchiveCodec().encode( archive( b"body" ) )
+        with self.assertRaises( ValueError ):
+            ArchiveCodec.view( frame[ :-1 ] )
+        for length in (0, 1, ArchiveCodec.HEADER.size - 1):
+            with self.subTest( length=length ):
+                with self.assertRaises( ValueError ):
+                    ArchiveCodec.view( frame[ :length ] )
+
+
+if __name__ == '__main__':
+    unittest.main()
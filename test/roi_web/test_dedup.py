@@ -0,0 +1,92 @@
+import asyncio
+import random
+import tempfile
+import unittest
+
+from roi_web import NearDuplicateIndex, PageContent, Processer
+
+random.seed( 7 )
+VOCABULARY = [ "".join( random.choice( "abcdefghijklmnopqrstuvwxyz" ) for _ in range( random.randint( 5, 10 ) ) )
+               for _ in range( 5000 ) ]
+
+
+def article( words=400 ):
+    return " ".join( random.choice( VOCABULARY ) for _ in range( words ) )
+
+
+def page( name, text ):
+    return PageContent( url=f"https://example.com/{name}", visit_date="", visit_kind="", text=text )
+
+
+class ListStore:
+
+    def __init__( self ):
+        self.pages = [ ]
+
+    def put( self, content ):
+        self.pages.append( content )
+
+
+class FailingStore:
+
+    def put( self, content ):
+        raise OSError( "disk full" )
+
+
+class TestNearDuplicateIndex( unittest.TestCase ):
+
+    def setUp( self ):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = self.directory.name
+
+    def tearDown( self ):
+        self.directory.cleanup()
+
+    def test_mirrors_are_found_and_survive_reopen( self ):
+        original, other = article(), article()
+        mirror = "Share on Facebook " + original.replace( original.split()[ 10 ], "changed", 1 ) + " Copyright"
+
+        with NearDuplicateIndex( self.path ) as dedup:
+            self.assertIsNone( dedup.add( page( "original", original ) ) )
+            self.assertIsNone( dedup.add( page( "other", other ) ) )
+            self.assertEqual( dedup.add( page( "amp", mirror ) ), page( "original", "" ).digest() )
+            # indexing the same page again is not a duplicate of itself
+            self.assertIsNone( dedup.add( page( "original", original ) ) )
+
+        with NearDuplicateIndex( self.path ) as dedup:
+            self.assertEqual( len( dedup ), 2 )
+            self.assertIn( page( "other", "" ).digest(), dedup )
+            self.assertEqual( dedup.duplicates( page( "other", "" ).digest() ), [ ] )
+            found = dedup.near( dedup.fingerprint( mirror ) )
+            self.assertEqual( [ digest for digest, _ in found ], [ page( "original", "" ).digest() ] )
+
+    def test_short_texts_are_not_indexed( self ):
+        with NearDuplicateIndex( self.path ) as dedup:
+            self.assertIsNone( dedup.add( page( "short", "too short to tell" ) ) )
+            self.assertIsNone( dedup.add( page( "again", "too short to tell" ) ) )
+            self.assertEqual( len( dedup ), 0 )
+
+    def test_persist_skips_near_duplicates( self ):
+        store, text = ListStore(), article()
+        with NearDuplicateIndex( self.path ) as dedup:
+            processer = Processer( fetcher=None, store=store, dedup=dedup )
+            asyncio.run( processer.persist( page( "original", text ) ) )
+            asyncio.run( processer.persist( page( "mirror", text + " Read more" ) ) )
+
+        self.assertEqual( [ content.url for content in store.pages ], [ "https://example.com/original" ] )
+
+    def test_pages_failing_to_persist_are_not_indexed( self ):
+        store, text = ListStore(), article()
+        with NearDuplicateIndex( self.path ) as dedup:
+            with self.assertRaises( OSError ):
+                asyncio.run( Processer( fetcher=None, store=FailingStore(), dedup=dedup ).persist( page( "original", text ) ) )
+            self.assertEqual( len( dedup ), 0 )
+
+            asyncio.run( Processer( fetcher=None, store=store, dedup=dedup ).persist( page( "mirror", text + " Read more" ) ) )
+            self.assertIn( page( "mirror", "" ).digest(), dedup )
+
+        self.assertEqual( [ content.url for content in store.pages ], [ "https://example.com/mirror" ] )
+
+
+if __name__ == '__main__':
+    unittest.main()
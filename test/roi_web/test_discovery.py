@@ -0,0 +1,124 @@
+import gzip
+import hashlib
+import socket
+import unittest
+from datetime import datetime
+
+import aiohttp
+from aiohttp import web
+from aiohttp.abc import AbstractResolver
+
+from roi_web.discovery import Discovery
+from roi_web.processing import Fetcher
+
+HOST = "example.com"
+
+
+class LocalResolver( AbstractResolver ):
+    """Sends every host to the fixture server, courlan rejects localhost links."""
+
+    async def resolve( self, host, port=0, family=socket.AF_INET ):
+        return [ {"hostname": host, "host": "127.0.0.1", "port": port, "family": socket.AF_INET, "proto": 0,
+                  "flags": socket.AI_NUMERICHOST} ]
+
+    async def close( self ):
+        pass
+
+
+def urlset( base, paths, lastmod="2024-01-01" ):
+    locs = "".join( f"<url><loc>{base}{path}</loc><lastmod>{lastmod}</lastmod></url>" for path in paths )
+    return f'<?xml version="1.0" encoding="UTF-8"?><urlset>{locs}</urlset>'
+
+
+def sitemapindex( base, paths ):
+    locs = "".join( f"<sitemap><loc>{base}{path}</loc></sitemap>" for path in paths )
+    return f'<?xml version="1.0" encoding="UTF-8"?><sitemapindex>{locs}</sitemapindex>'
+
+
+class TestDiscovery( unittest.IsolatedAsyncioTestCase ):
+
+    async def asyncSetUp( self ):
+        self.requests = [ ]
+        app = web.Application( middlewares=[ self.record ] )
+        app.router.add_get( "/{name:.*}", self.serve )
+        self.runner = web.AppRunner( app )
+        await self.runner.setup()
+        site = web.TCPSite( self.runner, "127.0.0.1", 0 )
+        await site.start()
+        port = self.runner.addresses[ 0 ][ 1 ]
+        self.base = f"http://{HOST}:{port}"
+
+        connector = aiohttp.TCPConnector( resolver=LocalResolver() )
+        self.fetcher = Fetcher( session=aiohttp.ClientSession( connector=connector ) )
+        self.files = { }
+
+    async def asyncTearDown( self ):
+        await self.fetcher.session.close()
+        await self.runner.cleanup()
+
+    @web.middleware
+    async def record( self, request, handler ):
+        self.requests.append( request.path )
+        return await handler( request )
+
+    async def serve( self, request ):
+        body = self.files.get( request.path )
+        if body is None:
+            raise web.HTTPNotFound()
+        return web.Response( body=body if isinstance( body, bytes ) else body.encode() )
+
+    async def collect( self, links ):
+        return [ link async for link in links ]
+
+    async def test_sitemap_index_with_gzip_children( self ):
+        children = [ f"/sitemap-{i}.xml.gz" for i in range( 5 ) ]
+        self.files[ "/robots.txt" ] = f"User-agent: *\nSitemap: {self.base}/sitemap-index.xml\n"
+        self.files[ "/sitemap-index.xml" ] = sitemapindex( self.base, children )
+        for i, child in enumerate( children ):
+            pages = [ f"/news/article-{i}-{j}.html" for j in range( 3 ) ]
+            self.files[ child ] = gzip.compress( urlset( self.base, pages ).encode() )
+
+        links = await self.collect( Discovery( self.fetcher, concurrency=3 ).sitemap_links( self.base ) )
+
+        self.assertEqual( sorted( links ), sorted( f"{self.base}/news/article-{i}-{j}.html"
+                                                   for i in range( 5 ) for j in range( 3 ) ) )
+        self.assertEqual( self.requests[ :3 ], [ "/sitemap.xml", "/robots.txt", "/sitemap-index.xml" ] )
+
+    async def test_feeds_announced_by_a_page( self ):
+        self.files[ "/" ] = f'<html><head><link rel="alternate" type="application/rss+xml" href="{self.base}/feed.xml">' \
+                            f'</head><body></body></html>'
+        items = "".join( f"<item><link>{self.base}/posts/entry-{i}</link></item>" for i in range( 4 ) )
+        self.files[ "/feed.xml" ] = f'<?xml version="1.0"?><rss><channel>{items}</channel></rss>'
+
+        links = await self.collect( Discovery( self.fetcher ).feed_links( self.base + "/" ) )
+
+        self.assertEqual( sorted( links ), [ f"{self.base}/posts/entry-{i}" for i in range( 4 ) ] )
+
+    async def test_processed_links_are_skipped_unless_modified( self ):
+        self.files[ "/sitemap.xml" ] = sitemapindex( self.base, [ "/old.xml", "/new.xml" ] )
+        self.files[ "/old.xml" ] = urlset( self.base, [ "/news/old-one.html", "/news/old-two.html" ], "2024-01-01" )
+        self.files[ "/new.xml" ] = urlset( self.base, [ "/news/new-one.html" ], "2024-03-01T08:00:00+00:00" )
+        store = { hashlib.md5( f"{self.base}{path}".encode() ).hexdigest()
+                  for path in ("/news/old-one.html", "/news/new-one.html") }
+
+        links = await self.collect( Discovery( self.fetcher ).sitemap_links( self.base, store=store,
+                                                                             since=datetime( 2024, 2, 1 ) ) )
+
+        self.assertEqual( sorted( links ), [ f"{self.base}/news/new-one.html", f"{self.base}/news/old-two.html" ] )
+
+    async def test_stops_early_without_waiting_for_the_rest( self ):
+        children = [ f"/sitemap-{i}.xml" for i in range( 20 ) ]
+        self.files[ "/sitemap.xml" ] = sitemapindex( self.base, children )
+        for i, child in enumerate( children ):
+            self.files[ child ] = urlset( self.base, [ f"/news/article-{i}.html" ] )
+
+        links = Discovery( self.fetcher, concurrency=2 ).sitemap_links( self.base )
+        first = await links.__anext__()
+        await links.aclose()
+
+        self.assertTrue( first.startswith( self.base + "/news/article-" ) )
+        self.assertLess( len( self.requests ), 10 )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import signal
+import time
+import unittest
+from unittest import mock
+
+from roi_web import extraction
+from roi_web.extraction import ExtractionTimeout, HAS_SIGNAL, _init_worker, _structure_limited
+
+
+def swallowing_extractor( url, content_type, content ):
+    """CPU bound, and catching every Exception like the extractors do."""
+    while True:
+        try:
+            sum( range( 100_000 ) )
+        except Exception:
+            pass
+
+
+@unittest.skipUnless( HAS_SIGNAL, "needs SIGPROF" )
+class TestCpuLimit( unittest.TestCase ):
+
+    def setUp( self ):
+        self.handler = signal.getsignal( signal.SIGPROF )
+        _init_worker()
+
+    def tearDown( self ):
+        signal.signal( signal.SIGPROF, self.handler )
+
+    def test_the_limit_is_enforced_past_except_exception( self ):
+        start = time.process_time()
+        with mock.patch.object( extraction, "structure", swallowing_extractor ):
+            with self.assertRaises( ExtractionTimeout ):
+                _structure_limited( None, "text/html", b"", 0.2 )
+        self.assertLess( time.process_time() - start, 2.0 )
+        # the timer is off again
+        self.assertEqual( signal.getitimer( signal.ITIMER_PROF ), (0.0, 0.0) )
+
+    def test_documents_under_the_limit( self ):
+        with mock.patch.object( extraction, "structure", lambda *args: "content" ):
+            self.assertEqual( _structure_limited( None, "text/html", b"", 0.2 ), "content" )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,185 @@
+import gzip
+import io
+from datetime import datetime, timedelta, timezone
+import pathlib
+import unittest
+from unittest import mock
+
+from roi_web.parsing import HTML
+from roi_web.retraf.batch import batch_extract
+from roi_web.retraf.core import bare_extraction
+from roi_web.retraf.sitemaps import iter_sitemap, lastmod_datetime
+from roi_web.retraf.xml import TextWriter
+from roi_web.retraf.readability_lxml import Document, TextStats, text_length
+
+DATA = pathlib.Path( __file__ ).parent / "data"
+
+PAGES = [
+    b"<html><body><p>too short for the extraction</p></body></html>",
+    b"<html><head><title>T</title></head><body><article><h1>x</h1><p>" + b"word " * 300 + b"</p></article>"
+    b"<div class='comments'><p>a comment here</p></div></body></html>",
+    b"<html><body><div>" + b"<a href='x'>link</a> " * 50 + b"</div><div><p>text text</p></div></body></html>",
+]
+
+
+class TestCopyOnDemand( unittest.TestCase ):
+
+    def assertSameExtraction( self, page, **kwargs ):
+        eager = bare_extraction( HTML.htmlElement( page ), **kwargs )
+        lazy = bare_extraction( HTML.htmlElement( page ), reparse=lambda: HTML.htmlElement( page ), **kwargs )
+        self.assertEqual( eager, lazy )
+
+    def test_lazy_backups_extract_the_same( self ):
+        pages = PAGES + [ path.read_bytes() for path in sorted( DATA.glob( "*.html" ) ) ]
+
+        for page in pages:
+            for no_fallback in (False, True):
+                with self.subTest( page=page[ :40 ], no_fallback=no_fallback ):
+                    self.assertSameExtraction( page, no_fallback=no_fallback, include_formatting=True,
+                                               include_links=True, include_tables=False )
+
+
+class TestFastPath( unittest.TestCase ):
+
+    ARTICLE = b"<html><body><nav><a href='/'>home</a></nav><article>" + \
+              b"".join( b"<p>" + b"A paragraph long enough to count as content. " * 10 + b"</p>" for _ in range( 8 ) ) + \
+              b"</article></body></html>"
+
+    def extract( self, page, fast_path ):
+        return bare_extraction( HTML.htmlElement( page ), include_formatting=True, include_links=True,
+                                include_tables=False, fast_path=fast_path )
+
+    def test_confident_extraction_skips_the_fallbacks( self ):
+        fast = self.extract( self.ARTICLE, fast_path=True )
+        compared = self.extract( self.ARTICLE, fast_path=False )
+
+        self.assertEqual( fast[ "extraction_path" ], "fast" )
+        self.assertEqual( compared[ "extraction_path" ], "fallback" )
+        self.assertEqual( fast[ "text" ], compared[ "text" ] )
+
+    def test_short_pages_still_fall_back( self ):
+        self.assertEqual( self.extract( PAGES[ 0 ], fast_path=True )[ "extraction_path" ], "baseline" )
+
+
+class TestBatchExtract( unittest.TestCase ):
+
+    def setUp( self ):
+        # an empty document makes the parser raise, the gzipped one is read like the plain one
+        self.documents = [ PAGES[ 1 ], b"", PAGES[ 0 ], gzip.compress( PAGES[ 1 ] ), PAGES[ 2 ].decode() ]
+        self.expected = [ bare_extraction( HTML.htmlElement( PAGES[ 1 ] ) ), None, bare_extraction( HTML.htmlElement( PAGES[ 0 ] ) ),
+                          bare_extraction( HTML.htmlElement( PAGES[ 1 ] ) ), bare_extraction( HTML.htmlElement( PAGES[ 2 ] ) ) ]
+
+    def assertResults( self, results ):
+        self.assertEqual( [ result.document for result in results ], self.expected )
+        self.assertEqual( [ result.error is not None for result in results ], [ False, True, False, False, False ] )
+        self.assertTrue( results[ 1 ].error.startswith( "ParserError" ) )
+
+    def test_in_process_keeps_the_order_and_the_errors( self ):
+        results = list( batch_extract( iter( self.documents ), workers=0 ) )
+        self.assertEqual( [ result.index for result in results ], list( range( 5 ) ) )
+        self.assertResults( results )
+
+    def test_worker_processes( self ):
+        ordered = list( batch_extract( iter( self.documents ), workers=2, in_flight=2 ) )
+        self.assertEqual( [ result.index for result in ordered ], list( range( 5 ) ) )
+        self.assertResults( ordered )
+
+        completed = list( batch_extract( iter( self.documents ), workers=2, ordered=False ) )
+        self.assertResults( sorted( completed, key=lambda result: result.index ) )
+
+
+class TestTextStats( unittest.TestCase ):
+
+    def test_matches_the_subtree_walks( self ):
+        pages = PAGES + [ b"<div>a <!-- c --> b,<b>c</b>d, <a>e f</a> <?pi x?>g</div>" ]
+        pages += [ path.read_bytes() for path in sorted( DATA.glob( "*.html" ) ) ]
+
+        for page in pages:
+            document = Document( HTML.htmlElement( page ) )
+            stats = TextStats( document.doc )
+            for elem in document.doc.iter( "*" ):
+                with self.subTest( page=page[ :40 ], tag=elem.tag ):
+                    self.assertEqual( stats.length( elem ), text_length( elem ) )
+                    self.assertEqual( stats.comma_count( elem ) + 1, len( elem.text_content().strip().split( "," ) ) )
+                    self.assertAlmostEqual( stats.link_density( elem ), document.get_link_density( elem ) )
+
+
+class TestTextWriter( unittest.TestCase ):
+
+    def test_streamed_text_is_the_returned_text( self ):
+        pages = PAGES + [ b"<html><body><article><p>a &amp;amp; b\r</p><p>\rx\r\ny &#10; z</p>" + b"<p>more text</p>" * 50 +
+                          b"<list><item>i</item></list></article></body></html>" ]
+        for page in pages:
+            for chunk_size in (1, 7, TextWriter.CHUNK_SIZE):
+                with self.subTest( page=page[ :40 ], chunk_size=chunk_size ), \
+                        mock.patch.object( TextWriter, "CHUNK_SIZE", chunk_size ):
+                    sink = io.StringIO()
+                    streamed = bare_extraction( HTML.htmlElement( page ), no_fallback=True, text_sink=sink )
+                    returned = bare_extraction( HTML.htmlElement( page ), no_fallback=True )
+                    self.assertIsNone( streamed[ "text" ] )
+                    self.assertEqual( sink.getvalue(), returned[ "text" ] )
+
+    def test_long_lines_are_split_once_a_chunk( self ):
+        writer = TextWriter()
+        with mock.patch.object( TextWriter, "CHUNK_SIZE", 10 ), \
+                mock.patch.object( TextWriter, "_flush", autospec=True, side_effect=TextWriter._flush ) as flush:
+            for _ in range( 1000 ):
+                writer.write( "x" )
+            self.assertEqual( flush.call_count, 100 )
+            self.assertEqual( writer.getvalue(), "x" * 1000 )
+
+    def test_getvalue_empties_the_buffer( self ):
+        writer = TextWriter()
+        writer.write( "\n first  line \n\n" )
+        self.assertEqual( writer.getvalue(), "first line" )
+        writer.write( "second" )
+        self.assertEqual( writer.getvalue(), "second" )
+
+
+class TestSitemapParser( unittest.TestCase ):
+    SITEMAP = ( '<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" xmlns:xhtml="http://www.w3.org/1999/xhtml"'
+                ' xmlns:image="http://www.google.com/schemas/sitemap-image/1.1">\n' +
+                "".join( f"<url><loc> https://example.com/{i} </loc><lastmod>2024-01-0{i % 9 + 1}</lastmod>"
+                         f"<image:image><image:loc>https://example.com/{i}.jpg</image:loc></image:image>"
+                         f'<xhtml:link rel="alternate" hreflang="de" href="https://example.com/de/{i}"/></url>\n'
+                         for i in range( 100 ) ) +
+                "</urlset>" ).encode()
+
+    def test_gzip_in_any_chunks( self ):
+        expected = [ entry for i in range( 100 ) for entry in
+                     [ (f"https://example.com/{i}", f"2024-01-0{i % 9 + 1}", None),
+                       (f"https://example.com/de/{i}", f"2024-01-0{i % 9 + 1}", "de") ] ]
+        payload = gzip.compress( self.SITEMAP )
+        for size in (1, 13, len( payload )):
+            with self.subTest( size=size ):
+                chunks = (payload[ i:i + size ] for i in range( 0, len( payload ), size ))
+                self.assertEqual( list( iter_sitemap( chunks ) ), expected )
+
+    def test_text_sitemaps( self ):
+        payload = b"\n".join( f"https://example.com/{i}".encode() for i in range( 50 ) )
+        chunks = (payload[ i:i + 7 ] for i in range( 0, len( payload ), 7 ))
+        self.assertEqual( [ loc for loc, _, _ in iter_sitemap( chunks ) ], [ f"https://example.com/{i}" for i in range( 50 ) ] )
+
+    def test_lastmod_w3c_datetimes( self ):
+        utc, paris = timezone.utc, timezone( timedelta( hours=1 ) )
+        cases = { "2024": datetime( 2024, 1, 1, tzinfo=utc ),
+                  "2024-03": datetime( 2024, 3, 1, tzinfo=utc ),
+                  " 2024-03-05\n": datetime( 2024, 3, 5, tzinfo=utc ),
+                  "2024-03-05T10:20Z": datetime( 2024, 3, 5, 10, 20, tzinfo=utc ),
+                  "2024-03-05T10:20:30z": datetime( 2024, 3, 5, 10, 20, 30, tzinfo=utc ),
+                  "2024-03-05T10:20:30.5+01:00": datetime( 2024, 3, 5, 10, 20, 30, 500000, tzinfo=paris ),
+                  "2024-03-05T10:20:30-0130": datetime( 2024, 3, 5, 10, 20, 30, tzinfo=timezone( -timedelta( minutes=90 ) ) ),
+                  "2024-03-05 10:20:30": datetime( 2024, 3, 5, 10, 20, 30, tzinfo=utc ) }
+        for lastmod, expected in cases.items():
+            with self.subTest( lastmod=lastmod ):
+                self.assertEqual( lastmod_datetime( lastmod ), expected )
+                self.assertIsNotNone( lastmod_datetime( lastmod ).tzinfo )
+
+        for invalid in (None, "", "yesterday", "2024-13", "2024-02-30", "24-03-05", "2024-03-05T25:00Z"):
+            with self.subTest( lastmod=invalid ):
+                self.assertIsNone( lastmod_datetime( invalid ) )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,211 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from roi_web import scheduling
+from roi_web.scheduling import HostScheduler, Throttled
+
+
+class FakeClock:
+    """``time`` for the scheduler: perf_counter, monotonic and time all read ``now``, which only the test moves."""
+
+    def __init__( self, now=1000.0 ):
+        self.now = now
+
+    def perf_counter( self ):
+        return self.now
+
+    def monotonic( self ):
+        return self.now
+
+    def time( self ):
+        return self.now
+
+
+def response( status=200, headers=None ):
+    return SimpleNamespace( response_status=status, response_headers=headers or { } )
+
+
+async def settle():
+    for _ in range( 5 ):
+        await asyncio.sleep( 0 )
+
+
+class TestHostScheduler( unittest.TestCase ):
+
+    def setUp( self ):
+        self.clock = FakeClock()
+        patcher = mock.patch.object( scheduling, "time", self.clock )
+        patcher.start()
+        self.addCleanup( patcher.stop )
+
+    def fetch( self, elapsed, status=200, headers=None ):
+        async def fetch():
+            self.clock.now += elapsed
+            return response( status, headers )
+
+        return fetch
+
+    def test_additive_increase_on_fast_successes( self ):
+        scheduler = HostScheduler( initial=2, maximum=4 )
+
+        async def run():
+            limits = [ ]
+            for _ in range( 6 ):
+                await scheduler.submit( "a.org", self.fetch( 0.1 ) )
+                limits.append( round( scheduler.hosts[ "a.org" ].limit, 3 ) )
+            return limits
+
+        limits = asyncio.run( run() )
+        self.assertEqual( limits[ :3 ], [ 2.5, 2.9, 3.245 ] )
+        self.assertEqual( limits[ -1 ], 4 )
+
+    def test_multiplicative_decrease_once_per_window( self ):
+        scheduler = HostScheduler( initial=8, minimum=1, latency_target=10.0, decrease=0.5 )
+
+        async def run():
+            await scheduler.submit( "a.org", self.fetch( 20.0 ) )
+            first = scheduler.hosts[ "a.org" ].limit
+            # still within the window, the smoothed latency
+            await scheduler.submit( "a.org", self.fetch( 0.0, status=500 ) )
+            second = scheduler.hosts[ "a.org" ].limit
+            self.clock.now += 10.0
+            await scheduler.submit( "a.org", self.fetch( 0.0, status=500 ) )
+            return first, second, scheduler.hosts[ "a.org" ].limit
+
+        self.assertEqual( asyncio.run( run() ), (4, 4, 2) )
+
+        async def floor():
+            for _ in range( 5 ):
+                self.clock.now += 100.0
+                await scheduler.submit( "a.org", self.fetch( 0.0, status=500 ) )
+            return scheduler.hosts[ "a.org" ].limit
+
+        self.assertEqual( asyncio.run( floor() ), 1 )
+
+    def test_retry_after_blocks_the_host( self ):
+        scheduler = HostScheduler( initial=4, minimum=1 )
+        responses = [ response( 429, {"Retry-After": "120"} ), response( 200 ) ]
+        calls = [ ]
+
+        async def fetch():
+            calls.append( self.clock.now )
+            return responses[ len( calls ) - 1 ]
+
+        async def run():
+            task = asyncio.create_task( scheduler.submit( "a.org", fetch ) )
+            await settle()
+            state = scheduler.hosts[ "a.org" ]
+            blocked = (len( calls ), state.blocked_until, state.limit, task.done())
+
+            # the other hosts go on meanwhile
+            await scheduler.submit( "b.org", self.fetch( 0.0 ) )
+
+            self.clock.now += 119.0
+            scheduler._dispatch()
+            await settle()
+            still = task.done()
+
+            self.clock.now += 1.0
+            scheduler._dispatch()
+            return blocked, still, (await task).response_status
+
+        blocked, still, status = asyncio.run( run() )
+        self.assertEqual( blocked, (1, 1120.0, 1, False) )
+        self.assertFalse( still )
+        self.assertEqual( (status, calls), (200, [ 1000.0, 1120.0 ]) )
+
+    def test_exponential_backoff_then_throttled( self ):
+        scheduler = HostScheduler( retries=2 )
+
+        async def run():
+            task = asyncio.create_task( scheduler.submit( "a.org", self.fetch( 0.0, status=503 ) ) )
+            delays = [ ]
+            for _ in range( 2 ):
+                await settle()
+                state = scheduler.hosts[ "a.org" ]
+                delays.append( state.blocked_until - self.clock.now )
+                self.clock.now = state.blocked_until
+                scheduler._dispatch()
+            with self.assertRaises( Throttled ):
+                await task
+
+            return delays
+
+        self.assertEqual( asyncio.run( run() ), [ 2.0, 4.0 ] )
+
+    def test_retry_after_dates( self ):
+        self.clock.now = 1_700_000_000.0
+        # 2023-11-14 22:13:20 GMT
+        self.assertEqual( HostScheduler.retry_after( {"retry-after": "Tue, 14 Nov 2023 22:14:20 GMT"} ), 60.0 )
+        self.assertEqual( HostScheduler.retry_after( {"Retry-After": "Tue, 14 Nov 2023 22:13:00 GMT"} ), 0.0 )
+        self.assertEqual( HostScheduler.retry_after( {"Retry-After": "Wed, 15 Nov 2023 00:13:20 GMT"} ), 300.0 )
+        self.assertEqual( HostScheduler.retry_after( {"Retry-After": "-5"} ), 0.0 )
+        self.assertIsNone( HostScheduler.retry_after( {"Retry-After": "soon"} ) )
+        self.assertIsNone( HostScheduler.retry_after( { } ) )
+
+    def test_per_host_and_global_caps( self ):
+        scheduler = HostScheduler( max_in_flight=3, initial=2 )
+        gates = { }
+
+        def gated( key ):
+            async def fetch():
+                gates[ key ] = asyncio.Event()
+                await gates[ key ].wait()
+                return response()
+
+            return fetch
+
+        async def run():
+            tasks = [ asyncio.create_task( scheduler.submit( "a.org", gated( ("a", i) ) ) ) for i in range( 4 ) ]
+            tasks += [ asyncio.create_task( scheduler.submit( "b.org", gated( ("b", i) ) ) ) for i in range( 2 ) ]
+            await settle()
+            first = (scheduler.hosts[ "a.org" ].in_flight, scheduler.hosts[ "b.org" ].in_flight, scheduler.in_flight)
+
+            gates[ ("a", 0) ].set()
+            await settle()
+            second = (scheduler.hosts[ "a.org" ].in_flight, scheduler.hosts[ "b.org" ].in_flight, scheduler.in_flight)
+
+            while not all( task.done() for task in tasks ):
+                for gate in gates.values():
+                    gate.set()
+                await settle()
+            return first, second
+
+        first, second = asyncio.run( run() )
+        self.assertEqual( first, (2, 1, 3) )
+        # the freed slot goes to the host waiting longest, without taking a.org over its limit
+        self.assertEqual( second, (2, 1, 3) )
+        self.assertEqual( (scheduler.in_flight, scheduler.hosts[ "a.org" ].in_flight), (0, 0) )
+
+    def test_cancelled_fetches_free_their_slots( self ):
+        scheduler = HostScheduler( initial=1, maximum=1 )
+        hang = asyncio.Event()
+
+        async def stuck():
+            await hang.wait()
+
+        async def run():
+            running = asyncio.create_task( scheduler.submit( "a.org", stuck ) )
+            queued = asyncio.create_task( scheduler.submit( "a.org", stuck ) )
+            await settle()
+            admitted = (scheduler.hosts[ "a.org" ].in_flight, len( scheduler.hosts[ "a.org" ].queue ))
+
+            # cancelled in the middle of its fetch, then while waiting for a slot
+            running.cancel()
+            await settle()
+            queued.cancel()
+            await asyncio.gather( running, queued, return_exceptions=True )
+            freed = (scheduler.hosts[ "a.org" ].in_flight, scheduler.in_flight)
+
+            result = await asyncio.wait_for( scheduler.submit( "a.org", self.fetch( 0.0 ) ), 1.0 )
+            return admitted, freed, result.response_status
+
+        self.assertEqual( asyncio.run( run() ), ((1, 1), (0, 0), 200) )
+        # a cancellation is not a failure of the host
+        self.assertEqual( scheduler.hosts[ "a.org" ].error_rate, 0.0 )
+
+
+if __name__ == '__main__':
+    unittest.main()
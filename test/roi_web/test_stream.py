@@ -0,0 +1,233 @@
+import asyncio
+import os
+import pathlib
+import tempfile
+import unittest
+
+from roi_utils.pipeline import Pipeline, Stage
+from roi_web import PageContent
+from roi_web.processing import Processer, Rejected, StreamCheckpoint, StreamProgress, load_events, load_events_async, \
+    read_stream, stream_events, tail_events
+
+HEADER = b"date\tquality\turl\n"
+
+
+def lines( start, stop ):
+    return b"".join( b"2022-06-08\t5\thttps://example.org/%d\n" % i for i in range( start, stop ) )
+
+
+def raws( events ):
+    return [ event.raw for event in events ]
+
+
+def urls( start, stop ):
+    return [ f"https://example.org/{i}" for i in range( start, stop ) ]
+
+
+class TestReadStream( unittest.TestCase ):
+
+    def setUp( self ):
+        self.directory = tempfile.TemporaryDirectory()
+        self.stream = pathlib.Path( self.directory.name ) / "stream.tsv"
+        self.stream.write_bytes( HEADER + lines( 0, 5 ) + b"2022-06-08\t5\thttps://example.org/5" )
+
+    def tearDown( self ):
+        self.directory.cleanup()
+
+    def test_batches_skip_the_header_and_end_at_their_offsets( self ):
+        batches = list( read_stream( self.stream, batch_size=2 ) )
+        self.assertEqual( [ len( batch ) for _, batch in batches ], [ 2, 2, 2 ] )
+        self.assertEqual( [ end for end, _ in batches ],
+                          [ len( HEADER + lines( 0, 2 ) ), len( HEADER + lines( 0, 4 ) ), self.stream.stat().st_size ] )
+        self.assertEqual( batches[ 0 ][ 1 ][ 0 ], lines( 0, 1 ) )
+
+    def test_complete_only_leaves_the_partial_line( self ):
+        batches = list( read_stream( self.stream, batch_size=10, complete_only=True ) )
+        self.assertEqual( batches, [ (len( HEADER + lines( 0, 5 ) ), lines( 0, 5 ).splitlines( keepends=True )) ] )
+
+        with open( self.stream, "ab" ) as file:
+            file.write( b"\n" )
+        self.assertEqual( list( read_stream( self.stream, offset=batches[ 0 ][ 0 ], complete_only=True ) ),
+                          [ (self.stream.stat().st_size, [ b"2022-06-08\t5\thttps://example.org/5\n" ]) ] )
+
+    def test_resuming_at_an_offset( self ):
+        offset = len( HEADER + lines( 0, 3 ) )
+        events = [ event for _, batch in stream_events( self.stream, offset=offset, batch_size=2 ) for event in batch ]
+        self.assertEqual( raws( events ), urls( 3, 6 ) )
+
+    def test_malformed_lines_are_skipped( self ):
+        with open( self.stream, "ab" ) as file:
+            file.write( b"\nnot a triple\n2022-06-08\t5\tnohost\n" + lines( 6, 7 ) )
+        events = [ event for _, batch in stream_events( self.stream ) for event in batch ]
+        self.assertEqual( raws( events ), urls( 0, 7 ) )
+
+    def test_the_process_pool_parses_like_the_loop( self ):
+        with open( self.stream, "ab" ) as file:
+            file.write( b"\n" + lines( 6, 40 ) )
+        serial = list( stream_events( self.stream, batch_size=3 ) )
+        pooled = list( stream_events( self.stream, batch_size=3, processes=2 ) )
+        self.assertEqual( [ (end, raws( batch )) for end, batch in pooled ],
+                          [ (end, raws( batch )) for end, batch in serial ] )
+        self.assertEqual( raws( event for _, batch in pooled for event in batch ), urls( 0, 40 ) )
+
+    def test_async_loading_matches_and_checkpoints( self ):
+        checkpoint = StreamCheckpoint( pathlib.Path( self.directory.name ) / "stream.checkpoint" )
+        progress = StreamProgress( checkpoint, self.stream )
+
+        async def load():
+            return [ event async for event in load_events_async( self.stream, seen=set(), batch_size=2,
+                                                                 progress=progress ) ]
+
+        events = asyncio.run( load() )
+        # the partial line waits, as for load_events
+        self.assertEqual( raws( events ), urls( 0, 5 ) )
+        for event in events:
+            progress.done( event )
+        self.assertEqual( checkpoint.resume( self.stream ), len( HEADER + lines( 0, 5 ) ) )
+
+
+class TestStreamCheckpoint( unittest.TestCase ):
+
+    def setUp( self ):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path( self.directory.name )
+        self.stream = self.path / "stream.tsv"
+        self.stream.write_bytes( HEADER + lines( 0, 5 ) )
+        self.checkpoint = StreamCheckpoint( self.path / "stream.checkpoint" )
+
+    def tearDown( self ):
+        self.directory.cleanup()
+
+    def test_resume_after_appends( self ):
+        self.assertEqual( self.checkpoint.resume( self.stream ), 0 )
+        offset = len( HEADER + lines( 0, 3 ) )
+        self.checkpoint.save( self.stream, offset )
+        with open( self.stream, "ab" ) as file:
+            file.write( lines( 5, 7 ) )
+        self.assertEqual( self.checkpoint.resume( self.stream ), offset )
+
+    def test_rewritten_or_replaced_streams_start_over( self ):
+        self.checkpoint.save( self.stream, len( HEADER + lines( 0, 3 ) ) )
+        self.stream.write_bytes( HEADER + lines( 10, 15 ) )
+        self.assertEqual( self.checkpoint.resume( self.stream ), 0 )
+
+        # the same bytes in another file, e.g. a rotated copy
+        self.checkpoint.save( self.stream, len( HEADER + lines( 10, 13 ) ) )
+        replacement = self.path / "replacement.tsv"
+        replacement.write_bytes( self.stream.read_bytes() )
+        os.replace( replacement, self.stream )
+        self.assertEqual( self.checkpoint.resume( self.stream ), 0 )
+
+
+class TestStreamProgress( unittest.TestCase ):
+
+    def setUp( self ):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path( self.directory.name )
+        self.stream = self.path / "stream.tsv"
+        self.stream.write_bytes( HEADER + lines( 0, 5 ) )
+        self.checkpoint = StreamCheckpoint( self.path / "stream.checkpoint" )
+        self.ends = [ end for end, _ in read_stream( self.stream, batch_size=2 ) ]
+
+    def tearDown( self ):
+        self.directory.cleanup()
+
+    def test_the_checkpoint_waits_for_the_oldest_batch( self ):
+        progress = StreamProgress( self.checkpoint, self.stream )
+        events = list( load_events( self.stream, batch_size=2, progress=progress ) )
+        self.assertEqual( raws( events ), urls( 0, 5 ) )
+        self.assertIsNone( self.checkpoint.load() )
+
+        progress.done( events[ 2 ] )
+        progress.done( events[ 0 ] )
+        self.assertIsNone( self.checkpoint.load() )
+        progress.done( events[ 1 ] )
+        self.assertEqual( self.checkpoint.load()[ "offset" ], self.ends[ 0 ] )
+        progress.done( events[ 4 ] )
+        progress.done( events[ 3 ] )
+        self.assertEqual( self.checkpoint.load()[ "offset" ], self.ends[ 2 ] )
+
+    def test_a_stopped_run_reads_its_events_in_flight_again( self ):
+        processed, hang = [ ], asyncio.Event()
+
+        async def persist( event ):
+            if event.raw.endswith( "/3" ):
+                await hang.wait()
+            processed.append( event.raw )
+
+        async def run():
+            progress = StreamProgress( self.checkpoint, self.stream )
+            pipeline = Pipeline( Stage( "persist", persist, workers=1, capacity=1 ) )
+            with self.assertRaises( asyncio.TimeoutError ):
+                await asyncio.wait_for( pipeline.run( load_events( self.stream, batch_size=2, progress=progress ),
+                                                      done=progress.done ), 0.2 )
+
+        asyncio.run( run() )
+        self.assertEqual( processed, urls( 0, 3 ) )
+        self.assertEqual( self.checkpoint.resume( self.stream ), self.ends[ 0 ] )
+
+        resumed = load_events( self.stream, batch_size=2, progress=StreamProgress( self.checkpoint, self.stream ) )
+        self.assertEqual( raws( resumed ), urls( 2, 5 ) )
+
+    def test_events_failing_to_persist_are_read_again( self ):
+        stored = [ ]
+
+        class Store:
+
+            def put( self, page ):
+                if page.url.endswith( "/1" ):
+                    raise OSError( "disk full" )
+                stored.append( page.url )
+
+        async def enrich( event ):
+            return PageContent( url=event.raw, visit_date="", visit_kind="", text="text" )
+
+        seen = set()
+        processer = Processer( fetcher=None, store=Store(), seen=seen )
+        progress = StreamProgress( self.checkpoint, self.stream )
+        pipeline = Pipeline( Stage( "enrich", enrich ), Stage( "persist", processer.persist ) )
+        asyncio.run( pipeline.run( load_events( self.stream, batch_size=2, progress=progress ), done=progress.done ) )
+        self.assertEqual( stored, urls( 0, 1 ) + urls( 2, 5 ) )
+        self.assertEqual( pipeline.stages[ 1 ].failed, 1 )
+
+        # a restart reads from before the failure, the others skipped as seen
+        self.assertIsNone( self.checkpoint.load() )
+        resumed = load_events( self.stream, seen=seen, batch_size=2,
+                               progress=StreamProgress( self.checkpoint, self.stream ) )
+        self.assertEqual( raws( resumed ), urls( 1, 2 ) )
+
+    def test_rejected_events_are_settled( self ):
+        progress = StreamProgress( self.checkpoint, self.stream )
+        events = list( load_events( self.stream, batch_size=2, progress=progress ) )
+        progress.done( events[ 0 ], Rejected( "No text" ) )
+        progress.done( events[ 1 ] )
+        progress.done( events[ 2 ], OSError( "disk full" ) )
+        progress.done( events[ 3 ] )
+        self.assertEqual( self.checkpoint.load()[ "offset" ], self.ends[ 0 ] )
+
+    def test_tail_events_resume_and_follow( self ):
+        self.checkpoint.save( self.stream, self.ends[ 0 ] )
+        progress = StreamProgress( self.checkpoint, self.stream )
+
+        async def follow():
+            tail = tail_events( self.stream, progress=progress, batch_size=10, interval=0.01 )
+            first = await anext( tail )
+            with open( self.stream, "ab" ) as file:
+                file.write( lines( 5, 6 ) + b"2022-06-08\t5\thttps://example.org/6" )
+            second = await anext( tail )
+            with open( self.stream, "ab" ) as file:
+                file.write( b"\n" )
+            third = await anext( tail )
+            await tail.aclose()
+            return first, second, third
+
+        first, second, third = asyncio.run( follow() )
+        self.assertEqual( (raws( first ), raws( second ), raws( third )), (urls( 2, 5 ), urls( 5, 6 ), urls( 6, 7 )) )
+
+        for event in first + second + third:
+            progress.done( event )
+        self.assertEqual( self.checkpoint.resume( self.stream ), self.stream.stat().st_size )
+
+
+if __name__ == '__main__':
+    unittest.main()
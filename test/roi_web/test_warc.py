@@ -0,0 +1,112 @@
+import pathlib
+import tempfile
+import unittest
+from dataclasses import replace
+
+from warcio.archiveiterator import ArchiveIterator
+
+from roi_web import WebArchive, UrlEvent, NetworkArchive
+from roi_web.warc import WarcArchiver
+
+
+def archive( i, body=None ):
+    url = UrlEvent( raw=f"https://example.com/{i}", quality="5", date="2022-09-01", scheme="https",
+                    netloc="example.com", path=f"/{i}", query="", hostname="example.com" )
+    content = NetworkArchive( host="example.com", request_headers={"Accept": "*/*"}, request_method="GET",
+                              request_real_url=url.raw, request_url=url.raw, response_charset="utf-8",
+                              response_content=body or f"<html><p>page {i}</p></html>".encode(),
+                              response_content_type="text/html",
+                              response_headers={"Content-Type": "text/html", "Content-Encoding": "gzip"},
+                              response_real_url=url.raw, response_status=200, response_url=url.raw )
+    return WebArchive( url=url, content=content )
+
+
+def archived( original ):
+    """What comes back: the transfer headers are dropped since the body is stored decoded."""
+    return replace( original, content=replace( original.content, response_headers={"Content-Type": "text/html"} ) )
+
+
+class TestWarcArchiver( unittest.TestCase ):
+
+    def setUp( self ):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path( self.directory.name )
+
+    def tearDown( self ):
+        self.directory.cleanup()
+
+    def test_write_get_and_scan_round_trip( self ):
+        originals = [ archive( i ) for i in range( 5 ) ]
+        with WarcArchiver( self.path, file_size=1024 ) as archiver:
+            for original in originals:
+                archiver.write( original )
+
+            self.assertEqual( len( archiver ), 5 )
+            self.assertIn( originals[ 3 ].digest(), archiver )
+            self.assertEqual( archiver.get( originals[ 3 ].digest() ), archived( originals[ 3 ] ) )
+            self.assertIsNone( archiver.get( archive( 99 ).digest() ) )
+
+        # rolled over several files, and read back by a new archiver
+        self.assertGreater( len( list( self.path.glob( "archive-*.warc.gz" ) ) ), 1 )
+        with WarcArchiver( self.path, file_size=1024 ) as archiver:
+            self.assertEqual( list( archiver.scan() ), [ archived( original ) for original in originals ] )
+
+    def test_records_carry_the_digest_header( self ):
+        originals = [ archive( i ) for i in range( 3 ) ]
+        with WarcArchiver( self.path ) as archiver:
+            for original in originals:
+                archiver.write( original )
+
+        with open( self.path / "archive-000000.warc.gz", "rb" ) as file:
+            records = [ (record.rec_headers.get_header( "WARC-Roi-Digest" ), record.rec_headers.get_header( "WARC-Target-URI" ),
+                         record.http_headers.get_header( "Content-Encoding" )) for record in ArchiveIterator( file ) ]
+        self.assertEqual( records, [ (original.digest(), original.url.raw, None) for original in originals ] )
+
+    def test_scan_skips_superseded_records( self ):
+        first, refetched = archive( 1, b"old" ), archive( 1, b"new" )
+        with WarcArchiver( self.path ) as archiver:
+            archiver.write( first )
+            archiver.write( archive( 2 ) )
+            archiver.write( refetched )
+            self.assertEqual( [ item.content.response_content for item in archiver.scan() ],
+                              [ archive( 2 ).content.response_content, b"new" ] )
+
+    def test_a_torn_final_record_is_cut_on_reopen( self ):
+        with WarcArchiver( self.path ) as archiver:
+            archiver.write( archive( 0 ) )
+            archiver.write( archive( 1 ) )
+
+        # a crash in the middle of writing a third record, before it was indexed
+        file = self.path / "archive-000000.warc.gz"
+        size = file.stat().st_size
+        with open( file, "ab" ) as torn:
+            torn.write( file.read_bytes()[ :size // 3 ] )
+
+        with WarcArchiver( self.path ) as archiver:
+            self.assertEqual( file.stat().st_size, size )
+            archiver.write( archive( 2 ) )
+            self.assertEqual( list( archiver.scan() ), [ archived( archive( i ) ) for i in range( 3 ) ] )
+            self.assertEqual( archiver.get( archive( 2 ).digest() ), archived( archive( 2 ) ) )
+
+    def test_a_lost_index_is_rebuilt_from_the_files( self ):
+        originals = [ archive( i ) for i in range( 5 ) ]
+        with WarcArchiver( self.path, file_size=1024 ) as archiver:
+            for original in originals:
+                archiver.write( original )
+
+        # the index lost, and the last record torn inside its gzip trailer
+        (self.path / WarcArchiver.INDEX_NAME).unlink()
+        last = max( self.path.glob( "archive-*.warc.gz" ) )
+        size = last.stat().st_size
+        with open( last, "ab" ) as torn:
+            torn.write( last.read_bytes()[ :-1 ] )
+
+        with WarcArchiver( self.path, file_size=1024 ) as archiver:
+            self.assertEqual( last.stat().st_size, size )
+            self.assertEqual( len( archiver ), 5 )
+            self.assertEqual( archiver.get( originals[ 1 ].digest() ), archived( originals[ 1 ] ) )
+            self.assertEqual( list( archiver.scan() ), [ archived( original ) for original in originals ] )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import pathlib
+import unittest
+from copy import deepcopy
+
+from lxml.etree import XPath, tostring
+
+from roi_web.parsing import HTML
+from roi_web.retraf import xpaths
+from roi_web.retraf.htmlprocessing import prune_unwanted_nodes
+from roi_web.retraf.metaxpaths import author_discard_xpaths
+from roi_web.retraf.xpaths import XPATHS
+
+DATA = pathlib.Path( __file__ ).parent / "data"
+
+NESTED = b"""<html><body><p>keep</p><div class="comments-title"><div class="sidebar">side</div>INNERTAIL</div>BODYTAIL
+<p>after</p></body></html>"""
+
+DISCARDS = [ xpaths.REMOVE_COMMENTS_XPATH, xpaths.PAYWALL_DISCARD_XPATH, xpaths.OVERALL_DISCARD_XPATH,
+             xpaths.TEASER_DISCARD_XPATH, xpaths.PRECISION_DISCARD_XPATH, xpaths.DISCARD_IMAGE_ELEMENTS,
+             xpaths.COMMENTS_DISCARD_XPATH, author_discard_xpaths ]
+
+
+def sequential( tree, nodelist ):
+    """The loop of prune_unwanted_nodes before the registry, one expression after the other."""
+    for expression in nodelist:
+        for subtree in XPath( expression )( tree ):
+            if subtree.tail is not None:
+                previous = subtree.getprevious()
+                if previous is None:
+                    previous = subtree.getparent()
+                if previous is not None:
+                    previous.tail = subtree.tail if previous.tail is None else ' '.join( [ previous.tail, subtree.tail ] )
+            subtree.getparent().remove( subtree )
+    return tree
+
+
+class TestXPathRegistry( unittest.TestCase ):
+
+    def tearDown( self ):
+        XPATHS.indexed = True
+        XPATHS.profile( False )
+
+    def assertPrunedLikeSequential( self, page, nodelist ):
+        tree = HTML.htmlElement( page )
+        expected = tostring( sequential( deepcopy( tree ), nodelist ) )
+        for indexed in (True, False):
+            XPATHS.indexed = indexed
+            self.assertEqual( tostring( prune_unwanted_nodes( deepcopy( tree ), nodelist ) ), expected )
+        return expected
+
+    def test_nested_matches_keep_their_tails( self ):
+        pruned = self.assertPrunedLikeSequential( NESTED, xpaths.OVERALL_DISCARD_XPATH )
+        self.assertIn( b"INNERTAIL", pruned )
+        self.assertIn( b"BODYTAIL", pruned )
+        self.assertNotIn( b"side", pruned )
+
+    def test_discard_lists_prune_like_the_sequential_loop( self ):
+        pages = [ NESTED ] + [ path.read_bytes() for path in sorted( DATA.glob( "*.html" ) ) ]
+        for page in pages:
+            for nodelist in DISCARDS:
+                with self.subTest( page=page[ :40 ], nodelist=nodelist[ 0 ][ :40 ] ):
+                    self.assertPrunedLikeSequential( page, nodelist )
+
+    def test_profiling_runs_expression_by_expression( self ):
+        XPATHS.profile()
+        prune_unwanted_nodes( HTML.htmlElement( NESTED ), xpaths.OVERALL_DISCARD_XPATH )
+        self.assertEqual( len( XPATHS.report() ), len( xpaths.OVERALL_DISCARD_XPATH ) )
+
+
+if __name__ == '__main__':
+    unittest.main()